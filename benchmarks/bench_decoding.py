@@ -0,0 +1,133 @@
+"""Micro-benchmark: dict round trip vs. direct TypeAdapter validation.
+
+Run with ``python -m benchmarks.bench_decoding`` from the repository root.
+"""
+
+import json
+import time
+import uuid
+from typing import List
+
+from vectoratorinteractor.decoding import (
+    JsonArraySplitter,
+    decode,
+    decode_items,
+    encode_messages,
+)
+from vectoratorinteractor.models import (
+    ChatMessage,
+    ChatWithMessagesPD,
+    FullDocumentWithPreview,
+    Persona,
+)
+
+
+def documents_payload(n: int) -> bytes:
+    return json.dumps(
+        [
+            {
+                "id": i,
+                "filename": f"folder/document-{i}.pdf",
+                "apporuser": "vinteractor_bench",
+                "project_id": 1,
+                "upload_request_id": i // 50,
+                "cover_url": f"https://s3.example.com/bench/document-{i}.png?sig=abc",
+                "zoomed_in_url": None,
+            }
+            for i in range(n)
+        ]
+    ).encode()
+
+
+def chat_payload(messages: int, documents: int) -> bytes:
+    return json.dumps(
+        {
+            "id": 1,
+            "name": "bench",
+            "apporuser": "vinteractor_bench",
+            "project": "bench",
+            "created_at": "2024-01-01T00:00:00Z",
+            "processing_state": "DONE",
+            "messages": [
+                {
+                    "id": m,
+                    "message": "lorem ipsum " * 40,
+                    "persona": "assistant" if m % 2 else "user",
+                    "created_at": "2024-01-01T00:00:00Z",
+                    "documents": [
+                        {
+                            "id": str(uuid.UUID(int=m * documents + d)),
+                            "filename": f"document-{d}.pdf",
+                            "filetype": "pdf",
+                            "source": f"document-{d}.pdf",
+                            "content": "dolor sit amet " * 60,
+                            "url": f"https://s3.example.com/document-{d}.pdf",
+                            "cover_url": f"https://s3.example.com/document-{d}.png",
+                            "page_number": d,
+                        }
+                        for d in range(documents)
+                    ],
+                }
+                for m in range(messages)
+            ],
+        }
+    ).encode()
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare(name: str, old, new):
+    old_time, new_time = best_of(old), best_of(new)
+    print(
+        f"{name:<38} dict round trip {old_time * 1000:8.2f} ms"
+        f"   typeadapter {new_time * 1000:8.2f} ms   x{old_time / new_time:5.2f}"
+    )
+
+
+def main():
+    docs = documents_payload(20_000)
+    compare(
+        "getDocuments, 20k documents",
+        lambda: [FullDocumentWithPreview(**d) for d in json.loads(docs)],
+        lambda: decode(List[FullDocumentWithPreview], docs),
+    )
+
+    def incremental():
+        splitter = JsonArraySplitter()
+        for start in range(0, len(docs), 64 * 1024):
+            chunk = docs[start : start + 64 * 1024]
+            decode_items(FullDocumentWithPreview, splitter.feed(chunk))
+
+    compare(
+        "iterDocuments, 20k documents",
+        lambda: [FullDocumentWithPreview(**d) for d in json.loads(docs)],
+        incremental,
+    )
+    chat = chat_payload(messages=400, documents=5)
+    compare(
+        "getChat, 400 messages x 5 documents",
+        lambda: ChatWithMessagesPD(**json.loads(chat)),
+        lambda: decode(ChatWithMessagesPD, chat),
+    )
+    messages = [
+        ChatMessage(message="lorem ipsum " * 40, persona=Persona.user)
+        for _ in range(2_000)
+    ]
+    compare(
+        "stream body, 2k messages",
+        lambda: json.dumps(
+            {"messages": [json.loads(m.model_dump_json()) for m in messages]}
+        ).encode(),
+        lambda: encode_messages(messages),
+    )
+
+
+if __name__ == "__main__":
+    main()
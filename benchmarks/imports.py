@@ -0,0 +1,67 @@
+"""Cold import time of the client entry points.
+
+Every import runs in a fresh interpreter, so nothing is cached in
+sys.modules. Reports the wall time of the import and which of the heavy
+optional packages it pulled in. Run with ``python -m benchmarks.imports``,
+benchmarks.run tracks the same numbers with the other scenarios.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ENTRY_POINTS = [
+    "vectoratorinteractor.client",
+    "vectoratorinteractor.vectoratorinteractor",
+    "vectoratorinteractor.models",
+]
+
+# loaded lazily by the client, importing it must not pull them in
+HEAVY_MODULES = ["fastapi", "starlette", "sqlmodel", "sqlalchemy", "httpx"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def probe(module: str) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def import_times(module: str, runs: int) -> Dict:
+    probes = [probe(module) for _ in range(runs)]
+    seconds: List[float] = [p["seconds"] for p in probes]
+    return {
+        "latencies": seconds,
+        "median_ms": statistics.median(seconds) * 1000,
+        "heavy_modules": probes[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    for module in args.modules:
+        result = import_times(module, args.runs)
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{module:<44} {result['median_ms']:8.1f} ms  loads: {heavy}")
+
+
+if __name__ == "__main__":
+    main()
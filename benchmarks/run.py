@@ -0,0 +1,369 @@
+"""Client benchmark suite against the local vectorator stub.
+
+Run with ``python -m benchmarks.run`` from the repository root. Every scenario
+is run once for timings and once under tracemalloc for the client's peak
+memory. Results are written to benchmarks/results/<version>.json and compared
+with the previous results file, regressions beyond --threshold are flagged.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+from benchmarks.imports import import_times
+from benchmarks.stub import StubConfig, StubServer
+from vectoratorinteractor.asyncinteractor import AsyncVectoratorInteractor
+from vectoratorinteractor.models import ChatMessage, NewMessagePD, Persona
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+from vectoratorinteractor.waiting import WaitPolicy
+from vectoratorinteractor.watcher import ChatWatcher
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+APPORUSER = "bench"
+PROJECT = "bench"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        run: Callable[..., Dict],
+        iterations: int,
+        config: StubConfig = StubConfig(),
+        fixture: Optional[Callable[[], ContextManager[Any]]] = None,
+    ):
+        # run(interactor, iterations) returns {"latencies": [...], "bytes": n,
+        # "ops": n} plus any scenario specific numbers. fixture is set up
+        # once outside of the measurements, its value is passed as a third
+        # argument to run
+        self.name = name
+        self.run = run
+        self.iterations = iterations
+        self.config = config
+        self.fixture = fixture
+
+
+def measure(
+    scenario: Scenario, interactor: VectoratorInteractor, *fixture: Any
+) -> Dict:
+    start = time.perf_counter()
+    outcome = scenario.run(interactor, scenario.iterations, *fixture)
+    elapsed = time.perf_counter() - start
+    latencies = outcome.pop("latencies")
+    ops = outcome.pop("ops", len(latencies))
+    transferred = outcome.pop("bytes", 0)
+    result = {
+        "ops": ops,
+        "seconds": elapsed,
+        "ops_per_second": ops / elapsed,
+        "mb_per_second": transferred / elapsed / 1e6 if transferred else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": statistics.fmean(latencies) * 1000,
+        },
+    }
+    result.update(outcome)
+    # one more pass under tracemalloc, the stub runs in its own process so
+    # only the client's allocations are traced
+    tracemalloc.start()
+    try:
+        scenario.run(interactor, max(1, scenario.iterations // 10), *fixture)
+        result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def timed(fn: Callable[[], object], iterations: int) -> List[float]:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# scenarios
+def list_documents(vi: VectoratorInteractor, iterations: int) -> Dict:
+    return {"latencies": timed(lambda: vi.getDocuments(PROJECT), iterations)}
+
+
+def iter_documents(vi: VectoratorInteractor, iterations: int) -> Dict:
+    return {
+        "latencies": timed(
+            lambda: sum(1 for _ in vi.iterDocuments(PROJECT)), iterations
+        )
+    }
+
+
+def list_chats(vi: VectoratorInteractor, iterations: int) -> Dict:
+    return {"latencies": timed(lambda: vi.getChats(PROJECT), iterations)}
+
+
+UPLOAD_SIZE = 32 * 1024 * 1024
+
+
+@contextmanager
+def upload_files():
+    # 4 random files of UPLOAD_SIZE in total, written in 1 MB pieces
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(4):
+            path = os.path.join(directory, f"upload-{i}.pdf")
+            with open(path, "wb") as f:
+                for _ in range(UPLOAD_SIZE // 4 // (1 << 20)):
+                    f.write(os.urandom(1 << 20))
+            paths.append(path)
+        yield paths
+
+
+def upload(vi: VectoratorInteractor, iterations: int, paths: List[str]) -> Dict:
+    latencies = timed(lambda: vi.uploadDocuments(PROJECT, paths), iterations)
+    return {"latencies": latencies, "bytes": UPLOAD_SIZE * iterations}
+
+
+def quicksearch(vi: VectoratorInteractor, iterations: int) -> Dict:
+    # distinct queries from 16 workers, like a busy search box
+    def search(i: int) -> float:
+        start = time.perf_counter()
+        vi.quicksearch(PROJECT, f"query {i}")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        latencies = list(pool.map(search, range(iterations)))
+    return {"latencies": latencies}
+
+
+def polling(vi: VectoratorInteractor, iterations: int) -> Dict:
+    policy = WaitPolicy(initial_delay=0.01, max_delay=0.05, jitter=0.0)
+    polls = []
+
+    def ask():
+        chat = vi.createChat(PROJECT, "bench")
+        chat = vi.addMessage(
+            PROJECT, chat.id, NewMessagePD(message="question", persona=Persona.user)
+        )
+        polls.append(vi.waitForChat(PROJECT, chat, policy=policy).polls)
+
+    latencies = timed(ask, iterations)
+    return {"latencies": latencies, "polls_per_wait": statistics.fmean(polls)}
+
+
+def watcher(vi: VectoratorInteractor, iterations: int) -> Dict:
+    # many chats waited for at once through one rate limited poller
+    policy = WaitPolicy(initial_delay=0.01, max_delay=0.05, jitter=0.0)
+    chats = []
+    for _ in range(iterations):
+        chat = vi.createChat(PROJECT, "bench")
+        vi.addMessage(
+            PROJECT, chat.id, NewMessagePD(message="question", persona=Persona.user)
+        )
+        chats.append(chat.id)
+    start = time.perf_counter()
+    with ChatWatcher(vi, max_requests_per_second=500, policy=policy) as w:
+        futures = [w.watch(PROJECT, chat_id) for chat_id in chats]
+        latencies = []
+        for future in futures:
+            future.result()
+            latencies.append(time.perf_counter() - start)
+        polls = w.polls
+    return {"latencies": latencies, "polls": polls}
+
+
+def streaming(vi: VectoratorInteractor, iterations: int) -> Dict:
+    messages = [ChatMessage(message="question", persona=Persona.user)]
+    ttfb, tokens_per_second = [], []
+
+    def stream():
+        with vi.stream_answer_events(APPORUSER, PROJECT, messages, parsed=True) as s:
+            for _ in s:
+                pass
+        ttfb.append(s.stats.time_to_first_token)
+        tokens_per_second.append(s.stats.tokens_per_second)
+
+    latencies = timed(stream, iterations)
+    return {
+        "latencies": latencies,
+        "time_to_first_token_ms": percentile(ttfb, 50) * 1000,
+        "tokens_per_second": statistics.fmean(tokens_per_second),
+    }
+
+
+def async_quicksearch(vi: VectoratorInteractor, iterations: int) -> Dict:
+    async def run():
+        async with AsyncVectoratorInteractor(
+            vectoratorurl=vi.vectoratorurl, apporuserdefault=APPORUSER
+        ) as ai:
+
+            # 16 concurrent tasks to match the threaded scenario
+            semaphore = asyncio.Semaphore(16)
+
+            async def search(i: int) -> float:
+                async with semaphore:
+                    start = time.perf_counter()
+                    await ai.quicksearch(PROJECT, f"query {i}")
+                    return time.perf_counter() - start
+
+            return await asyncio.gather(*(search(i) for i in range(iterations)))
+
+    return {"latencies": list(asyncio.run(run()))}
+
+
+def import_client(vi: VectoratorInteractor, iterations: int) -> Dict:
+    # cold start of the slim entry point in fresh interpreters, vi is unused
+    return import_times("vectoratorinteractor.client", iterations)
+
+
+SCENARIOS = [
+    Scenario("getDocuments 5k", list_documents, 20, StubConfig(documents=5000)),
+    Scenario("iterDocuments 5k", iter_documents, 20, StubConfig(documents=5000)),
+    Scenario("getChats 50x10", list_chats, 20),
+    Scenario("uploadDocuments 32MB", upload, 3, fixture=upload_files),
+    Scenario("quicksearch 16 threads", quicksearch, 400),
+    Scenario("quicksearch 16 tasks", async_quicksearch, 400),
+    Scenario("quicksearch 20ms latency", quicksearch, 200, StubConfig(latency=0.02)),
+    Scenario("waitForChat 3 polls", polling, 20),
+    Scenario("ChatWatcher 50 chats", watcher, 50),
+    Scenario(
+        "stream_answer_events 200 tokens",
+        streaming,
+        10,
+        StubConfig(stream_tokens=200, stream_rate=2000),
+    ),
+    Scenario("import vectoratorinteractor.client", import_client, 10),
+]
+
+
+def run_all(selected: Optional[List[str]] = None) -> Dict[str, Dict]:
+    results = {}
+    for scenario in SCENARIOS:
+        if selected and not any(s in scenario.name for s in selected):
+            continue
+        fixture = scenario.fixture() if scenario.fixture else nullcontext()
+        with StubServer(scenario.config) as server, fixture as value:
+            args = () if scenario.fixture is None else (value,)
+            with VectoratorInteractor(
+                vectoratorurl=server.url, apporuserdefault=APPORUSER
+            ) as vi:
+                result = measure(scenario, vi, *args)
+        results[scenario.name] = result
+        print(format_result(scenario.name, result), flush=True)
+    return results
+
+
+def format_result(name: str, result: Dict) -> str:
+    latency = result["latency_ms"]
+    line = (
+        f"{name:<34} {result['ops_per_second']:9.1f} ops/s"
+        f"  p50 {latency['p50']:8.2f} ms  p95 {latency['p95']:8.2f} ms"
+        f"  p99 {latency['p99']:8.2f} ms  peak {result['peak_memory_mb']:7.2f} MB"
+    )
+    if result.get("mb_per_second"):
+        line += f"  {result['mb_per_second']:7.1f} MB/s"
+    return line
+
+
+def version() -> str:
+    try:
+        return metadata.version("vectoratorinteractor")
+    except metadata.PackageNotFoundError:
+        return "dev"
+
+
+def previous_results(exclude: str) -> Optional[str]:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = [
+        os.path.join(RESULTS_DIR, name)
+        for name in os.listdir(RESULTS_DIR)
+        if name.endswith(".json")
+        and os.path.abspath(os.path.join(RESULTS_DIR, name)) != exclude
+    ]
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def compare(current: Dict[str, Dict], baseline_path: str, threshold: float):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"\ncompared with {os.path.basename(baseline_path)}")
+    regressions = 0
+    for name, result in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        checks = {
+            "ops/s": (old["ops_per_second"], result["ops_per_second"], True),
+            "p95": (old["latency_ms"]["p95"], result["latency_ms"]["p95"], False),
+            "peak": (old["peak_memory_mb"], result["peak_memory_mb"], False),
+        }
+        for metric, (before, after, higher_is_better) in checks.items():
+            if not before:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions += 1
+                print(f"  REGRESSION {name} {metric}: {before:.2f} -> {after:.2f}")
+    if not regressions:
+        print("  no regressions")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help="substrings of scenario names")
+    parser.add_argument("--output", help="results file, default results/<version>")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative change flagged"
+    )
+    args = parser.parse_args()
+
+    results = run_all(args.scenarios)
+    output = os.path.abspath(
+        args.output or os.path.join(RESULTS_DIR, f"{version()}.json")
+    )
+    baseline = args.baseline or previous_results(exclude=output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": version(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nresults written to {output}")
+    if baseline:
+        compare(results, baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
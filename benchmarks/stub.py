@@ -0,0 +1,370 @@
+"""Local stand-in of the vectorator backend for benchmarks.
+
+Implements every endpoint the interactor calls with canned payloads whose size,
+latency and streaming rate come from a StubConfig. StubServer runs it with
+uvicorn in a subprocess on a free localhost port, so the server never shows up
+in the client's timings or memory measurements. Run it standalone with
+``python -m benchmarks.stub --port 8000``.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class StubConfig(BaseModel):
+    # added to every response before it is sent
+    latency: float = 0.0
+    documents: int = 1000
+    chats: int = 50
+    messages_per_chat: int = 10
+    documents_per_message: int = 3
+    # size of message and document texts in bytes, scales every payload
+    text_size: int = 512
+    quicksearch_results: int = 20
+    # status polls a new message stays PROCESSING before it turns DONE
+    processing_polls: int = 3
+    stream_tokens: int = 200
+    # streamed tokens per second, 0 streams as fast as possible
+    stream_rate: float = 0.0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _text(size: int) -> str:
+    return ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size]
+
+
+class Payloads:
+    """Pre-rendered json bodies, so the stub's own cost stays flat."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        text = _text(config.text_size)
+        self.documents = [
+            {
+                "id": i,
+                "filename": f"folder/document-{i}.pdf",
+                "apporuser": "vinteractor_bench",
+                "project_id": 1,
+                "upload_request_id": i // 50,
+                "cover_url": f"https://s3.example.com/bench/document-{i}.png?sig=abc",
+                "zoomed_in_url": None,
+            }
+            for i in range(config.documents)
+        ]
+        self.documents_body = json.dumps(self.documents).encode()
+        self.files_body = json.dumps([d["filename"] for d in self.documents]).encode()
+        message_ids = itertools.count(1)
+        self.chats = [
+            self.chat(chat_id, text, message_ids) for chat_id in range(config.chats)
+        ]
+        self.chats_body = json.dumps(self.chats).encode()
+        self.quicksearch_body = json.dumps(
+            [
+                {
+                    "score": 100 - i,
+                    "filename": f"folder/document-{i}.pdf",
+                    "content": text[:200],
+                    "fullcontent": text,
+                    "timestamp": "2024-01-01T00:00:00",
+                }
+                for i in range(config.quicksearch_results)
+            ]
+        ).encode()
+        self.upload_requests_body = json.dumps(
+            [self.upload_request(i, processed=True) for i in range(20)]
+        ).encode()
+
+    def message(self, message_id: int, persona: str, text: str) -> dict:
+        return {
+            "id": message_id,
+            "message": text,
+            "persona": persona,
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "documents": [
+                {
+                    "id": str(uuid.UUID(int=message_id * 1000 + d)),
+                    "filename": f"document-{d}.pdf",
+                    "filetype": "pdf",
+                    "source": f"document-{d}.pdf",
+                    "content": text,
+                    "url": f"https://s3.example.com/document-{d}.pdf",
+                    "cover_url": f"https://s3.example.com/document-{d}.png",
+                    "page_number": d,
+                }
+                for d in range(
+                    self.config.documents_per_message if persona == "assistant" else 0
+                )
+            ],
+        }
+
+    def chat(self, chat_id: int, text: str, message_ids, state: str = "DONE"):
+        return {
+            "id": chat_id,
+            "name": f"chat {chat_id}",
+            "apporuser": "vinteractor_bench",
+            "project": "bench",
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "processing_state": state,
+            "messages": [
+                self.message(next(message_ids), "assistant" if m % 2 else "user", text)
+                for m in range(self.config.messages_per_chat)
+            ],
+        }
+
+    def upload_request(self, request_id: int, processed: bool) -> dict:
+        return {
+            "id": request_id,
+            "apporuser": "vinteractor_bench",
+            "project": "bench",
+            "processed": processed,
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "errormessage": None,
+            "documents": self.documents[:5] if processed else [],
+        }
+
+
+def create_app(config: StubConfig):
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    payloads = Payloads(config)
+    # chat id -> remaining PROCESSING polls
+    processing: Dict[int, int] = {}
+    chat_ids = itertools.count(10_000)
+    request_ids = itertools.count(1)
+    received = {"bytes": 0}
+
+    def json_response(body: bytes) -> Response:
+        return Response(content=body, media_type="application/json")
+
+    @app.middleware("http")
+    async def latency(request: Request, call_next):
+        if config.latency:
+            await asyncio.sleep(config.latency)
+        return await call_next(request)
+
+    def chat_body(chat_id: int) -> bytes:
+        state = "PROCESSING" if processing.get(chat_id, 0) > 0 else "DONE"
+        chat = payloads.chat(chat_id, _text(config.text_size), itertools.count(1))
+        chat["processing_state"] = state
+        return json.dumps(chat).encode()
+
+    # projects
+    @app.get("/projects/{apporuser}/")
+    async def projects(apporuser: str):
+        return ["bench"]
+
+    @app.post("/{apporuser}/{project}/")
+    async def create_project(apporuser: str, project: str):
+        return {"id": 1, "name": project, "apporuser": apporuser}
+
+    @app.delete("/{apporuser}/{project}/")
+    async def delete_project(apporuser: str, project: str):
+        return None
+
+    # documents
+    @app.post("/documents/{apporuser}/{project}/upload/")
+    async def upload(apporuser: str, project: str, request: Request):
+        # the multipart body is drained without parsing, only its size matters
+        async for chunk in request.stream():
+            received["bytes"] += len(chunk)
+        return {
+            "id": next(request_ids),
+            "apporuser": apporuser,
+            "project_id": 1,
+            "processed": False,
+            "created_at": _now(),
+            "errormessage": None,
+        }
+
+    @app.get("/documents/{apporuser}/{project}/uploadrequests")
+    async def upload_requests(apporuser: str, project: str):
+        return json_response(payloads.upload_requests_body)
+
+    @app.get("/documents/{apporuser}/{project}/uploadrequests/{request_id:int}")
+    async def upload_request(apporuser: str, project: str, request_id: int):
+        return payloads.upload_request(request_id, processed=True)
+
+    @app.get("/documents/{apporuser}/{project}/s3files")
+    async def files(apporuser: str, project: str):
+        return json_response(payloads.files_body)
+
+    @app.get("/documents/{apporuser}/{project}/presigned_url/{name:path}")
+    async def presigned(apporuser: str, project: str, name: str):
+        return f"https://s3.example.com/{apporuser}/{project}/{name}?sig=abc"
+
+    @app.get("/documents/{apporuser}/{project}/quicksearch/{query}")
+    async def quicksearch(apporuser: str, project: str, query: str):
+        return json_response(payloads.quicksearch_body)
+
+    @app.get("/documents/{apporuser}/{project}")
+    async def documents(apporuser: str, project: str):
+        return json_response(payloads.documents_body)
+
+    @app.get("/documents/{apporuser}/{project}/{document_id:int}")
+    async def document(apporuser: str, project: str, document_id: int):
+        if document_id >= len(payloads.documents):
+            raise HTTPException(status_code=404, detail="Document not found")
+        return payloads.documents[document_id]
+
+    @app.delete("/documents/{apporuser}/{project}/{document_id:int}")
+    async def delete_document(apporuser: str, project: str, document_id: int):
+        return None
+
+    # chats
+    @app.get("/chat/{apporuser}/{project}/")
+    async def chats(apporuser: str, project: str):
+        return json_response(payloads.chats_body)
+
+    @app.get("/chat/{apporuser}/{project}/status/{chat_id:int}")
+    async def chat_status(apporuser: str, project: str, chat_id: int):
+        remaining = processing.get(chat_id, 0)
+        if remaining > 0:
+            processing[chat_id] = remaining - 1
+            return "PROCESSING"
+        return "DONE"
+
+    @app.get("/chat/{apporuser}/{project}/by_name/{name}")
+    async def chat_by_name(apporuser: str, project: str, name: str):
+        return json_response(chat_body(0))
+
+    @app.get("/chat/{apporuser}/{project}/{chat_id:int}")
+    async def chat(apporuser: str, project: str, chat_id: int):
+        return json_response(chat_body(chat_id))
+
+    @app.post("/chat/{apporuser}/{project}/{name}")
+    async def create_chat(apporuser: str, project: str, name: str):
+        return json_response(chat_body(next(chat_ids)))
+
+    @app.put("/chat/{apporuser}/{project}/{chat_id:int}/rename")
+    async def rename_chat(apporuser: str, project: str, chat_id: int, new_name: str):
+        return json_response(chat_body(chat_id))
+
+    @app.put("/chat/{apporuser}/{project}/{chat_id:int}/message")
+    async def add_message(apporuser: str, project: str, chat_id: int, request: Request):
+        await request.body()
+        processing[chat_id] = config.processing_polls
+        return json_response(chat_body(chat_id))
+
+    @app.delete("/chat/{apporuser}/{project}/{chat_id:int}")
+    async def delete_chat(apporuser: str, project: str, chat_id: int):
+        return None
+
+    # streaming
+    async def tokens(frame):
+        delay = 1 / config.stream_rate if config.stream_rate else 0
+        for i in range(config.stream_tokens):
+            if delay:
+                await asyncio.sleep(delay)
+            yield frame(i)
+
+    @app.post("/stream/{apporuser}/{project}/")
+    async def stream(apporuser: str, project: str, request: Request):
+        await request.body()
+        return StreamingResponse(tokens(lambda i: f"token{i} ".encode()))
+
+    @app.post("/stream/{apporuser}/{project}/tokens")
+    async def stream_tokens(apporuser: str, project: str, request: Request):
+        await request.body()
+        return StreamingResponse(tokens(lambda i: f"token{i} ".encode()))
+
+    @app.post("/stream/{apporuser}/{project}/events")
+    async def stream_events(apporuser: str, project: str, request: Request):
+        await request.body()
+        return StreamingResponse(
+            tokens(lambda i: f'data: {{"token": "token{i} "}}\n\n'.encode()),
+            media_type="text/event-stream",
+        )
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubServer:
+    """Runs the stub in a uvicorn subprocess for the duration of a with block."""
+
+    def __init__(self, config: StubConfig = StubConfig(), startup_timeout=20.0):
+        self.config = config
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.startup_timeout = startup_timeout
+        self._process = None
+
+    def start(self):
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.stub",
+                "--port",
+                str(self.port),
+                "--config",
+                self.config.model_dump_json(),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("benchmark stub exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), 0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError("benchmark stub did not start in time")
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(10)
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default="{}", help="StubConfig as json")
+    args = parser.parse_args()
+    config = StubConfig.model_validate_json(args.config)
+    uvicorn.run(
+        create_app(config),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
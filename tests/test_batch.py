@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from vectoratorinteractor.batch import arun_bounded, run_bounded
+
+
+class Gauge:
+    """Counts calls in flight and remembers the peak."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        with self._lock:
+            self.current -= 1
+
+
+def test_run_bounded_limits_concurrency_and_keeps_order():
+    gauge = Gauge()
+
+    def fn(item):
+        gauge.enter()
+        time.sleep(0.01)
+        gauge.leave()
+        if item == 3:
+            raise KeyError(item)
+        return item * 2
+
+    batch = run_bounded(fn, list(range(20)), max_concurrency=4)
+    assert gauge.peak == 4 and gauge.current == 0
+    assert batch.results[:5] == [0, 2, 4, None, 8]
+    assert list(batch.errors) == [3] and not batch.ok
+    with pytest.raises(KeyError):
+        batch.raise_for_errors()
+
+
+def test_arun_bounded_limits_concurrency_and_releases_on_errors():
+    gauge = Gauge()
+
+    async def fn(item):
+        gauge.enter()
+        try:
+            await asyncio.sleep(0.001)
+            if item % 5 == 0:
+                raise ValueError(item)
+            return item
+        finally:
+            gauge.leave()
+
+    batch = asyncio.run(arun_bounded(fn, list(range(50)), max_concurrency=3))
+    assert gauge.peak == 3 and gauge.current == 0
+    assert sorted(batch.errors) == list(range(0, 50, 5))
+    assert [r for r in batch if r is not None] == [i for i in range(50) if i % 5 != 0]
+
+
+def test_empty_and_invalid_batches():
+    assert len(run_bounded(lambda item: item, [])) == 0
+    with pytest.raises(ValueError):
+        run_bounded(lambda item: item, [1], max_concurrency=0)
+    with pytest.raises(ValueError):
+        asyncio.run(arun_bounded(lambda item: item, [1], max_concurrency=0))
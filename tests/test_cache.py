@@ -0,0 +1,164 @@
+import io
+import time
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+from vectoratorinteractor.cache import (
+    PRESIGNED_TTL_FRACTION,
+    ResponseCache,
+    TTLCache,
+    presigned_ttl,
+)
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+
+BUCKET = "https://bucket.s3.amazonaws.com/app_user/project/book/3.png"
+
+
+def amz_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def test_ttl_from_sigv4_expiry():
+    url = f"{BUCKET}?X-Amz-Date={amz_date(time.time() - 600)}&X-Amz-Expires=3600"
+    assert presigned_ttl(url, validity_days=7) == pytest.approx(
+        3000 * PRESIGNED_TTL_FRACTION, abs=5
+    )
+
+
+def test_ttl_from_sigv2_expiry():
+    url = f"{BUCKET}?AWSAccessKeyId=key&Expires={int(time.time()) + 1000}"
+    assert presigned_ttl(url) == pytest.approx(1000 * PRESIGNED_TTL_FRACTION, abs=5)
+
+
+def test_expired_or_unknown_lifetime_is_not_cached():
+    assert presigned_ttl(f"{BUCKET}?Expires={int(time.time()) - 10}") == 0
+    assert presigned_ttl(f"{BUCKET}?X-Amz-Expires=soon") == 0
+    assert presigned_ttl(BUCKET) == 0
+    assert presigned_ttl(BUCKET, validity_days=1) == 86400 * PRESIGNED_TTL_FRACTION
+    cache = TTLCache()
+    cache.set("key", BUCKET, presigned_ttl(BUCKET))
+    assert "key" not in cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class EtagTransport:
+    """Serves body with an ETag and answers a matching If-None-Match with 304."""
+
+    def __init__(self, body=b'["project"]', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        response = requests.Response()
+        response.url = url
+        response.headers["ETag"] = self.etag
+        if headers.get("If-None-Match") == self.etag:
+            response.status_code = 304
+            response.raw = io.BytesIO(b"")
+        else:
+            response.status_code = 200
+            response.raw = io.BytesIO(self.body)
+        return response
+
+    def close(self):
+        pass
+
+
+def client(transport, clock):
+    cache = ResponseCache(ttls={"projects": 10}, clock=clock)
+    return VectoratorInteractor("app", "", transport=transport, response_cache=cache)
+
+
+def test_fresh_entry_is_served_without_a_request():
+    transport, clock = EtagTransport(), Clock()
+    vi = client(transport, clock)
+    assert vi.getProjects("user") == ["project"]
+    clock.now = 9
+    assert vi.getProjects("user") == ["project"]
+    assert len(transport.requests) == 1
+    assert vi.responseCache.stats()["hits"] == 1
+
+
+def test_expired_entry_is_revalidated_with_its_etag():
+    transport, clock = EtagTransport(), Clock()
+    vi = client(transport, clock)
+    vi.getProjects("user")
+    clock.now = 11
+    assert vi.getProjects("user") == ["project"]
+    assert transport.requests[1]["If-None-Match"] == '"v1"'
+    # the 304 made the entry fresh again
+    clock.now = 20
+    vi.getProjects("user")
+    assert len(transport.requests) == 2
+    assert vi.responseCache.stats()["revalidated"] == 1
+
+
+def test_changed_etag_replaces_the_body():
+    transport, clock = EtagTransport(), Clock()
+    vi = client(transport, clock)
+    vi.getProjects("user")
+    transport.body, transport.etag = b'["other"]', '"v2"'
+    clock.now = 11
+    assert vi.getProjects("user") == ["other"]
+
+
+def test_invalidate_matches_tenant_project_and_endpoint():
+    cache = ResponseCache(clock=Clock())
+    keys = [
+        ("a", "p1", "files", "u1"),
+        ("a", "p2", "files", "u2"),
+        ("a", None, "projects", "u3"),
+        ("b", "p1", "files", "u4"),
+    ]
+    for key in keys:
+        cache.store(key, b"[]", {}, cache.generation)
+    assert cache.invalidate("a", "p1") == 1
+    assert cache.invalidate("a", endpoints=["projects"]) == 1
+    assert [cache.lookup(key)[0] is not None for key in keys] == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    assert cache.invalidate() == 2
+    assert len(cache) == 0
+
+
+def test_response_fetched_before_an_invalidation_is_not_stored():
+    cache = ResponseCache(clock=Clock())
+    key = ("a", "p1", "files", "u1")
+    generation = cache.generation
+    cache.invalidate("a", "p1")
+    cache.store(key, b"[]", {}, generation)
+    assert cache.lookup(key) == (None, False)
+
+
+def test_revalidation_after_an_invalidation_does_not_refresh():
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    key = ("a", "p1", "files", "u1")
+    entry = cache.store(key, b"[]", {"ETag": '"v1"'}, cache.generation)
+    clock.now = 100
+    generation = cache.generation
+    cache.invalidate("b")
+    cache.refresh(key, entry, {}, generation)
+    assert cache.lookup(key) == (entry, False)
+
+
+def test_no_store_responses_are_not_kept():
+    cache = ResponseCache(clock=Clock())
+    key = ("a", "p1", "files", "u1")
+    cache.store(key, b"[]", {"Cache-Control": "no-store"}, cache.generation)
+    assert len(cache) == 0
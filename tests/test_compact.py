@@ -0,0 +1,86 @@
+import json
+import uuid
+
+import pytest
+from pydantic import ValidationError
+
+from vectoratorinteractor.compact import Compaction
+from vectoratorinteractor.decoding import decode
+from vectoratorinteractor.schemas import ChatWithMessagesPD
+
+
+def document(n: int) -> dict:
+    return {
+        "id": str(uuid.UUID(int=n)),
+        "filename": f"book{n}.pdf",
+        "filetype": "pdf",
+        "source": "s3",
+        "content": f"page text {n}",
+        "url": f"https://bucket/book{n}/1.png",
+        "cover_url": f"https://bucket/book{n}.png",
+        "page_number": n,
+    }
+
+
+def chat_json(documents_per_message) -> bytes:
+    messages = [
+        {
+            "id": i,
+            "message": f"message {i}",
+            "persona": "assistant",
+            "created_at": "2024-01-01T00:00:00Z",
+            "documents": documents,
+        }
+        for i, documents in enumerate(documents_per_message)
+    ]
+    return json.dumps(
+        {
+            "id": 1,
+            "name": "chat",
+            "apporuser": "app_user",
+            "project": "project",
+            "created_at": "2024-01-01T00:00:00Z",
+            "processing_state": "DONE",
+            "messages": messages,
+        }
+    ).encode()
+
+
+CONTENT = chat_json(
+    [[document(1), document(2)], [], [document(2), document(3), document(1)]]
+)
+
+
+def test_compact_chat_matches_the_full_decode():
+    full = decode(ChatWithMessagesPD, CONTENT)
+    compact = Compaction().chat(CONTENT)
+    assert len(compact.documents) == 3
+    assert compact.messages[2].document_ids == tuple(
+        str(uuid.UUID(int=n)) for n in (2, 3, 1)
+    )
+    assert compact.full().model_dump() == full.model_dump()
+    # every message shares the one validated document
+    assert compact.messages[0].documents[0] is compact.messages[2].documents[2]
+
+
+def test_dropped_fields_are_none():
+    full = decode(ChatWithMessagesPD, CONTENT).model_dump()
+    for message in full["messages"]:
+        for doc in message["documents"]:
+            doc["content"] = None
+    compact = Compaction(drop_fields=["content"]).chat(CONTENT)
+    assert compact.full().model_dump() == full
+
+
+@pytest.mark.parametrize("bad_id", [None, 7, "not a uuid"])
+def test_document_without_valid_id_fails_validation(bad_id):
+    broken = document(1)
+    if bad_id is None:
+        del broken["id"]
+    else:
+        broken["id"] = bad_id
+    content = chat_json([[broken]])
+    with pytest.raises(ValidationError):
+        decode(ChatWithMessagesPD, content)
+    with pytest.raises(ValidationError):
+        Compaction().chat(content).messages[0].documents
@@ -0,0 +1,91 @@
+import json
+from typing import Dict, List
+
+import pytest
+from pydantic import BaseModel
+
+from vectoratorinteractor.decoding import JsonArraySplitter, decode_items
+
+TRICKY = [
+    {"id": 1, "name": "plain"},
+    {"id": 2, "name": 'quote " and backslash \\ and } ] , { ['},
+    {"id": 3, "name": "\\", "tail": '\\"'},
+    {"id": 4, "nested": {"list": [1, [2, [3]], {"deep": "]"}], "empty": {}}},
+    [1, 2, [3, "x,y"]],
+    "a string, with a comma",
+    -1.5e3,
+    None,
+    True,
+    {"unicode": "grüße ☃", "escaped": "ü"},
+]
+
+
+def split(chunks) -> List[bytes]:
+    splitter = JsonArraySplitter()
+    items = []
+    for chunk in chunks:
+        items.extend(splitter.feed(chunk))
+    splitter.close()
+    return items
+
+
+def parsed(items: List[bytes]) -> list:
+    return [json.loads(item) for item in items]
+
+
+@pytest.mark.parametrize("separators", [(",", ":"), (", ", ": ")])
+def test_every_chunk_boundary(separators):
+    payload = json.dumps(TRICKY, separators=separators, ensure_ascii=False).encode()
+    for cut in range(len(payload) + 1):
+        items = split([payload[:cut], payload[cut:]])
+        assert parsed(items) == TRICKY, cut
+
+
+def test_single_byte_chunks():
+    payload = json.dumps(TRICKY).encode()
+    items = split([payload[i : i + 1] for i in range(len(payload))])
+    assert parsed(items) == TRICKY
+
+
+@pytest.mark.parametrize("payload", [b"[]", b" [ ] ", b"\n[\n\t\r\n]\n"])
+def test_empty_arrays(payload):
+    assert split([payload]) == []
+
+
+def test_whitespace_around_items_is_stripped():
+    items = split([b'\n[\n  {"a": 1} ,\n  2\n ,"x"\n]\n'])
+    assert items == [b'{"a": 1}', b"2", b'"x"']
+
+
+def test_memory_is_bounded_by_one_item():
+    splitter = JsonArraySplitter()
+    splitter.feed(b"[" + b'{"a": 1},' * 1000)
+    assert len(splitter._buffer) < 16
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError):
+        JsonArraySplitter().feed(b'{"a": 1}')
+
+
+def test_truncated_array():
+    splitter = JsonArraySplitter()
+    splitter.feed(b'[{"a": 1}, {"b": "unterminated')
+    with pytest.raises(ValueError):
+        splitter.close()
+
+
+class Item(BaseModel):
+    id: int
+    tags: List[str] = []
+    extra: Dict[str, int] = {}
+
+
+def test_decode_items_validates_every_item():
+    payload = b'[{"id": 1, "tags": ["a,b", "]"]}, {"id": 2, "extra": {"x": 3}}]'
+    items = decode_items(Item, split([payload[:17], payload[17:]]))
+    assert items == [Item(id=1, tags=["a,b", "]"]), Item(id=2, extra={"x": 3})]
+
+
+def test_decode_items_empty():
+    assert decode_items(Item, []) == []
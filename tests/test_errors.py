@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+import pytest
+import requests
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from vectoratorinteractor.errors import (
+    VectoratorError,
+    http_error,
+    install_error_handler,
+)
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+
+
+class FailingTransport:
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 404
+        response._content = b"no such project"
+        return response
+
+    def close(self):
+        pass
+
+
+def test_sync_client_errors_are_http_exceptions():
+    vi = VectoratorInteractor("app", "user", transport=FailingTransport())
+    with pytest.raises(HTTPException) as raised:
+        vi.getChats("project")
+    assert isinstance(raised.value, VectoratorError)
+    assert (raised.value.status_code, raised.value.detail) == (404, "no such project")
+    assert str(raised.value) == "404: no such project"
+
+
+def test_fastapi_answers_with_the_error_status():
+    app = FastAPI()
+    install_error_handler(app)
+
+    @app.get("/legacy")
+    def legacy():
+        raise http_error(404, "legacy")
+
+    @app.get("/plain")
+    def plain():
+        raise VectoratorError(409, "plain")
+
+    client = TestClient(app)
+    assert client.get("/legacy").status_code == 404
+    assert client.get("/plain").json() == {"detail": "plain"}
+
+
+def test_importing_the_client_does_not_load_fastapi():
+    code = (
+        "import sys, vectoratorinteractor.client; "
+        "assert 'fastapi' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
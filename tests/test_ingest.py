@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from vectoratorinteractor.ingest import IngestPipeline
+from vectoratorinteractor.schemas import DocumentUploadRequestWithDocumentsPD
+from vectoratorinteractor.waiting import WaitPolicy
+
+
+class FakeInteractor:
+    """Records uploads, every upload request is processed right away."""
+
+    def __init__(self):
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def uploadDocuments(self, project, paths, apporuser, highresmode):
+        with self._lock:
+            self.uploads.append(sorted(paths))
+            request_id = len(self.uploads)
+        return self.request(request_id)
+
+    def request(self, request_id: int) -> DocumentUploadRequestWithDocumentsPD:
+        return DocumentUploadRequestWithDocumentsPD(
+            id=request_id,
+            apporuser="app_user",
+            project="project",
+            processed=True,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def getUploadRequests(self, project, apporuser):
+        return [self.request(i + 1) for i in range(len(self.uploads))]
+
+
+def files(tmp_path, names):
+    source = tmp_path / "source"
+    source.mkdir(exist_ok=True)
+    for name in names:
+        (source / name).write_bytes(name.encode() * 10)
+    return source
+
+
+def pipeline(interactor, manifest, **kwargs) -> IngestPipeline:
+    return IngestPipeline(
+        interactor,
+        "project",
+        manifest_path=manifest,
+        policy=WaitPolicy(timeout=5, initial_delay=0.01),
+        **kwargs,
+    )
+
+
+def test_rerun_resumes_from_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    source = files(tmp_path, ["a.pdf", "b.pdf", "c.pdf"])
+    interactor = FakeInteractor()
+    report = pipeline(interactor, manifest, max_batch_files=2).run(source)
+    assert (report.uploaded_files, report.skipped_files) == (3, 0)
+    assert sorted(report.processed) == [1, 2]
+    assert len(interactor.uploads) == 2
+
+    # unchanged files are skipped, a new one is uploaded
+    files(tmp_path, ["d.pdf"])
+    report = pipeline(interactor, manifest, max_batch_files=2).run(source)
+    assert (report.uploaded_files, report.skipped_files) == (1, 3)
+    assert interactor.uploads[-1] == [str(source / "d.pdf")]
+    assert report.processed == [3]
+
+
+def test_rerun_keeps_tracking_unprocessed_requests(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    source = files(tmp_path, ["a.pdf"])
+    interactor = FakeInteractor()
+    report = pipeline(interactor, manifest).run(source, wait=False)
+    assert report.processed == []
+    report = pipeline(interactor, manifest).run(source)
+    assert (report.uploaded_files, report.skipped_files) == (0, 1)
+    assert report.processed == [1]
+
+
+def test_manifest_write_errors_are_raised(tmp_path):
+    source = files(tmp_path, ["a.pdf"])
+    ingest = pipeline(FakeInteractor(), tmp_path / "missing" / "manifest.jsonl")
+    with pytest.raises(FileNotFoundError):
+        ingest.run(source, wait=False)
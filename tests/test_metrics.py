@@ -0,0 +1,93 @@
+import io
+import logging
+
+import pytest
+import requests
+
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.metrics import LATENCY_BUCKETS, Histogram, Metrics
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+
+
+def test_percentiles_are_within_a_bucket():
+    histogram = Histogram()
+    values = [i / 1000 for i in range(1, 1001)]
+    for value in values:
+        histogram.observe(value)
+    for q in (50, 95, 99):
+        exact = values[int(q / 100 * len(values)) - 1]
+        # buckets grow by 25%, the estimate is off by less than one bucket
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.25)
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert summary["mean"] == pytest.approx(0.5005)
+    assert summary["max"] == 1.0
+
+
+def test_percentile_edge_cases():
+    histogram = Histogram()
+    assert histogram.percentile(50) is None
+    assert histogram.summary()["mean"] is None
+    histogram.observe(LATENCY_BUCKETS[-1] * 10)
+    # values above the last bucket are interpolated up to the observed max
+    assert LATENCY_BUCKETS[-1] < histogram.percentile(99) < LATENCY_BUCKETS[-1] * 10
+    assert histogram.percentile(100) == LATENCY_BUCKETS[-1] * 10
+    histogram = Histogram()
+    histogram.observe(0.002)
+    assert histogram.percentile(100) == 0.002
+
+
+class StatusTransport:
+    def __init__(self, status_code=200, body=b'["project"]'):
+        self.status_code = status_code
+        self.body = body
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = url
+        response.raw = io.BytesIO(self.body)
+        return response
+
+    def close(self):
+        pass
+
+
+def test_hooks_see_every_request():
+    seen = []
+    metrics = Metrics(
+        pre_request=[lambda r: seen.append(("pre", r.endpoint, r.status_code))],
+        post_request=[lambda r: seen.append(("post", r.endpoint, r.status_code))],
+    )
+    vi = VectoratorInteractor("app", "", transport=StatusTransport(), metrics=metrics)
+    assert vi.getProjects("user") == ["project"]
+    assert seen == [("pre", "getProjects", None), ("post", "getProjects", 200)]
+    snapshot = metrics.snapshot()["getProjects"]
+    assert (snapshot["calls"], snapshot["requests"]) == (1, 1)
+    assert snapshot["status_codes"] == {200: 1}
+    assert snapshot["response_bytes"] == len(b'["project"]')
+    assert snapshot["latency"]["count"] == 1
+
+
+def test_failing_hook_does_not_break_the_call(caplog):
+    def broken(record):
+        raise RuntimeError("exporter down")
+
+    metrics = Metrics(post_request=[broken])
+    vi = VectoratorInteractor("app", "", transport=StatusTransport(), metrics=metrics)
+    with caplog.at_level(logging.ERROR, logger="vectoratorinteractor.metrics"):
+        assert vi.getProjects("user") == ["project"]
+    assert "exporter down" in caplog.text
+
+
+def test_errors_are_counted_per_call():
+    metrics = Metrics()
+    transport = StatusTransport(status_code=500, body=b"boom")
+    vi = VectoratorInteractor("app", "", transport=transport, metrics=metrics)
+    with pytest.raises(VectoratorError):
+        vi.getProjects("user")
+    snapshot = metrics.snapshot()["getProjects"]
+    assert snapshot["errors"] == {"http_500": 1}
+    assert snapshot["status_codes"] == {500: 1}
+    metrics.reset()
+    assert metrics.snapshot() == {}
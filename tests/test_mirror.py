@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+
+from vectoratorinteractor.mirror import LocalMirror
+from vectoratorinteractor.schemas import (
+    ChatMessageWithDocumentsPD,
+    ChatWithMessagesPD,
+    DocumentUploadRequestWithDocumentsPD,
+    FullDocumentWithPreview,
+    Persona,
+    ProcessingState,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(minutes: int) -> datetime:
+    return START + timedelta(minutes=minutes)
+
+
+def message(message_id: int, minutes: int) -> ChatMessageWithDocumentsPD:
+    return ChatMessageWithDocumentsPD(
+        id=message_id,
+        message=f"m{message_id}",
+        persona=Persona.user,
+        created_at=at(minutes),
+    )
+
+
+def document(document_id: int, request_id: int) -> FullDocumentWithPreview:
+    return FullDocumentWithPreview(
+        id=document_id,
+        filename=f"doc{document_id}.pdf",
+        apporuser="app_user",
+        project_id=1,
+        upload_request_id=request_id,
+    )
+
+
+class FakeInteractor:
+    """Serves the project listings a LocalMirror syncs from, edited by the tests."""
+
+    def __init__(self):
+        self.requests = {
+            1: self.request(1, 0, True, [document(1, 1)]),
+            2: self.request(2, 5, False, []),
+        }
+        self.chats = {
+            1: self.chat(1, [message(1, 10), message(2, 11)]),
+            2: self.chat(2, [message(3, 12)]),
+        }
+        self.documents = None
+
+    @staticmethod
+    def request(request_id, minutes, processed, documents):
+        return DocumentUploadRequestWithDocumentsPD(
+            id=request_id,
+            apporuser="app_user",
+            project="project",
+            processed=processed,
+            created_at=at(minutes),
+            documents=documents,
+        )
+
+    @staticmethod
+    def chat(chat_id, messages, state=ProcessingState.DONE):
+        return ChatWithMessagesPD(
+            id=chat_id,
+            name=f"chat{chat_id}",
+            apporuser="app_user",
+            project="project",
+            created_at=at(chat_id),
+            processing_state=state,
+            messages=messages,
+        )
+
+    def apporuserKey(self, apporuser):
+        return "app_user"
+
+    def getProjects(self, apporuser):
+        return ["project"]
+
+    def getUploadRequests(self, project, apporuser):
+        return list(self.requests.values())
+
+    def iterChats(self, project, apporuser):
+        return iter(list(self.chats.values()))
+
+    def iterDocuments(self, project, apporuser):
+        if self.documents is None:
+            return iter([d for r in self.requests.values() for d in r.documents])
+        return iter(self.documents)
+
+
+def test_first_sync_copies_everything():
+    interactor = FakeInteractor()
+    with LocalMirror(interactor) as mirror:
+        report = mirror.sync("project")
+        assert (report.chats_added, report.messages_added) == (2, 3)
+        assert (report.upload_requests, report.documents) == (2, 1)
+        assert [p.name for p in mirror.projects()] == ["project"]
+        assert [c.id for c in mirror.getChats("project")] == [1, 2]
+        assert [m.id for m in mirror.getChatHistory("project", 1)] == [1, 2]
+        assert [d.filename for d in mirror.getDocuments("project")] == ["doc1.pdf"]
+
+
+def test_unchanged_sync_writes_nothing_new():
+    interactor = FakeInteractor()
+    with LocalMirror(interactor) as mirror:
+        mirror.sync("project")
+        report = mirror.sync("project")
+    assert report.chats_added == report.chats_updated == report.chats_removed == 0
+    assert report.messages_added == 0
+    # only the unprocessed request is fetched again, the processed older one
+    # is below the watermark
+    assert report.upload_requests == 1
+
+
+def test_incremental_sync_applies_only_the_changes():
+    interactor = FakeInteractor()
+    with LocalMirror(interactor) as mirror:
+        mirror.sync("project")
+        interactor.chats[1].messages.append(message(4, 20))
+        interactor.chats[2] = interactor.chat(
+            2, [message(3, 12)], ProcessingState.PROCESSING
+        )
+        interactor.chats[3] = interactor.chat(3, [message(5, 21)])
+        interactor.requests[2] = interactor.request(2, 5, True, [document(2, 2)])
+        report = mirror.sync("project")
+        assert (report.chats_added, report.chats_updated) == (1, 1)
+        assert report.messages_added == 2
+        assert report.documents == 1
+        assert [m.id for m in mirror.getChatHistory("project", 1)] == [1, 2, 4]
+        assert (
+            mirror.getChat("project", 2).processing_state == ProcessingState.PROCESSING
+        )
+        assert mirror.getDocumentByFilename("project", "doc2.pdf").id == 2
+
+        del interactor.chats[1]
+        report = mirror.sync("project")
+        assert report.chats_removed == 1
+        assert mirror.getChat("project", 1) is None
+        assert mirror.getChatHistory("project", 1) == []
+
+
+def test_deleted_documents_are_dropped_by_a_full_sync():
+    interactor = FakeInteractor()
+    with LocalMirror(interactor) as mirror:
+        mirror.sync("project")
+        interactor.documents = []
+        assert len(mirror.getDocuments("project")) == 1
+        report = mirror.sync("project", full=True)
+        assert report.documents_removed == 1
+        assert mirror.getDocuments("project") == []
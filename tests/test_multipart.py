@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+from vectoratorinteractor.multipart import MultipartEncoder
+
+
+def encoder(tmp_path, **kwargs) -> MultipartEncoder:
+    path = tmp_path / "book.pdf"
+    path.write_bytes(bytes(range(256)) * 1000)
+    files = [
+        ("files", path),
+        ("files", ("notes.txt", io.BytesIO(b"some notes"), "text/plain")),
+    ]
+    return MultipartEncoder(files, chunk_size=4096, boundary="b0undary", **kwargs)
+
+
+def test_length_matches_the_body(tmp_path):
+    body = encoder(tmp_path)
+    content = b"".join(body)
+    assert len(body) == body.length == len(content)
+    assert content.startswith(b"--b0undary\r\nContent-Disposition: form-data")
+    assert b'filename="notes.txt"\r\nContent-Type: text/plain\r\n\r\nsome notes' in (
+        content
+    )
+    assert content.endswith(b"\r\n--b0undary--\r\n")
+
+
+@pytest.mark.parametrize("size", [1, 1000, 4096, 8192, 10**9])
+def test_read_returns_the_same_body(tmp_path, size):
+    expected = b"".join(encoder(tmp_path))
+    body = encoder(tmp_path)
+    pieces = []
+    while True:
+        piece = body.read(size)
+        if not piece:
+            break
+        assert len(piece) <= size
+        pieces.append(piece)
+    assert b"".join(pieces) == expected
+    assert body.read() == b""
+
+
+def test_read_all(tmp_path):
+    expected = b"".join(encoder(tmp_path))
+    body = encoder(tmp_path)
+    assert body.read(10) + body.read() == expected
+
+
+def test_progress_reaches_the_length(tmp_path):
+    seen = []
+    body = encoder(tmp_path, progress=lambda sent, total: seen.append((sent, total)))
+    b"".join(body)
+    assert seen[-1] == (body.length, body.length)
+
+
+def test_unknown_length(tmp_path):
+    class Pipe(io.RawIOBase):
+        # not seekable and without a file descriptor
+        def __init__(self):
+            self.data = io.BytesIO(b"streamed")
+
+        def readable(self):
+            return True
+
+        def read(self, size=-1):
+            return self.data.read(size)
+
+    body = MultipartEncoder([("files", ("pipe.bin", Pipe()))])
+    assert body.length is None
+    with pytest.raises(TypeError):
+        len(body)
+    assert b"streamed" in b"".join(body)
@@ -0,0 +1,115 @@
+import io
+import os
+import threading
+import time
+
+import requests
+
+from vectoratorinteractor.pagecache import PageImageCache, PagePrefetcher
+
+
+def key(page):
+    return ("app_user", "project", "book.pdf", page)
+
+
+def objects(directory):
+    return [name for _, _, names in os.walk(directory / "objects") for name in names]
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    with PageImageCache(tmp_path) as cache:
+        cache.put(key(1), b"x" * 100)
+        cache.put(key(None), b"x" * 100)
+        assert (len(cache), cache.size, len(objects(tmp_path))) == (2, 100, 1)
+        # the blob stays while any key points to it
+        cache.put(key(1), b"y" * 50)
+        assert cache.get(key(None)) == b"x" * 100
+        assert (cache.size, len(objects(tmp_path))) == (150, 2)
+        assert cache.invalidate("app_user", "project") == 2
+        assert (cache.size, objects(tmp_path)) == (0, [])
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    with PageImageCache(tmp_path, max_bytes=250) as cache:
+        cache.put(key(1), b"1" * 100)
+        cache.put(key(2), b"2" * 100)
+        time.sleep(0.01)
+        assert cache.get(key(1)) == b"1" * 100
+        cache.put(key(3), b"3" * 100)
+        assert key(2) not in cache
+        assert key(1) in cache and key(3) in cache
+        assert (cache.size, cache.stats()["evictions"]) == (200, 1)
+        # a page bigger than the cap is still kept, everything else goes
+        cache.put(key(4), b"4" * 300)
+        assert len(cache) == 1 and cache.get(key(4)) == b"4" * 300
+
+
+def test_index_survives_a_reopen(tmp_path):
+    with PageImageCache(tmp_path) as cache:
+        cache.put(key(1), b"page")
+    with PageImageCache(tmp_path) as cache:
+        assert cache.size == 4
+        assert bytes(cache.mmap(key(1))) == b"page"
+
+
+class PageTransport:
+    """Object store stand-in, pages above last_page are missing."""
+
+    def __init__(self, last_page=100):
+        self.last_page = last_page
+        self.downloads = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        page = int(url.rsplit("/", 1)[1])
+        with self._lock:
+            self.downloads.append(page)
+        time.sleep(0.05)
+        response = requests.Response()
+        response.url = url
+        if page > self.last_page:
+            response.status_code = 404
+            response.raw = io.BytesIO(b"missing")
+        else:
+            response.status_code = 200
+            response.raw = io.BytesIO(b"png %d" % page)
+        return response
+
+
+class FakeInteractor:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def apporuserKey(self, apporuser):
+        return "app_user"
+
+    def getPdfPagePicture(self, project, pdffilename, page, apporuser):
+        return f"https://bucket/{page}"
+
+
+def test_concurrent_requests_share_one_download(tmp_path):
+    transport = PageTransport()
+    with PageImageCache(tmp_path) as cache, PagePrefetcher(
+        FakeInteractor(transport), cache
+    ) as prefetcher:
+        threads = [
+            threading.Thread(target=prefetcher.getPage, args=("project", "book.pdf", 3))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert transport.downloads == [3]
+        assert cache.get(key(3)) == b"png 3"
+
+
+def test_prefetch_document_stops_at_the_first_missing_page(tmp_path):
+    transport = PageTransport(last_page=5)
+    with PageImageCache(tmp_path) as cache, PagePrefetcher(
+        FakeInteractor(transport), cache, max_workers=4
+    ) as prefetcher:
+        paths = prefetcher.prefetchDocument("project", "book.pdf")
+        assert len(paths) == 6
+        assert prefetcher.prefetchDocument("project", "book.pdf", max_pages=6) == paths
+    assert sorted(set(transport.downloads)) == list(range(8))
@@ -0,0 +1,311 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from vectoratorinteractor.asyncinteractor import AsyncVectoratorInteractor
+from vectoratorinteractor.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    Hedging,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    kwargs.setdefault("failure_threshold", 2)
+    kwargs.setdefault("recovery_timeout", 10.0)
+    return CircuitBreaker("test", clock=Clock(), **kwargs)
+
+
+def trip(b: CircuitBreaker):
+    for _ in range(b.failure_threshold):
+        b.before()
+        b.record(False)
+
+
+def test_opens_after_consecutive_failures():
+    b = breaker(failure_threshold=3)
+    for _ in range(2):
+        b.before()
+        b.record(False)
+    b.before()
+    b.record(True)
+    assert b.state == CLOSED and b.failures == 0
+    trip(b)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpenError) as raised:
+        b.before()
+    assert raised.value.status_code == 503
+    assert b.stats()["rejected"] == 1
+
+
+def test_half_open_trial_closes_or_reopens():
+    transitions = []
+    b = breaker(on_transition=[lambda *t: transitions.append(t[1:])])
+    trip(b)
+    b.clock.now = 10.0
+    assert b.available()
+    b.before()
+    assert b.state == HALF_OPEN
+    # only half_open_max_calls trials at once
+    assert not b.available()
+    with pytest.raises(CircuitOpenError):
+        b.before()
+    b.record(False)
+    assert b.state == OPEN
+    b.clock.now = 20.0
+    b.before()
+    b.record_status(200)
+    assert b.state == CLOSED
+    assert transitions == [
+        (CLOSED, OPEN),
+        (OPEN, HALF_OPEN),
+        (HALF_OPEN, OPEN),
+        (OPEN, HALF_OPEN),
+        (HALF_OPEN, CLOSED),
+    ]
+
+
+def test_server_errors_count_as_failures():
+    b = breaker()
+    for status in (500, 503):
+        b.before()
+        b.record_status(status)
+    assert b.state == OPEN
+
+
+def test_cancel_releases_half_open_trial():
+    b = breaker()
+    trip(b)
+    b.clock.now = 10.0
+    b.before()
+    b.cancel()
+    assert b.state == HALF_OPEN and b.failures == b.failure_threshold
+    b.before()
+    b.record(True)
+    assert b.state == CLOSED
+
+
+def test_clone_copies_settings_not_state():
+    b = breaker(failure_threshold=4, half_open_max_calls=2)
+    trip(b)
+    clone = b.clone("other")
+    assert clone.state == CLOSED and clone.name == "other"
+    assert (clone.failure_threshold, clone.half_open_max_calls) == (4, 2)
+    assert clone.clock is b.clock
+
+
+class SlowTransport:
+    """AsyncHttpTransport stand-in, every request waits delay seconds."""
+
+    def __init__(self, delay: float = 0.0, error: bool = False):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def request(self, method, url, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json=[], request=httpx.Request(method, url))
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise httpx.ConnectError("refused")
+        yield httpx.Response(200, content=b"", request=httpx.Request(method, url))
+
+    async def aclose(self):
+        pass
+
+
+def interactor(transport, b) -> AsyncVectoratorInteractor:
+    return AsyncVectoratorInteractor(
+        "app",
+        "user",
+        "http://vectorator",
+        transport,
+        single_flight=False,
+        circuit_breaker=b,
+    )
+
+
+def test_cancelled_trial_call_releases_its_slot():
+    b = breaker(recovery_timeout=0.0)
+    trip(b)
+
+    async def run():
+        av = interactor(SlowTransport(delay=10), b)
+        task = asyncio.ensure_future(av.getChats("project"))
+        await asyncio.sleep(0.01)
+        assert b.state == HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        av.transport = SlowTransport()
+        await av.getChats("project")
+
+    asyncio.run(run())
+    assert b.state == CLOSED
+
+
+def test_stream_connection_errors_open_the_circuit():
+    b = breaker()
+
+    async def run():
+        av = interactor(SlowTransport(error=True), b)
+        for _ in range(b.failure_threshold):
+            with pytest.raises(httpx.ConnectError):
+                async for _ in av.stream_answer("user", "project", []):
+                    pass
+        with pytest.raises(CircuitOpenError):
+            async for _ in av.stream_answer("user", "project", []):
+                pass
+
+    asyncio.run(run())
+    assert b.stats()["state"] == OPEN
+
+
+def delayed(delays):
+    # fn for Hedging.call, the nth call sleeps delays[n] and returns n
+    calls = iter(range(len(delays)))
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            n = next(calls)
+        time.sleep(delays[n])
+        return n
+
+    return fn
+
+
+def test_fast_call_is_not_hedged():
+    hedging = Hedging(delay=0.05)
+    assert hedging.call(delayed([0.0, 0.0])) == 0
+    assert hedging.stats()["hedges"] == 0
+    hedging.close()
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    hedging = Hedging(delay=0.02)
+    start = time.monotonic()
+    assert hedging.call(delayed([1.0, 0.0])) == 1
+    assert time.monotonic() - start < 0.5
+    assert hedging.stats()["hedges"] == 1
+    assert hedging.stats()["hedge_wins"] == 1
+    hedging.close()
+
+
+def test_hedges_are_limited_by_the_budget():
+    hedging = Hedging(delay=0.0, budget=0.0, burst=1.0)
+    hedging.call(delayed([0.05, 0.0]))
+    hedging.call(delayed([0.05, 0.0]))
+    assert hedging.stats()["hedges"] == 1
+    hedging.close()
+
+
+def test_hedging_raises_when_both_copies_fail():
+    def fail():
+        time.sleep(0.02)
+        raise ValueError("boom")
+
+    hedging = Hedging(delay=0.0)
+    with pytest.raises(ValueError):
+        hedging.call(fail)
+    hedging.close()
+
+
+def test_async_hedge_wins_and_loser_is_cancelled():
+    hedging = Hedging(delay=0.02)
+    started, cancelled = [], []
+
+    async def fn():
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(1.0 if n == 0 else 0.0)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return n
+
+    async def run():
+        result = await hedging.acall(fn)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 1
+    assert cancelled == [0]
+    assert hedging.stats()["hedge_wins"] == 1
+
+
+class Answer:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_server_error_does_not_win_the_hedge():
+    answers = [Answer(200), Answer(503)]
+    slow_ok, fast_error = answers
+
+    def fn():
+        # the primary answers 200 late, the hedge 503 right away
+        answer = answers.pop(0)
+        time.sleep(0.1 if answer is slow_ok else 0.0)
+        return answer
+
+    hedging = Hedging(delay=0.02)
+    assert hedging.call(fn) is slow_ok
+    assert fast_error.closed and not slow_ok.closed
+    assert hedging.stats()["hedge_wins"] == 0
+    hedging.close()
+
+
+def test_losing_answer_is_closed():
+    answers = [Answer(200), Answer(200)]
+    slow, fast = answers
+
+    def fn():
+        answer = answers.pop(0)
+        time.sleep(0.1 if answer is slow else 0.0)
+        return answer
+
+    hedging = Hedging(delay=0.02)
+    assert hedging.call(fn) is fast
+    time.sleep(0.2)
+    assert slow.closed and not fast.closed
+    hedging.close()
+
+
+def test_both_server_errors_return_the_last_answer():
+    answers = [Answer(500), Answer(502)]
+
+    def fn():
+        answer = answers.pop(0)
+        time.sleep(0.05 if answer.status_code == 500 else 0.0)
+        return answer
+
+    hedging = Hedging(delay=0.02)
+    assert hedging.call(fn).status_code == 500
+    hedging.close()
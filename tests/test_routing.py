@@ -0,0 +1,154 @@
+import io
+from collections import Counter
+
+import pytest
+import requests
+
+from vectoratorinteractor.resilience import CircuitBreaker, CircuitOpenError
+from vectoratorinteractor.routing import BackendRouter, HashRing, split_urls
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+
+NODES = [f"http://backend-{i}" for i in range(4)]
+KEYS = [f"app_user{i}" for i in range(4000)]
+
+
+def owners(ring: HashRing):
+    return {key: next(ring.nodes(key)) for key in KEYS}
+
+
+def test_keys_spread_evenly():
+    counts = Counter(owners(HashRing(NODES)).values())
+    assert set(counts) == set(NODES)
+    expected = len(KEYS) / len(NODES)
+    assert all(abs(count - expected) < expected * 0.25 for count in counts.values())
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    ring.add("http://backend-4")
+    after = owners(ring)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "http://backend-4" for key in moved)
+    assert abs(len(moved) / len(KEYS) - 1 / 5) < 0.07
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    ring.remove(NODES[0])
+    after = owners(ring)
+    for key in KEYS:
+        if before[key] != NODES[0]:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != NODES[0]
+
+
+def test_nodes_yields_each_node_once_owner_first():
+    ring = HashRing(NODES)
+    order = list(ring.nodes("app_user"))
+    assert sorted(order) == sorted(NODES)
+    assert order[0] == next(ring.nodes("app_user"))
+    assert list(HashRing().nodes("app_user")) == []
+
+
+def router(**kwargs) -> BackendRouter:
+    return BackendRouter(NODES, health_interval=0, **kwargs)
+
+
+def test_tenant_calls_stick_to_their_owner():
+    r = router()
+    owner = r.route("app_user")
+    assert all(r.route("app_user", "chat") == owner for _ in range(10))
+    assert r.route("app_user") == next(r._ring.nodes("app_user"))
+
+
+def test_tenant_calls_do_not_fail_over():
+    r = router(breaker_factory=lambda url: CircuitBreaker(url, failure_threshold=1))
+    owner = r.route("app_user")
+    breaker = r.backend(owner).breaker
+    breaker.before()
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError) as raised:
+        r.route("app_user")
+    assert raised.value.status_code == 503
+    r.backend(owner).breaker.record(True)
+    r.backend(owner).healthy = False
+    with pytest.raises(CircuitOpenError):
+        r.route("app_user", "createChat")
+
+
+def test_stateless_calls_go_to_least_outstanding_available_backend():
+    r = router()
+    backends = {b.url: b for b in r.backends}
+    for url, backend in backends.items():
+        if url != NODES[2]:
+            backend.acquire()
+    assert r.route("app_user", "presigned_url") == NODES[2]
+    backends[NODES[2]].healthy = False
+    assert r.route("app_user", "presigned_url") != NODES[2]
+
+
+def test_backend_matches_request_urls_by_prefix():
+    r = router()
+    assert r.backend(NODES[1] + "/chat/a/p/") is r.backends[1]
+    assert r.backend("http://backend-10/chat") is None
+
+
+def test_split_urls_uses_the_breaker_as_template():
+    template = CircuitBreaker(failure_threshold=7)
+    url, r, owned = split_urls(NODES, None, template)
+    try:
+        assert url == NODES[0] and owned
+        assert all(b.breaker.failure_threshold == 7 for b in r.backends)
+        assert all(b.breaker is not template for b in r.backends)
+    finally:
+        r.close()
+    with pytest.raises(ValueError):
+        split_urls(NODES[0], router(), template)
+
+
+class RecordingTransport:
+    """HttpTransport stand-in that answers every request with an empty list."""
+
+    def __init__(self):
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.raw = io.BytesIO(b"[]")
+        return response
+
+    def close(self):
+        pass
+
+
+def backend_of(r: BackendRouter, url: str) -> str:
+    return r.backend(url).url
+
+
+def test_stream_calls_go_to_the_tenant_backend():
+    transport = RecordingTransport()
+    r = router()
+    vi = VectoratorInteractor("app", "", transport=transport, router=r)
+    for i in range(50):
+        user = f"user{i}"
+        vi.getChats("project", user)
+        chunks = vi.stream_answer(vi.apporuserKey(user), "project", [])
+        assert b"".join(chunks) == b"[]"
+        chats, stream = transport.urls[-2:]
+        assert backend_of(r, stream) == backend_of(r, chats)
+
+
+def test_streams_hold_their_backend_until_closed():
+    r = router()
+    vi = VectoratorInteractor("app", "", transport=RecordingTransport(), router=r)
+    chunks = vi.stream_answer("app_user", "project", [])
+    backend = r.backend(r.route("app_user"))
+    assert backend.outstanding == 1
+    list(chunks)
+    assert backend.outstanding == 0
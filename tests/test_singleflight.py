@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from vectoratorinteractor.singleflight import (
+    AsyncSingleFlight,
+    SingleFlight,
+    flight_key,
+)
+
+
+def test_flight_key_ignores_param_order():
+    assert flight_key("GET", "u", {"a": 1, "b": 2}) == flight_key(
+        "GET", "u", {"b": 2, "a": 1}
+    )
+    assert flight_key("GET", "u") == flight_key("GET", "u", {})
+    assert flight_key("GET", "u") != flight_key("POST", "u")
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "key", fn) for _ in range(8)]
+        while flight.stats()["shared"] < 7:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [future.result(5) for future in futures]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 1, "shared": 7, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise KeyError("boom")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "key", fn) for _ in range(4)]
+        while flight.stats()["shared"] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(KeyError):
+                future.result(5)
+    # nothing is kept, the next call runs again
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["calls"] == 2
+
+
+def test_async_calls_are_coalesced():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(8)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 1, "shared": 7, "in_flight": 0}
+
+
+def test_async_errors_reach_every_waiter():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise KeyError("boom")
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do("key", fn) for _ in range(4)), return_exceptions=True
+        )
+
+    assert all(isinstance(result, KeyError) for result in asyncio.run(run()))
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_the_others():
+    flight = AsyncSingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", fn))
+        second = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert cancelled == []
+
+
+def test_cancelling_every_waiter_cancels_the_call():
+    flight = AsyncSingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        waiters = [asyncio.ensure_future(flight.do("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert flight.stats()["in_flight"] == 0
+        # a later caller starts a new call instead of joining the cancelled one
+        return await flight.do("key", lambda: asyncio.sleep(0, "again"))
+
+    assert asyncio.run(run()) == "again"
+    assert cancelled == [1]
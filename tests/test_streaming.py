@@ -0,0 +1,66 @@
+from vectoratorinteractor.streaming import EventDecoder, TokenDecoder
+
+
+def feed_all(decoder, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events + decoder.flush()
+
+
+def test_ndjson_lines_are_emitted_without_flush():
+    decoder = EventDecoder()
+    for token in "abc":
+        events = decoder.feed(b'{"token":"%s"}\n' % token.encode())
+        assert [e.data for e in events] == [{"token": token}]
+    assert decoder.flush() == []
+
+
+def test_ndjson_line_split_over_chunks():
+    decoder = EventDecoder()
+    assert decoder.feed(b'{"tok') == []
+    assert decoder.feed(b'en":"a"}\r') == []
+    assert [e.data for e in decoder.feed(b'\n{"token"')] == [{"token": "a"}]
+    # an incomplete last line is only emitted by flush, as the raw string
+    assert [e.data for e in decoder.flush()] == ['{"token"']
+
+
+def test_sse_frames_split_over_chunks():
+    body = b'event: answer\r\ndata: {"a": 1}\r\nid: 7\r\n\r\n: ping\n\ndata: x\ndata: y\n\n'
+    events = feed_all(EventDecoder(), [body[i : i + 3] for i in range(0, len(body), 3)])
+    assert [(e.index, e.event, e.data, e.id) for e in events] == [
+        (0, "answer", {"a": 1}, "7"),
+        (1, "message", "x\ny", None),
+    ]
+
+
+def test_sse_frame_is_held_until_blank_line():
+    decoder = EventDecoder()
+    assert decoder.feed(b"data: 1\n") == []
+    assert [e.data for e in decoder.feed(b"\n")] == [1]
+
+
+def test_mixed_ndjson_and_sse_keep_order():
+    events = feed_all(EventDecoder(), [b'{"a":1}\n\nevent: x\ndata: 2\n\n{"b":3}\n'])
+    assert [(e.event, e.data) for e in events] == [
+        ("message", {"a": 1}),
+        ("x", 2),
+        ("message", {"b": 3}),
+    ]
+
+
+def test_token_decoder_holds_back_split_characters():
+    decoder = TokenDecoder()
+    encoded = "grüße".encode()
+    tokens = feed_all(decoder, [encoded[:3], encoded[3:]])
+    assert "".join(t.text for t in tokens) == "grüße"
+    assert [t.index for t in tokens] == list(range(len(tokens)))
+
+
+def test_chunk_with_many_lines():
+    lines = 40000
+    body = b"".join(b'{"i":%d}\n' % i for i in range(lines))
+    decoder = EventDecoder()
+    events = decoder.feed(body[:-5]) + decoder.feed(body[-5:])
+    assert [e.data["i"] for e in events] == list(range(lines))
+    assert decoder._buffer == ""
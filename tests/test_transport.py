@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from vectoratorinteractor.transport import AsyncHttpTransport, HttpTransport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        server = self.server
+        server.requests += 1
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    do_GET = do_POST = do_PUT = _answer
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = httpd.connections = 0
+    httpd.statuses = []
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_requests_reuse_one_connection(server):
+    with HttpTransport() as transport:
+        for _ in range(5):
+            assert transport.request("GET", url(server)).status_code == 200
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+def test_idempotent_requests_are_retried(server):
+    server.statuses = [503, 502]
+    with HttpTransport(backoff_factor=0) as transport:
+        assert transport.request("GET", url(server)).status_code == 200
+    assert server.requests == 3
+
+
+@pytest.mark.parametrize("method", ["POST", "PUT"])
+def test_other_requests_are_not_retried(server, method):
+    server.statuses = [503]
+    with HttpTransport(backoff_factor=0) as transport:
+        assert transport.request(method, url(server)).status_code == 503
+    assert server.requests == 1
+
+
+def test_closed_transport_refuses_requests(server):
+    transport = HttpTransport()
+    transport.close()
+    with pytest.raises(RuntimeError):
+        transport.request("GET", url(server))
+
+
+def test_async_retries_idempotent_requests_only():
+    statuses = []
+
+    def handler(request):
+        statuses.append(request.method)
+        return httpx.Response(503 if len(statuses) % 3 else 200)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with AsyncHttpTransport(backoff_factor=0, client=client) as transport:
+            got = await transport.request("GET", "http://vectorator/")
+            assert (got.status_code, got.extensions["retries"]) == (200, 2)
+            statuses.clear()
+            got = await transport.request("PUT", "http://vectorator/")
+            assert got.status_code == 503
+
+    asyncio.run(run())
+    assert statuses == ["PUT"]
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+from vectoratorinteractor.schemas import QuickSearchDocument
+from vectoratorinteractor.typeahead import AsyncQuickSearchSession, QuickSearchSession
+
+
+def results(query):
+    return [
+        QuickSearchDocument(
+            score=1,
+            filename=f"{query}.pdf",
+            content=f"{query} invoice text",
+            fullcontent=query,
+            timestamp="2024-01-01",
+        )
+    ]
+
+
+class FakeInteractor:
+    """quicksearch blocks for the queries in slow until they are released."""
+
+    def __init__(self, slow=()):
+        self.queries = []
+        self.started = {query: threading.Event() for query in slow}
+        self.release = {query: threading.Event() for query in slow}
+
+    def apporuserKey(self, apporuser):
+        return "app_user"
+
+    def quicksearch(self, project, query, apporuser):
+        self.queries.append(query)
+        if query in self.release:
+            self.started[query].set()
+            self.release[query].wait(5)
+        return results(query)
+
+
+def test_stale_response_is_dropped():
+    interactor = FakeInteractor(slow=["inv"])
+    updates = []
+    with QuickSearchSession(interactor, "project", updates.append, debounce=0) as s:
+        first = s.update("inv")
+        assert interactor.started["inv"].wait(5)
+        second = s.update("xyz")
+        assert second.result(5) == results("xyz")
+        interactor.release["inv"].set()
+        assert first.cancelled()
+        # wait for the stale request still running in the background
+        s._executor.shutdown(wait=True)
+    assert [(u.query, u.provisional) for u in updates] == [("xyz", False)]
+    # the stale answer still went to the cache
+    assert s.cache.get(s._key, "inv") == results("inv")
+    assert s.stats()["stale"] == 1
+
+
+def test_debounce_sends_only_the_last_query():
+    interactor = FakeInteractor()
+    with QuickSearchSession(interactor, "project", debounce=0.2) as session:
+        futures = [session.update(query) for query in ("i", "in", "inv")]
+        assert futures[-1].result(5) == results("inv")
+        assert all(future.cancelled() for future in futures[:-1])
+    assert interactor.queries == ["inv"]
+
+
+def test_cached_and_provisional_results():
+    interactor = FakeInteractor()
+    updates = []
+    with QuickSearchSession(interactor, "project", updates.append, debounce=0) as s:
+        s.update("inv").result(5)
+        assert s.update("inv").result(5) == results("inv")
+        s.update("invoice").result(5)
+    assert interactor.queries == ["inv", "invoice"]
+    assert [(u.query, u.cached, u.provisional) for u in updates] == [
+        ("inv", False, False),
+        ("inv", True, False),
+        # narrowed down from "inv" until the real answer arrives
+        ("invoice", False, True),
+        ("invoice", False, False),
+    ]
+    assert updates[2].documents == results("inv")
+
+
+class AsyncFakeInteractor(FakeInteractor):
+    async def quicksearch(self, project, query, apporuser):
+        self.queries.append(query)
+        if query in self.release:
+            self.started[query].set()
+            await asyncio.sleep(0.2)
+        return results(query)
+
+
+def test_async_superseded_query_is_cancelled():
+    async def main():
+        interactor = AsyncFakeInteractor(slow=["inv"])
+        updates = []
+        session = AsyncQuickSearchSession(
+            interactor, "project", updates.append, debounce=0
+        )
+        first = session.update("inv")
+        while not interactor.started["inv"].is_set():
+            await asyncio.sleep(0.01)
+        assert await session.search("xyz") == results("xyz")
+        await session.aclose()
+        return first, updates, session
+
+    first, updates, session = asyncio.run(main())
+    assert first.cancelled()
+    assert [u.query for u in updates] == ["xyz"]
+    assert session.stats()["stale"] == 1
@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timezone
+
+import requests
+
+from vectoratorinteractor.schemas import ChatWithMessagesPD, ProcessingState
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+from vectoratorinteractor.waiting import WaitPolicy
+
+CHAT = ChatWithMessagesPD(
+    id=1,
+    name="chat",
+    apporuser="app_user",
+    project="project",
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    processing_state=ProcessingState.PROCESSING,
+)
+
+
+class EndlessBody:
+    """urllib3 response stand-in whose stream only ends once it is shut down."""
+
+    def __init__(self):
+        self.shut = threading.Event()
+
+    def stream(self, chunk_size, decode_content=True):
+        yield b"data: 1\n\n"
+        self.shut.wait(5)
+
+    def shutdown(self):
+        self.shut.set()
+
+    def close(self):
+        pass
+
+
+class ChatTransport:
+    """Answers status polls with DONE and streams events until shut down."""
+
+    def __init__(self):
+        self.body = EndlessBody()
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        if kwargs.get("stream"):
+            response.raw = self.body
+        elif "/status/" in url:
+            response._content = b'"DONE"'
+        else:
+            response._content = (
+                CHAT.model_copy(update={"processing_state": ProcessingState.DONE})
+                .model_dump_json()
+                .encode()
+            )
+        return response
+
+    def close(self):
+        pass
+
+
+def test_wait_closes_the_events_stream_when_polling_finishes_first():
+    transport = ChatTransport()
+    vi = VectoratorInteractor("app", "user", transport=transport)
+    events = vi.stream_answer_events("app_user", "project", [])
+    result = vi.waitForChat(
+        "project", CHAT, policy=WaitPolicy(initial_delay=0.01), events=events
+    )
+    assert result.chat.processing_state == ProcessingState.DONE
+    assert not result.woken_by_event
+    assert transport.body.shut.is_set() and events.closed
+    for thread in threading.enumerate():
+        if thread.name == "vectorator-events":
+            thread.join(1)
+            assert not thread.is_alive()
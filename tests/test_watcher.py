@@ -0,0 +1,80 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.schemas import ChatWithMessagesPD, ProcessingState
+from vectoratorinteractor.waiting import WaitPolicy
+from vectoratorinteractor.watcher import ChatWatcher
+
+FAST = WaitPolicy(timeout=5, initial_delay=0.0, max_delay=0.0, jitter=0.0)
+
+
+class FakeInteractor:
+    """Chats turn DONE after done_after status polls, None never finishes."""
+
+    def __init__(self, done_after=None):
+        self.done_after = done_after
+        self.polls = []
+        self._lock = threading.Lock()
+
+    def getChatStatus(self, project, chat_id, apporuser):
+        with self._lock:
+            self.polls.append((time.monotonic(), chat_id))
+            count = sum(1 for _, polled in self.polls if polled == chat_id)
+        if self.done_after is not None and count >= self.done_after:
+            return ProcessingState.DONE
+        return ProcessingState.PROCESSING
+
+    def getChat(self, project, chat_id, apporuser):
+        return ChatWithMessagesPD(
+            id=chat_id,
+            name="chat",
+            apporuser="app_user",
+            project=project,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            processing_state=ProcessingState.DONE,
+        )
+
+
+def test_polls_stay_under_the_rate_limit():
+    interactor = FakeInteractor(done_after=3)
+    with ChatWatcher(interactor, max_requests_per_second=50, policy=FAST) as watcher:
+        futures = [watcher.watch("project", chat_id) for chat_id in range(5)]
+        chats = [future.result(5) for future in futures]
+    assert [chat.id for chat in chats] == list(range(5))
+    times = sorted(polled for polled, _ in interactor.polls)
+    assert len(times) == 15
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 1 / 50 * 0.8
+    assert watcher.polls == 15
+
+
+def test_same_chat_shares_one_poll_loop():
+    interactor = FakeInteractor(done_after=2)
+    with ChatWatcher(interactor, max_requests_per_second=100, policy=FAST) as watcher:
+        first = watcher.watch("project", 7)
+        second = watcher.watch("project", 7)
+        assert first.result(5).id == second.result(5).id == 7
+    assert len(interactor.polls) == 2
+
+
+def test_timeout_raises_408():
+    policy = WaitPolicy(timeout=0.1, initial_delay=0.02, max_delay=0.02, jitter=0.0)
+    with ChatWatcher(FakeInteractor(), max_requests_per_second=100) as watcher:
+        future = watcher.watch("project", 1, policy=policy)
+        with pytest.raises(VectoratorError) as raised:
+            future.result(5)
+    assert raised.value.status_code == 408
+    assert watcher.pending == 0
+
+
+def test_close_cancels_pending_watches():
+    watcher = ChatWatcher(FakeInteractor(), max_requests_per_second=100)
+    future = watcher.watch("project", 1)
+    watcher.close()
+    assert future.cancelled()
+    with pytest.raises(RuntimeError):
+        watcher.watch("project", 2)
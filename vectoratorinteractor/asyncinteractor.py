@@ -0,0 +1,973 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from vectoratorinteractor.batch import BatchResult, arun_bounded
+from vectoratorinteractor.cache import (
+    CHAT_ENDPOINTS,
+    DOCUMENT_ENDPOINTS,
+    ResponseCache,
+    TTLCache,
+    presigned_ttl,
+)
+from vectoratorinteractor.compact import CompactChat, compaction
+from vectoratorinteractor.decoding import (
+    JSON_HEADERS,
+    JsonArraySplitter,
+    decode,
+    decode_items,
+    encode_messages,
+)
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.metrics import Metrics, body_size, instrumented
+from vectoratorinteractor.multipart import (
+    DEFAULT_CHUNK_SIZE,
+    MultipartEncoder,
+    ProgressCallback,
+    UploadSource,
+)
+from vectoratorinteractor.resilience import CircuitBreaker, Hedging
+from vectoratorinteractor.routing import BackendRouter, split_urls
+from vectoratorinteractor.schemas import (
+    ChatWithMessagesPD,
+    DocumentUploadRequestWithDocumentsPD,
+    FullDocumentWithPreview,
+    NewMessagePD,
+    Persona,
+    ProcessingState,
+    QuickSearchDocument,
+)
+from vectoratorinteractor.singleflight import AsyncSingleFlight, flight_key
+from vectoratorinteractor.streaming import AsyncParsedStream, EventDecoder, TokenDecoder
+from vectoratorinteractor.transport import AsyncHttpTransport
+from vectoratorinteractor.waiting import TERMINAL_STATES, WaitPolicy, WaitResult
+
+if TYPE_CHECKING:
+    # only for annotations, fastapi and the sqlmodel tables are loaded lazily
+    from fastapi import UploadFile
+
+    from vectoratorinteractor.models import ChatMessage, DocumentUploadRequest, Project
+
+
+class AsyncVectoratorInteractor:
+    """asyncio version of VectoratorInteractor with the same method surface.
+
+    All calls share one httpx connection pool, so many concurrent calls can run
+    on a single event loop without blocking it.
+    """
+
+    def __init__(
+        self,
+        mainappname: str = "vinteractor",
+        apporuserdefault: str = "",
+        vectoratorurl: Union[
+            str, Sequence[str]
+        ] = "http://vectorator-service.vectorator.svc.cluster.local:8000",
+        transport: Optional[AsyncHttpTransport] = None,
+        presigned_cache_size: int = 4096,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: bool = True,
+        metrics: Optional[Metrics] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedging: Optional[Hedging] = None,
+        router: Optional[BackendRouter] = None,
+    ):
+        self.mainappname = mainappname
+        # several backend urls or a BackendRouter shard tenants over several
+        # deployments, vectoratorurl is then the first of them. every backend
+        # gets its own breaker, circuit_breaker is their template
+        self.vectoratorurl, self.router, self._ownsRouter = split_urls(
+            vectoratorurl, router, circuit_breaker
+        )
+        self.apporuserdefault = apporuserdefault
+        # presigned urls for files, page pictures and covers are cached for a
+        # fraction of the validity their expiry query parameters state
+        self.presignedCache = TTLCache(maxsize=presigned_cache_size)
+        # optional read-through cache for listings, off unless a ResponseCache
+        # is passed. mutations through this client invalidate it
+        self.responseCache = response_cache
+        # per-endpoint latency, bytes, status codes and request hooks, see Metrics
+        self.metrics = metrics
+        # fail fast while the backend is unhealthy, and hedge slow reads of the
+        # endpoints listed in hedging.endpoints (quicksearch by default)
+        self.circuitBreaker = circuit_breaker
+        self.hedging = hedging
+        self.singleFlight = AsyncSingleFlight() if single_flight else None
+        self.transport = transport if transport is not None else AsyncHttpTransport()
+
+    async def aclose(self):
+        if self.hedging is not None:
+            self.hedging.close()
+        if self._ownsRouter:
+            self.router.close()
+        await self.transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs):
+        # with a router every backend has its own breaker
+        backend = self.router.backend(url) if self.router is not None else None
+        breaker = backend.breaker if backend is not None else self.circuitBreaker
+        if breaker is None:
+            return await self._send(method, url, **kwargs)
+        breaker.before()
+        if backend is not None:
+            backend.acquire()
+        try:
+            response = await self._send(method, url, **kwargs)
+        except Exception:
+            breaker.record(False)
+            raise
+        except BaseException:
+            # cancelled, e.g. the losing copy of a hedged read, is no failure
+            breaker.cancel()
+            raise
+        finally:
+            if backend is not None:
+                backend.release()
+        breaker.record_status(response.status_code)
+        return response
+
+    def _base(self, apporuser: str, call: Optional[str] = None) -> str:
+        # backend url for the tenant, always vectoratorurl without a router
+        return self._tenantBase(self.apporuserKey(apporuser), call)
+
+    def _tenantBase(self, apporuserkey: str, call: Optional[str] = None) -> str:
+        if self.router is None:
+            return self.vectoratorurl
+        return self.router.route(apporuserkey, call)
+
+    async def _read(self, url: str, endpoint: str, **kwargs):
+        # idempotent GET, hedged when the endpoint is configured for it
+        hedging = self.hedging
+        if hedging is None or endpoint not in hedging.endpoints:
+            return await self._request("GET", url, **kwargs)
+        return await hedging.acall(lambda: self._request("GET", url, **kwargs))
+
+    async def _send(self, method: str, url: str, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return await self.transport.request(method, url, **kwargs)
+        record = metrics.begin(method, url, body_size(kwargs))
+        try:
+            response = await self.transport.request(method, url, **kwargs)
+        except Exception as e:
+            metrics.end(record, error=e)
+            raise
+        metrics.end(record, response)
+        return response
+
+    @asynccontextmanager
+    async def _openStream(self, endpoint: str, method: str, url: str, **kwargs):
+        backend = self.router.backend(url) if self.router is not None else None
+        breaker = backend.breaker if backend is not None else self.circuitBreaker
+        if breaker is not None:
+            breaker.before()
+        if backend is not None:
+            backend.acquire()
+        # the outcome is the status once the headers arrived, or the error
+        # opening the stream, like in _request
+        recorded = breaker is None
+        try:
+            async with self._sendStream(endpoint, method, url, **kwargs) as response:
+                if not recorded:
+                    recorded = True
+                    breaker.record_status(response.status_code)
+                yield response
+        except Exception:
+            if not recorded:
+                breaker.record(False)
+            raise
+        except BaseException:
+            if not recorded:
+                breaker.cancel()
+            raise
+        finally:
+            if backend is not None:
+                backend.release()
+
+    @asynccontextmanager
+    async def _sendStream(self, endpoint: str, method: str, url: str, **kwargs):
+        # streamed calls return lazily, so they are timed here instead of by
+        # @instrumented: time to first byte when the headers arrive, the
+        # latency of the call and the body size once the stream is closed
+        metrics = self.metrics
+        if metrics is None:
+            async with self.transport.stream(method, url, **kwargs) as response:
+                yield response
+            return
+        record = metrics.begin(method, url, body_size(kwargs), True, endpoint)
+        error = None
+        try:
+            async with self.transport.stream(method, url, **kwargs) as response:
+                metrics.end(record, response)
+                try:
+                    yield response
+                finally:
+                    metrics.add_bytes(endpoint, response.num_bytes_downloaded)
+        except BaseException as e:
+            error = e
+            if record.elapsed is None:
+                metrics.end(record, error=e)
+            raise
+        finally:
+            metrics.observe_call(endpoint, time.monotonic() - record.started, error)
+
+    async def _stream(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        chunk_size: Optional[int] = None,
+        **kwargs,
+    ):
+        async with self._openStream(endpoint, method, url, **kwargs) as response:
+            if not response.is_success:
+                await response.aread()
+                raise VectoratorError(
+                    status_code=response.status_code, detail=response.text
+                )
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def _cachedGet(
+        self, url: str, apporuserkey: str, project: Optional[str], endpoint: str
+    ) -> bytes:
+        cache = self.responseCache
+        if cache is None or not cache.enabled(endpoint):
+            response = await self._read(url, endpoint)
+            if not response.is_success:
+                raise VectoratorError(
+                    status_code=response.status_code, detail=response.text
+                )
+            return response.content
+        key = (apporuserkey, project, endpoint, url)
+        generation = cache.generation
+        entry, fresh = cache.lookup(key)
+        if fresh:
+            return entry.content
+        headers = entry.validators if entry is not None else {}
+        response = await self._read(url, endpoint, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            cache.refresh(key, entry, response.headers, generation)
+            return entry.content
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        return cache.store(key, response.content, response.headers, generation).content
+
+    async def _get(
+        self,
+        tp,
+        url: str,
+        apporuserkey: str,
+        project: Optional[str],
+        endpoint: str,
+        decoder: Optional[Callable[[bytes], Any]] = None,
+    ):
+        # identical reads that are in flight at the same time share one request
+        # and one decoded result, nothing is kept after the call finishes.
+        # decoder replaces decode(tp, ...), only reads with the same decoder
+        # share a result
+        async def fetch():
+            content = await self._cachedGet(url, apporuserkey, project, endpoint)
+            return decode(tp, content) if decoder is None else decoder(content)
+
+        if self.singleFlight is None:
+            return await fetch()
+        key = flight_key("GET", url, {"decoder": decoder} if decoder else None)
+        return await self.singleFlight.do(key, fetch)
+
+    def _invalidateResponses(
+        self, apporuserkey: str, project: Optional[str], *endpoints: str
+    ):
+        if self.responseCache is not None:
+            self.responseCache.invalidate(apporuserkey, project, endpoints or None)
+
+    def invalidatePresignedUrls(
+        self, project: Optional[str] = None, apporuser: str = ""
+    ) -> int:
+        if project is None and apporuser == "":
+            return self.presignedCache.invalidate()
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        return self.presignedCache.invalidate(
+            lambda key: key[0] == apporuserkey and project in (None, key[1])
+        )
+
+    async def _iterArray(
+        self, endpoint: str, url: str, tp, chunk_size: int
+    ) -> AsyncIterator:
+        splitter = JsonArraySplitter()
+        async for chunk in self._stream(endpoint, "GET", url, chunk_size):
+            for item in decode_items(tp, splitter.feed(chunk)):
+                yield item
+        splitter.close()
+
+    def apporuserKey(self, apporuser: str = "") -> str:
+        # the tenant key the backend stores as apporuser
+        return self.__getOrRaiseApporuserConstructor(apporuser)
+
+    def __getOrRaiseApporuserConstructor(self, apporuser: str):
+        if (
+            apporuser == ""
+            and self.mainappname == "vinteractor"
+            and self.apporuserdefault == ""
+        ):
+            raise ValueError(
+                "if self.mainappname and self.apporuserdefault are default you have to pass apporuser!"
+            )
+        elif apporuser is not None and apporuser != "":
+            return self.mainappname + "_" + apporuser
+        else:
+            return self.mainappname + "_" + self.apporuserdefault
+
+    @instrumented
+    async def uploadDocuments(
+        self,
+        project: str,
+        files: List[Union["UploadFile", UploadSource]],
+        apporuser: str = "",
+        highresmode: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> "DocumentUploadRequest":
+        url = (
+            self._base(apporuser)
+            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/upload/"
+        )
+        # the multipart body is streamed in chunk_size pieces instead of being
+        # built in memory, files can be UploadFiles, paths or open binary files
+        body = MultipartEncoder(
+            [("upload_files", f) for f in files], chunk_size, progress
+        )
+        headers = {"Content-Type": body.content_type}
+        if body.length is not None:
+            headers["Content-Length"] = str(body.length)
+        try:
+            response = await self._request(
+                "POST",
+                url,
+                content=body.__aiter__(),
+                headers=headers,
+                params={"highresmode": highresmode},
+            )
+        finally:
+            body.close()
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser),
+            project,
+            *DOCUMENT_ENDPOINTS,
+        )
+        from vectoratorinteractor.models import DocumentUploadRequest
+
+        return decode(DocumentUploadRequest, response.content)
+
+    @instrumented
+    async def getUploadRequests(
+        self, project: str, apporuser: str = ""
+    ) -> List[DocumentUploadRequestWithDocumentsPD]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = (
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/uploadrequests"
+        )
+        return await self._get(
+            List[DocumentUploadRequestWithDocumentsPD],
+            url,
+            apporuserkey,
+            project,
+            "uploadrequests",
+        )
+
+    @instrumented
+    async def getUploadRequestById(
+        self, project: str, uploadrequest_id: int, apporuser: str = ""
+    ) -> DocumentUploadRequestWithDocumentsPD:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = (
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/uploadrequests/{uploadrequest_id}"
+        )
+        return await self._get(
+            DocumentUploadRequestWithDocumentsPD,
+            url,
+            apporuserkey,
+            project,
+            "uploadrequest",
+        )
+
+    @instrumented
+    async def getProjects(self, apporuser: str) -> List[str]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/projects/{apporuserkey}/"
+        return await self._get(List[str], url, apporuserkey, None, "projects")
+
+    @instrumented
+    async def createProject(self, project: str, apporuser: str = "") -> "Project":
+        url = (
+            self._base(apporuser)
+            + f"/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/"
+        )
+        response = await self._request("POST", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), None, "projects"
+        )
+        from vectoratorinteractor.models import Project
+
+        return decode(Project, response.content)
+
+    @instrumented
+    async def listFiles(self, project: str, apporuser: str = "") -> List[str]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/documents/{apporuserkey}/{project}/s3files"
+        return await self._get(List[str], url, apporuserkey, project, "files")
+
+    @instrumented
+    async def getPresignedUrl(
+        self, project: str, filename: str, apporuser: str = "", validity_days: int = 7
+    ) -> str:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, filename, validity_days)
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
+        url = (
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{filename}"
+        )
+        response = await self._request(
+            "GET", url, params={"validityDays": validity_days}
+        )
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(
+            cachekey, presigned, presigned_ttl(presigned, validity_days)
+        )
+        return presigned
+
+    @instrumented
+    async def getPdfPagePicture(
+        self, project: str, pdffilename: str, page: int, apporuser: str = ""
+    ):
+        assert pdffilename.endswith(".pdf")
+        justfilename = pdffilename[:-4]
+        if "/" in justfilename:
+            justfilename = justfilename.split("/")[-1]
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, f"{justfilename}/{page}.png")
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
+        url = (
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{justfilename}/{page}.png"
+        )
+        response = await self._request("GET", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(cachekey, presigned, presigned_ttl(presigned))
+        return presigned
+
+    @instrumented
+    async def getCoverForBook(
+        self, project: str, filename: str, apporuser: str = ""
+    ) -> str:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, filename + ".png")
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
+        url = (
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{filename + '.png'}"
+        )
+        response = await self._request("GET", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(cachekey, presigned, presigned_ttl(presigned))
+        return presigned
+
+    @instrumented
+    async def deleteProjectFromBackend(self, project: str, apporuser: str = ""):
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/{apporuserkey}/{project}/"
+        response = await self._request("DELETE", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(apporuserkey, project)
+        self._invalidateResponses(apporuserkey, None, "projects")
+        self.invalidatePresignedUrls(project, apporuser)
+
+    @instrumented
+    async def quicksearch(
+        self, project: str, query: str, apporuser: str = ""
+    ) -> List[QuickSearchDocument]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = (
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/quicksearch/{query}"
+        )
+        return await self._get(
+            List[QuickSearchDocument], url, apporuserkey, project, "quicksearch"
+        )
+
+    # Document operations
+    @instrumented
+    async def getDocuments(
+        self, project: str, apporuser: str = ""
+    ) -> List[FullDocumentWithPreview]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/documents/{apporuserkey}/{project}"
+        return await self._get(
+            List[FullDocumentWithPreview], url, apporuserkey, project, "documents"
+        )
+
+    def iterDocuments(
+        self, project: str, apporuser: str = "", chunk_size: int = 64 * 1024
+    ) -> AsyncIterator[FullDocumentWithPreview]:
+        url = (
+            self._base(apporuser)
+            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}"
+        )
+        return self._iterArray(
+            "iterDocuments", url, FullDocumentWithPreview, chunk_size
+        )
+
+    @instrumented
+    async def getDocumentById(
+        self, project: str, document_id: int, apporuser: str = ""
+    ):
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = (
+            self._base(apporuser) + f"/documents/{apporuserkey}/{project}/{document_id}"
+        )
+        return await self._get(
+            FullDocumentWithPreview, url, apporuserkey, project, "document"
+        )
+
+    @instrumented
+    async def deleteDocumentById(
+        self, project: str, document_id: int, apporuser: str = ""
+    ):
+        url = (
+            self._base(apporuser)
+            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{document_id}"
+        )
+        response = await self._request("DELETE", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser),
+            project,
+            *DOCUMENT_ENDPOINTS,
+        )
+        # only the id is known here, so every url of the project is dropped
+        self.invalidatePresignedUrls(project, apporuser)
+
+    ### Chat routes
+    @instrumented
+    async def getChats(
+        self,
+        project: str,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[List[ChatWithMessagesPD], List[CompactChat]]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/"
+        compactor = compaction(compact, drop_fields)
+        return await self._get(
+            List[ChatWithMessagesPD],
+            url,
+            apporuserkey,
+            project,
+            "chats",
+            compactor.chats if compactor else None,
+        )
+
+    def iterChats(
+        self, project: str, apporuser: str = "", chunk_size: int = 64 * 1024
+    ) -> AsyncIterator[ChatWithMessagesPD]:
+        url = (
+            self._base(apporuser)
+            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/"
+        )
+        return self._iterArray("iterChats", url, ChatWithMessagesPD, chunk_size)
+
+    @instrumented
+    async def getChat(
+        self,
+        project: str,
+        chat_id: int,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/{chat_id}"
+        compactor = compaction(compact, drop_fields)
+        return await self._get(
+            ChatWithMessagesPD,
+            url,
+            apporuserkey,
+            project,
+            "chat",
+            compactor.chat if compactor else None,
+        )
+
+    @instrumented
+    async def getChatByName(
+        self,
+        project: str,
+        chatname: str,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = (
+            self._base(apporuser) + f"/chat/{apporuserkey}/{project}/by_name/{chatname}"
+        )
+        compactor = compaction(compact, drop_fields)
+        return await self._get(
+            ChatWithMessagesPD,
+            url,
+            apporuserkey,
+            project,
+            "chatbyname",
+            compactor.chat if compactor else None,
+        )
+
+    @instrumented
+    async def getChatStatus(
+        self, project: str, chat_id: int, apporuser: str = ""
+    ) -> ProcessingState:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/status/{chat_id}"
+        return await self._get(
+            ProcessingState, url, apporuserkey, project, "chatstatus"
+        )
+
+    @instrumented
+    async def createChat(
+        self, project: str, chatname: str, apporuser: str = ""
+    ) -> ChatWithMessagesPD:
+        url = (
+            self._base(apporuser)
+            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chatname}"
+        )
+
+        response = await self._request("POST", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        return decode(ChatWithMessagesPD, response.content)
+
+    @instrumented
+    async def renameChat(
+        self, project: str, chat_id: int, new_name: str, apporuser: str = ""
+    ) -> ChatWithMessagesPD:
+        url = (
+            self._base(apporuser)
+            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}/rename"
+        )
+        response = await self._request("PUT", url, params={"new_name": new_name})
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        return decode(ChatWithMessagesPD, response.content)
+
+    @instrumented
+    async def addMessage(
+        self,
+        project: str,
+        chat_id: int,
+        message: NewMessagePD,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
+        url = (
+            self._base(apporuser)
+            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}/message"
+        )
+        response = await self._request(
+            "PUT", url, content=message.model_dump_json().encode(), headers=JSON_HEADERS
+        )
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        compactor = compaction(compact, drop_fields)
+        if compactor:
+            return compactor.chat(response.content)
+        return decode(ChatWithMessagesPD, response.content)
+
+    @instrumented
+    async def deleteChat(self, project: str, chat_id: int, apporuser: str = ""):
+        url = (
+            self._base(apporuser)
+            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}"
+        )
+        response = await self._request("DELETE", url)
+        if not response.is_success:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+
+    # Bulk operations, results keep input order and failed items end up in
+    # BatchResult.errors instead of aborting the whole batch
+    @instrumented
+    async def getDocumentsByIds(
+        self,
+        project: str,
+        document_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 32,
+    ) -> BatchResult[FullDocumentWithPreview]:
+        return await arun_bounded(
+            lambda document_id: self.getDocumentById(project, document_id, apporuser),
+            document_ids,
+            max_concurrency,
+        )
+
+    @instrumented
+    async def getChatsByIds(
+        self,
+        project: str,
+        chat_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 32,
+    ) -> BatchResult[ChatWithMessagesPD]:
+        return await arun_bounded(
+            lambda chat_id: self.getChat(project, chat_id, apporuser),
+            chat_ids,
+            max_concurrency,
+        )
+
+    @instrumented
+    async def getUploadRequestsByIds(
+        self,
+        project: str,
+        uploadrequest_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 32,
+    ) -> BatchResult[DocumentUploadRequestWithDocumentsPD]:
+        return await arun_bounded(
+            lambda uploadrequest_id: self.getUploadRequestById(
+                project, uploadrequest_id, apporuser
+            ),
+            uploadrequest_ids,
+            max_concurrency,
+        )
+
+    # simplified question route
+    @instrumented
+    async def questionWaitUntilFinished(
+        self,
+        project: str,
+        question: str,
+        apporuser: str = "",
+        chat_id: int = None,
+        policy: Optional[WaitPolicy] = None,
+        events: Optional[AsyncIterable] = None,
+    ) -> ChatWithMessagesPD:
+        if chat_id is None:
+            chat = await self.createChat(
+                project, "new chat " + date.today().isoformat(), apporuser
+            )
+            chat_id = chat.id
+        chat = await self.addMessage(
+            project,
+            chat_id,
+            NewMessagePD(message=question, persona=Persona.user),
+            apporuser,
+        )
+        result = await self.waitForChat(project, chat, apporuser, policy, events)
+        if result.chat.processing_state == ProcessingState.FAILED:
+            raise VectoratorError(status_code=500, detail="Chat processing failed")
+        return result.chat
+
+    @instrumented
+    async def waitForChat(
+        self,
+        project: str,
+        chat: Union[int, ChatWithMessagesPD],
+        apporuser: str = "",
+        policy: Optional[WaitPolicy] = None,
+        events: Optional[AsyncIterable] = None,
+    ) -> WaitResult:
+        policy = policy or WaitPolicy()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + policy.timeout
+        chat_id = chat if isinstance(chat, int) else chat.id
+        status = None if isinstance(chat, int) else chat.processing_state
+        wake = None
+        watcher = None
+        if events is not None:
+            wake = asyncio.Event()
+
+            async def consume():
+                try:
+                    async for _ in events:
+                        pass
+                except Exception:
+                    return
+                wake.set()
+
+            watcher = asyncio.ensure_future(consume())
+        woken = False
+        polls = 0
+        delays = policy.delays()
+        try:
+            while status not in TERMINAL_STATES:
+                if status is not None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise VectoratorError(
+                            status_code=408,
+                            detail="Request timeout while processing chat",
+                        )
+                    delay = min(next(delays), remaining)
+                    if wake is None:
+                        await asyncio.sleep(delay)
+                    else:
+                        try:
+                            await asyncio.wait_for(wake.wait(), delay)
+                            woken = True
+                            wake = None
+                        except asyncio.TimeoutError:
+                            pass
+                status = await self.getChatStatus(project, chat_id, apporuser)
+                polls += 1
+        finally:
+            if watcher is not None and not watcher.done():
+                watcher.cancel()
+
+        return WaitResult(
+            chat=await self.getChat(project, chat_id, apporuser),
+            polls=polls,
+            waited=loop.time() - start,
+            woken_by_event=woken,
+        )
+
+    def stream_answer(
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
+    ):
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/"
+        body = encode_messages(messages)
+        if parsed:
+            return AsyncParsedStream(
+                lambda: self._openStream(
+                    "stream_answer", "POST", url, content=body, headers=JSON_HEADERS
+                ),
+                TokenDecoder(),
+            )
+        return self._stream(
+            "stream_answer", "POST", url, content=body, headers=JSON_HEADERS
+        )
+
+    def stream_answer_tokens(
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
+    ):
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/tokens"
+        body = encode_messages(messages)
+        if parsed:
+            return AsyncParsedStream(
+                lambda: self._openStream(
+                    "stream_answer_tokens",
+                    "POST",
+                    url,
+                    content=body,
+                    headers=JSON_HEADERS,
+                ),
+                TokenDecoder(),
+            )
+        return self._stream(
+            "stream_answer_tokens", "POST", url, content=body, headers=JSON_HEADERS
+        )
+
+    def stream_answer_events(
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
+    ):
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/events"
+        body = encode_messages(messages)
+        if parsed:
+            return AsyncParsedStream(
+                lambda: self._openStream(
+                    "stream_answer_events",
+                    "POST",
+                    url,
+                    content=body,
+                    headers=JSON_HEADERS,
+                ),
+                EventDecoder(),
+            )
+        return self._stream(
+            "stream_answer_events", "POST", url, content=body, headers=JSON_HEADERS
+        )
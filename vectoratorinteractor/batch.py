@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Sequence, TypeVar
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+
+class BatchResult(Generic[T]):
+    """Results of a bulk call in input order.
+
+    results[i] is None when the i-th item failed, its exception is then in
+    errors[i].
+    """
+
+    def __init__(self, size: int):
+        self.results: List[Optional[T]] = [None] * size
+        self.errors: Dict[int, Exception] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def raise_for_errors(self):
+        if self.errors:
+            raise self.errors[min(self.errors)]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, index: int) -> Optional[T]:
+        return self.results[index]
+
+    def __repr__(self):
+        return f"BatchResult(results={len(self.results)}, errors={len(self.errors)})"
+
+
+def run_bounded(
+    fn: Callable[[K], T], items: Sequence[K], max_concurrency: int = 8
+) -> BatchResult[T]:
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency has to be at least 1")
+    batch: BatchResult[T] = BatchResult(len(items))
+    if not items:
+        return batch
+
+    def call(index: int):
+        try:
+            batch.results[index] = fn(items[index])
+        except Exception as e:
+            batch.errors[index] = e
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as pool:
+        # list() waits for every item, errors are already captured in call
+        list(pool.map(call, range(len(items))))
+    return batch
+
+
+async def arun_bounded(
+    fn: Callable[[K], Awaitable[T]], items: Sequence[K], max_concurrency: int = 32
+) -> BatchResult[T]:
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency has to be at least 1")
+    batch: BatchResult[T] = BatchResult(len(items))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(index: int):
+        async with semaphore:
+            try:
+                batch.results[index] = await fn(items[index])
+            except Exception as e:
+                batch.errors[index] = e
+
+    await asyncio.gather(*(call(i) for i in range(len(items))))
+    return batch
@@ -0,0 +1,305 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# presigned urls are cached for this fraction of their validity so a cached url
+# is never handed out close to its expiry
+PRESIGNED_TTL_FRACTION = 0.8
+
+
+def presigned_ttl(url: str, validity_days: Optional[float] = None) -> float:
+    """Seconds a presigned url may be cached, 0 if its lifetime is unknown.
+
+    The lifetime is read from the url itself: X-Amz-Expires seconds after
+    X-Amz-Date for SigV4 urls, the Expires timestamp for SigV2 urls.
+    validity_days, the validity the url was requested with, is only the
+    fallback for urls that carry neither.
+    """
+    query = {key.lower(): value for key, value in parse_qsl(urlsplit(url).query)}
+    now = time.time()
+    try:
+        if "x-amz-expires" in query:
+            signed = now
+            if "x-amz-date" in query:
+                signed = (
+                    datetime.strptime(query["x-amz-date"], "%Y%m%dT%H%M%SZ")
+                    .replace(tzinfo=timezone.utc)
+                    .timestamp()
+                )
+            remaining = signed + int(query["x-amz-expires"]) - now
+        elif "expires" in query:
+            remaining = int(query["expires"]) - now
+        elif validity_days is not None:
+            remaining = validity_days * 24 * 60 * 60
+        else:
+            return 0
+    except ValueError:
+        return 0
+    return max(remaining, 0) * PRESIGNED_TTL_FRACTION
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries also expire after a ttl."""
+
+    def __init__(
+        self, maxsize: int = 4096, clock: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires, value = entry
+            if expires <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self.clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        # drops every key matching predicate, or everything without a predicate
+        with self._lock:
+            if predicate is None:
+                removed = len(self._data)
+                self._data.clear()
+                return removed
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > self.clock()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# seconds a cached response is served without asking the backend again, per
+# read endpoint. endpoints missing here or with a ttl of 0 are never cached
+DEFAULT_RESPONSE_TTLS: Dict[str, float] = {
+    "projects": 60.0,
+    "files": 30.0,
+    "documents": 30.0,
+    "document": 60.0,
+    "chats": 10.0,
+    "uploadrequests": 2.0,
+}
+
+# endpoints whose responses a mutation of documents or chats can change
+DOCUMENT_ENDPOINTS = (
+    "files",
+    "documents",
+    "document",
+    "uploadrequests",
+    "uploadrequest",
+    "quicksearch",
+)
+CHAT_ENDPOINTS = ("chats", "chat", "chatbyname", "chatstatus")
+
+# cache key of a response: (apporuserkey, project, endpoint, url)
+ResponseKey = Tuple[str, Optional[str], str, str]
+
+
+class CachedResponse:
+    __slots__ = ("content", "etag", "last_modified", "expires")
+
+    def __init__(self, content: bytes, headers: Mapping[str, str], expires: float):
+        self.content = content
+        self.etag = headers.get("ETag")
+        self.last_modified = headers.get("Last-Modified")
+        self.expires = expires
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        # conditional request headers, empty if the server sent no validators
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of raw read responses with per-endpoint ttls.
+
+    Fresh entries are served without a request. Expired entries that carry an
+    ETag or Last-Modified header stay until evicted and are revalidated with a
+    conditional request, a 304 answer refreshes them without a new download.
+    Responses marked Cache-Control no-store are never kept.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttls: Optional[Mapping[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttls = dict(DEFAULT_RESPONSE_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.clock = clock
+        self._data: "OrderedDict[ResponseKey, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every invalidation, a response fetched before an
+        # invalidation must not be stored afterwards
+        self.generation = 0
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def enabled(self, endpoint: str) -> bool:
+        return self.maxsize > 0 and self.ttls.get(endpoint, 0) > 0
+
+    def _count(self, endpoint: str, counter: str):
+        # caller holds self._lock
+        counters = self._counters.get(endpoint)
+        if counters is None:
+            counters = self._counters[endpoint] = dict.fromkeys(
+                ("hits", "misses", "revalidated", "evictions"), 0
+            )
+        counters[counter] += 1
+
+    def lookup(self, key: ResponseKey) -> Tuple[Optional[CachedResponse], bool]:
+        """Returns (entry, fresh), a stale entry is only returned for revalidation."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                if entry.expires > self.clock():
+                    self._count(key[2], "hits")
+                    return entry, True
+                if not entry.etag and not entry.last_modified:
+                    del self._data[key]
+                    entry = None
+            self._count(key[2], "misses")
+            return entry, False
+
+    def store(
+        self,
+        key: ResponseKey,
+        content: bytes,
+        headers: Mapping[str, str],
+        generation: int,
+    ) -> CachedResponse:
+        entry = CachedResponse(content, headers, self.clock() + self.ttls[key[2]])
+        if "no-store" in headers.get("Cache-Control", ""):
+            return entry
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._count(evicted[2], "evictions")
+        return entry
+
+    def refresh(
+        self,
+        key: ResponseKey,
+        entry: CachedResponse,
+        headers: Mapping[str, str],
+        generation: int,
+    ):
+        # the backend answered 304, the stored body is still current
+        with self._lock:
+            self._count(key[2], "revalidated")
+            if generation != self.generation or self._data.get(key) is not entry:
+                return
+            entry.expires = self.clock() + self.ttls[key[2]]
+            entry.etag = headers.get("ETag", entry.etag)
+            entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+
+    def invalidate(
+        self,
+        apporuserkey: Optional[str] = None,
+        project: Optional[str] = None,
+        endpoints: Optional[Iterable[str]] = None,
+    ) -> int:
+        # None matches everything, so invalidate() drops the whole cache
+        endpoints = None if endpoints is None else set(endpoints)
+        with self._lock:
+            self.generation += 1
+            keys = [
+                key
+                for key in self._data
+                if apporuserkey in (None, key[0])
+                and project in (None, key[1])
+                and (endpoints is None or key[2] in endpoints)
+            ]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            totals = dict.fromkeys(("hits", "misses", "revalidated", "evictions"), 0)
+            for endpoint, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                endpoints[endpoint] = dict(
+                    counters,
+                    hit_rate=counters["hits"] / lookups if lookups else 0.0,
+                )
+                for name, value in counters.items():
+                    totals[name] += value
+            lookups = totals["hits"] + totals["misses"]
+            # revalidated lookups count as misses but cost no body download
+            return dict(
+                totals,
+                size=len(self._data),
+                maxsize=self.maxsize,
+                hit_rate=totals["hits"] / lookups if lookups else 0.0,
+                endpoints=endpoints,
+            )
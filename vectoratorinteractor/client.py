@@ -0,0 +1,43 @@
+"""Slim entry point: the HTTP clients and the pydantic response schemas.
+
+Importing this module loads neither fastapi nor sqlmodel/SQLAlchemy, which
+keeps cold starts of CLI tools and serverless workers short. The sqlmodel
+table classes in vectoratorinteractor.models are only loaded by the calls
+returning them (uploadDocuments, createProject) and by the streamed answer
+calls. fastapi is not loaded by the import: errors of the sync
+VectoratorInteractor are still fastapi HTTPExceptions as well, fastapi is
+imported when the first of them is raised. The other errors are plain
+VectoratorErrors, register install_error_handler(app) to answer them like
+HTTPExceptions. benchmarks/imports.py keeps track of the import time.
+"""
+
+from vectoratorinteractor.asyncinteractor import AsyncVectoratorInteractor
+from vectoratorinteractor.errors import VectoratorError, install_error_handler
+from vectoratorinteractor.schemas import (
+    ChatMessageWithDocumentsPD,
+    ChatWithMessagesPD,
+    DocumentUploadRequestWithDocumentsPD,
+    FullDocumentWithPreview,
+    LangchainDocumentPD,
+    NewMessagePD,
+    Persona,
+    ProcessingState,
+    QuickSearchDocument,
+)
+from vectoratorinteractor.vectoratorinteractor import VectoratorInteractor
+
+__all__ = [
+    "AsyncVectoratorInteractor",
+    "ChatMessageWithDocumentsPD",
+    "ChatWithMessagesPD",
+    "DocumentUploadRequestWithDocumentsPD",
+    "FullDocumentWithPreview",
+    "LangchainDocumentPD",
+    "NewMessagePD",
+    "Persona",
+    "ProcessingState",
+    "QuickSearchDocument",
+    "VectoratorError",
+    "VectoratorInteractor",
+    "install_error_handler",
+]
@@ -0,0 +1,202 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, create_model
+
+from vectoratorinteractor.decoding import decode
+from vectoratorinteractor.schemas import (
+    ChatMessageWithDocumentsPD,
+    ChatWithMessagesPD,
+    LangchainDocumentPD,
+    Persona,
+    ProcessingState,
+)
+
+
+# chats as sent by the backend, documents are kept as plain dicts so nothing
+# is validated for repeated documents
+class _RawMessage(BaseModel):
+    id: int
+    message: str
+    persona: Persona
+    created_at: datetime
+    documents: List[Dict[str, Any]] = []
+
+
+class _RawChat(BaseModel):
+    id: int
+    name: str
+    apporuser: str
+    project: str
+    created_at: datetime
+    processing_state: ProcessingState
+    messages: List[_RawMessage] = []
+
+
+class DocumentTable:
+    """The distinct retrieved documents of one chat, by document id.
+
+    Holds the raw fields of every document once, however many messages
+    reference it. LangchainDocumentPD objects are only validated when a
+    document is accessed and then shared by all messages.
+    """
+
+    __slots__ = ("raw", "_model", "_built")
+
+    def __init__(self, model: Type[LangchainDocumentPD]):
+        self.raw: Dict[str, Dict[str, Any]] = {}
+        self._model = model
+        self._built: Dict[str, LangchainDocumentPD] = {}
+
+    def __getitem__(self, document_id: str) -> LangchainDocumentPD:
+        document = self._built.get(document_id)
+        if document is None:
+            document = self._model.model_validate(self.raw[document_id])
+            self._built[document_id] = document
+        return document
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.raw
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+class CompactMessage:
+    __slots__ = ("id", "message", "persona", "created_at", "document_ids", "_table")
+
+    def __init__(self, raw: _RawMessage, document_ids: Tuple[str, ...], table):
+        self.id = raw.id
+        self.message = raw.message
+        self.persona = raw.persona
+        self.created_at = raw.created_at
+        self.document_ids = document_ids
+        self._table = table
+
+    @property
+    def documents(self) -> List[LangchainDocumentPD]:
+        return [self._table[document_id] for document_id in self.document_ids]
+
+    def full(self) -> ChatMessageWithDocumentsPD:
+        return ChatMessageWithDocumentsPD.model_construct(
+            id=self.id,
+            message=self.message,
+            persona=self.persona,
+            created_at=self.created_at,
+            documents=self.documents,
+        )
+
+
+class CompactChat:
+    """ChatWithMessagesPD whose messages reference one shared document table.
+
+    The chat fields are the same, messages are CompactMessages with
+    document_ids into documents instead of their own document lists.
+    full() builds the ChatWithMessagesPD, sharing the document objects.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "apporuser",
+        "project",
+        "created_at",
+        "processing_state",
+        "messages",
+        "documents",
+    )
+
+    def __init__(self, raw: _RawChat, documents: DocumentTable):
+        self.id = raw.id
+        self.name = raw.name
+        self.apporuser = raw.apporuser
+        self.project = raw.project
+        self.created_at = raw.created_at
+        self.processing_state = raw.processing_state
+        self.documents = documents
+        self.messages: List[CompactMessage] = []
+
+    def full(self) -> ChatWithMessagesPD:
+        return ChatWithMessagesPD.model_construct(
+            id=self.id,
+            name=self.name,
+            apporuser=self.apporuser,
+            project=self.project,
+            created_at=self.created_at,
+            processing_state=self.processing_state,
+            messages=[message.full() for message in self.messages],
+        )
+
+
+@lru_cache(maxsize=None)
+def _projected(drop_fields: Tuple[str, ...]) -> Type[LangchainDocumentPD]:
+    # LangchainDocumentPD with the dropped fields optional and None, still an
+    # instance of LangchainDocumentPD
+    if not drop_fields:
+        return LangchainDocumentPD
+    fields = LangchainDocumentPD.model_fields
+    unknown = set(drop_fields) - set(fields) | ({"id"} & set(drop_fields))
+    if unknown:
+        raise ValueError(f"cannot drop document fields {sorted(unknown)}")
+    return create_model(
+        "ProjectedLangchainDocumentPD",
+        __base__=LangchainDocumentPD,
+        **{name: (Optional[fields[name].annotation], None) for name in drop_fields},
+    )
+
+
+class Compaction:
+    """Decodes chats into CompactChats, dropping drop_fields of documents."""
+
+    def __init__(self, drop_fields: Iterable[str] = ()):
+        self.drop_fields = tuple(sorted(set(drop_fields)))
+        self.model = _projected(self.drop_fields)
+
+    def compact(self, raw: _RawChat) -> CompactChat:
+        table = DocumentTable(self.model)
+        chat = CompactChat(raw, table)
+        documents = table.raw
+        drop = self.drop_fields
+        for message in raw.messages:
+            ids = []
+            for document in message.documents:
+                document_id = document.get("id")
+                if not isinstance(document_id, str):
+                    # the full decode fails on a missing or invalid id, so
+                    # does validating the document here
+                    document_id = str(self.model.model_validate(document).id)
+                if document_id not in documents:
+                    if drop:
+                        for name in drop:
+                            document.pop(name, None)
+                    documents[document_id] = document
+                ids.append(document_id)
+            chat.messages.append(CompactMessage(message, tuple(ids), table))
+        return chat
+
+    def chat(self, content: bytes) -> CompactChat:
+        return self.compact(decode(_RawChat, content))
+
+    def chats(self, content: bytes) -> List[CompactChat]:
+        return [self.compact(raw) for raw in decode(List[_RawChat], content)]
+
+
+@lru_cache(maxsize=64)
+def _compaction(drop_fields: Tuple[str, ...]) -> Compaction:
+    # one per projection, its bound decoders also key the single-flight layer
+    return Compaction(drop_fields)
+
+
+def compaction(compact: bool, drop_fields: Iterable[str] = ()) -> Optional[Compaction]:
+    """The Compaction for the compact/drop_fields arguments of the chat calls.
+
+    None for the regular decoding, drop_fields implies compact.
+    """
+    drop_fields = tuple(sorted(set(drop_fields)))
+    if not compact and not drop_fields:
+        return None
+    return _compaction(drop_fields)
@@ -0,0 +1,123 @@
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, List, Type, TypeVar
+
+from pydantic import TypeAdapter
+
+if TYPE_CHECKING:
+    from vectoratorinteractor.models import ChatMessage
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def adapter(tp: Any) -> TypeAdapter:
+    # building a TypeAdapter compiles a validator, so there is one per type
+    return TypeAdapter(tp)
+
+
+def decode(tp: Type[T], content: bytes) -> T:
+    """Validate raw json bytes straight into tp without an intermediate dict."""
+    return adapter(tp).validate_json(content)
+
+
+def encode(tp: Any, value: Any) -> bytes:
+    return adapter(tp).dump_json(value)
+
+
+def encode_messages(messages: Iterable["ChatMessage"]) -> bytes:
+    # request body of the /stream endpoints: {"messages": [...]}. the sqlmodel
+    # table class is only loaded by the first streamed call
+    from vectoratorinteractor.models import ChatMessage
+
+    return b'{"messages":' + encode(List[ChatMessage], list(messages)) + b"}"
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+# skip runs of scalars and complete strings in one regex call, the run ends
+# at the next structural character or at a string cut off by the chunk end
+_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_SKIP_NESTED = re.compile(rb'[^"\[\]{}]*(?:' + _STRING + rb'[^"\[\]{}]*)*')
+_SKIP_OUTER = re.compile(rb'[^"\[\]{},]*(?:' + _STRING + rb'[^"\[\]{},]*)*')
+
+
+class JsonArraySplitter:
+    """Splits a streamed top-level json array into the raw bytes of its items.
+
+    feed() takes chunks as they arrive and returns every item completed so far,
+    only the unfinished tail is kept, so memory is bounded by one item.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self._buffer += chunk
+        items: List[bytes] = []
+        buffer = self._buffer
+        size = len(buffer)
+        while not self.done:
+            skip = _SKIP_OUTER if self._depth <= 1 else _SKIP_NESTED
+            index = skip.match(buffer, self._pos).end()
+            self._pos = index
+            if index >= size:
+                break
+            char = buffer[index]
+            if char == 0x22:  # " of a string that continues in the next chunk
+                break
+            self._pos = index + 1
+            if char == 0x7B and self._depth == 1:  # { starting an item
+                end = buffer.find(b"}", index)
+                if (
+                    end >= 0
+                    and buffer.find(b"{", index + 1, end) < 0
+                    and buffer.find(b"[", index + 1, end) < 0
+                    and buffer.find(b"\\", index, end) < 0
+                    and buffer.count(b'"', index, end) % 2 == 0
+                ):
+                    # fast path for flat objects: no nesting and no escapes, so
+                    # every quote pairs up and the first } closes the object
+                    self._pos = end + 1
+                    continue
+            if char in (0x5B, 0x7B):  # [ {
+                self._depth += 1
+                if self._depth == 1:
+                    if char != 0x5B:
+                        raise ValueError("response is not a json array")
+                    self._start = self._pos
+            elif char in (0x5D, 0x7D):  # ] }
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(items, index)
+                    self.done = True
+            elif self._depth == 1:  # , between two items
+                self._emit(items, index)
+                self._start = self._pos
+        if self._start > 0:
+            # drop everything before the current item
+            del buffer[: self._start]
+            self._pos -= self._start
+            self._start = 0
+        return items
+
+    def _emit(self, items: List[bytes], end: int):
+        item = bytes(self._buffer[self._start : end]).strip()
+        if item:
+            items.append(item)
+
+    def close(self):
+        if not self.done:
+            raise ValueError("response ended inside the json array")
+
+
+def decode_items(tp: Type[T], items: List[bytes]) -> List[T]:
+    # one validator call for all items of a chunk is much cheaper than one each
+    if not items:
+        return []
+    return decode(List[tp], b"[" + b",".join(items) + b"]")
@@ -0,0 +1,76 @@
+import functools
+import http
+from typing import Any, Dict, Optional
+
+
+class VectoratorError(Exception):
+    """Error answer of the vectorator backend or a failed call.
+
+    Carries status_code, detail and headers like fastapi's HTTPException, but
+    is a plain exception so importing the client never imports fastapi.
+    Convert it at the fastapi boundary: to_http_exception() returns an
+    HTTPException with the same fields, install_error_handler(app) answers
+    every uncaught VectoratorError the way fastapi answers an HTTPException.
+    The sync VectoratorInteractor raises http_error()s instead, see there.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        detail: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        if detail is None:
+            detail = http.HTTPStatus(status_code).phrase
+        super().__init__(status_code, detail, headers)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+    def __str__(self) -> str:
+        return f"{self.status_code}: {self.detail}"
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(status_code={self.status_code!r}, "
+            f"detail={self.detail!r})"
+        )
+
+    def to_http_exception(self):
+        from fastapi import HTTPException
+
+        return HTTPException(
+            status_code=self.status_code, detail=self.detail, headers=self.headers
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _http_error_class() -> type:
+    try:
+        from vectoratorinteractor.httperrors import HTTPVectoratorError
+    except ImportError:
+        # fastapi is not installed
+        return VectoratorError
+    return HTTPVectoratorError
+
+
+def http_error(
+    status_code: int, detail: Any = None, headers: Optional[Dict[str, str]] = None
+) -> VectoratorError:
+    # the sync VectoratorInteractor raised fastapi's HTTPException before, so
+    # with fastapi installed its errors stay HTTPExceptions: `except
+    # HTTPException` keeps catching them and fastapi apps answer them with
+    # their status. fastapi is imported when the first error is raised
+    return _http_error_class()(status_code, detail, headers)
+
+
+async def vectorator_error_handler(request, exc: VectoratorError):
+    # same response as fastapi's default handler for HTTPException
+    from fastapi.exception_handlers import http_exception_handler
+
+    return await http_exception_handler(request, exc.to_http_exception())
+
+
+def install_error_handler(app):
+    """Registers vectorator_error_handler for VectoratorError on a fastapi app."""
+    app.add_exception_handler(VectoratorError, vectorator_error_handler)
@@ -0,0 +1,11 @@
+from fastapi import HTTPException
+
+from vectoratorinteractor.errors import VectoratorError
+
+
+class HTTPVectoratorError(VectoratorError, HTTPException):
+    """VectoratorError that is also fastapi's HTTPException.
+
+    Raised by the sync VectoratorInteractor through errors.http_error(), this
+    module is only imported once the first of its errors is raised.
+    """
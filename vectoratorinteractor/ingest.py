@@ -0,0 +1,241 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+
+from vectoratorinteractor.waiting import WaitPolicy
+
+PathLike = Union[str, os.PathLike]
+# identifies a file version in the manifest: (path, size, mtime_ns)
+FileKey = Tuple[str, int, int]
+
+
+def _file_key(path: str) -> FileKey:
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class IngestReport(BaseModel):
+    uploaded_files: int = 0
+    uploaded_bytes: int = 0
+    skipped_files: int = 0
+    upload_request_ids: List[int] = []
+    processed: List[int] = []
+    # upload request id -> errormessage reported by the backend
+    processing_errors: Dict[int, str] = {}
+    # path -> error of the failed upload, these files are retried on the next run
+    failed_files: Dict[str, str] = {}
+    # upload requests that were still unprocessed when the wait timed out
+    unfinished: List[int] = []
+
+
+class IngestManifest:
+    """Append-only JSON lines log of uploaded batches and processed requests.
+
+    A rerun with the same manifest skips every file that was already uploaded
+    unchanged and only keeps tracking upload requests that never finished.
+    """
+
+    def __init__(self, path: Optional[PathLike] = None):
+        self.path = os.fspath(path) if path is not None else None
+        self.uploaded: Set[FileKey] = set()
+        self.pending: Set[int] = set()
+        self._lock = threading.Lock()
+        if self.path is not None and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash can leave a half written last line behind
+                    continue
+                if entry["type"] == "batch":
+                    self.uploaded.update(tuple(k) for k in entry["files"])
+                    self.pending.add(entry["upload_request_id"])
+                elif entry["type"] == "processed":
+                    self.pending.discard(entry["upload_request_id"])
+
+    def _append(self, entry: dict):
+        if self.path is None:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def recordBatch(self, upload_request_id: int, files: List[FileKey], highresmode):
+        with self._lock:
+            self.uploaded.update(files)
+            self.pending.add(upload_request_id)
+            self._append(
+                {
+                    "type": "batch",
+                    "upload_request_id": upload_request_id,
+                    "highresmode": highresmode,
+                    "files": files,
+                }
+            )
+
+    def recordProcessed(self, upload_request_id: int, errormessage: Optional[str]):
+        with self._lock:
+            self.pending.discard(upload_request_id)
+            self._append(
+                {
+                    "type": "processed",
+                    "upload_request_id": upload_request_id,
+                    "errormessage": errormessage,
+                }
+            )
+
+
+class IngestPipeline:
+    """Uploads a directory or an iterable of files in size-bounded batches.
+
+    Files are packed into batches of at most max_batch_bytes and
+    max_batch_files (a single bigger file gets its own batch), up to
+    max_concurrent_batches are uploaded at once and file discovery pauses while
+    all slots are busy. Afterwards every resulting DocumentUploadRequest is
+    tracked until processed. highresmode is either a flag or a callable that
+    decides per batch from its file paths.
+    """
+
+    def __init__(
+        self,
+        interactor,
+        project: str,
+        apporuser: str = "",
+        max_batch_bytes: int = 64 * 1024 * 1024,
+        max_batch_files: int = 32,
+        max_concurrent_batches: int = 4,
+        highresmode: Union[bool, Callable[[List[str]], bool]] = False,
+        manifest_path: Optional[PathLike] = None,
+        policy: Optional[WaitPolicy] = None,
+    ):
+        if max_batch_files < 1 or max_concurrent_batches < 1:
+            raise ValueError("batch limits have to be at least 1")
+        self.interactor = interactor
+        self.project = project
+        self.apporuser = apporuser
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_files = max_batch_files
+        self.max_concurrent_batches = max_concurrent_batches
+        self.highresmode = highresmode
+        self.manifest = IngestManifest(manifest_path)
+        self.policy = policy or WaitPolicy(
+            timeout=60 * 60, initial_delay=1.0, max_delay=30.0
+        )
+
+    def _walk(self, source: Union[PathLike, Iterable[PathLike]]) -> Iterator[str]:
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            manifest = self.manifest.path and os.path.abspath(self.manifest.path)
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if os.path.abspath(path) != manifest:
+                        yield path
+        elif isinstance(source, (str, os.PathLike)):
+            yield os.fspath(source)
+        else:
+            for path in source:
+                yield os.fspath(path)
+
+    def batches(
+        self, source: Union[PathLike, Iterable[PathLike]], report: IngestReport
+    ) -> Iterator[List[FileKey]]:
+        batch: List[FileKey] = []
+        batch_bytes = 0
+        for path in self._walk(source):
+            key = _file_key(path)
+            if key in self.manifest.uploaded:
+                report.skipped_files += 1
+                continue
+            if batch and (
+                len(batch) >= self.max_batch_files
+                or batch_bytes + key[1] > self.max_batch_bytes
+            ):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(key)
+            batch_bytes += key[1]
+        if batch:
+            yield batch
+
+    def run(
+        self, source: Union[PathLike, Iterable[PathLike]], wait: bool = True
+    ) -> IngestReport:
+        report = IngestReport()
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_concurrent_batches)
+
+        def upload(batch: List[FileKey]):
+            paths = [key[0] for key in batch]
+            try:
+                highresmode = (
+                    self.highresmode(paths)
+                    if callable(self.highresmode)
+                    else self.highresmode
+                )
+                request = self.interactor.uploadDocuments(
+                    self.project, paths, self.apporuser, highresmode
+                )
+            except Exception as e:
+                with lock:
+                    for path in paths:
+                        report.failed_files[path] = repr(e)
+                return
+            finally:
+                slots.release()
+            with lock:
+                report.uploaded_files += len(batch)
+                report.uploaded_bytes += sum(key[1] for key in batch)
+                report.upload_request_ids.append(request.id)
+            # a rerun resumes from the manifest, a failed write is raised by run
+            self.manifest.recordBatch(request.id, batch, highresmode)
+
+        futures = []
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrent_batches,
+            thread_name_prefix="vectorator-ingest",
+        ) as pool:
+            for batch in self.batches(source, report):
+                # backpressure, stop reading the source while all slots are busy
+                slots.acquire()
+                futures.append(pool.submit(upload, batch))
+        for future in futures:
+            future.result()
+
+        if wait:
+            self.waitForProcessing(report)
+        return report
+
+    def waitForProcessing(self, report: Optional[IngestReport] = None) -> IngestReport:
+        # one getUploadRequests call per round covers every pending request,
+        # including the ones left over from an earlier interrupted run
+        report = report or IngestReport()
+        deadline = time.monotonic() + self.policy.timeout
+        delays = self.policy.delays()
+        while self.manifest.pending:
+            requests = self.interactor.getUploadRequests(self.project, self.apporuser)
+            for request in requests:
+                if request.id in self.manifest.pending and request.processed:
+                    self.manifest.recordProcessed(request.id, request.errormessage)
+                    report.processed.append(request.id)
+                    if request.errormessage:
+                        report.processing_errors[request.id] = request.errormessage
+            remaining = deadline - time.monotonic()
+            if not self.manifest.pending or remaining <= 0:
+                break
+            time.sleep(min(next(delays), remaining))
+        report.unfinished = sorted(self.manifest.pending)
+        return report
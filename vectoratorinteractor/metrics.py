@@ -0,0 +1,421 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# name of the interactor method a request is made for, set by @instrumented
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "vectorator_endpoint", default="unknown"
+)
+
+# histogram bucket upper bounds in seconds, log spaced from 1 ms to ~2 minutes
+LATENCY_BUCKETS = tuple(0.001 * 1.25**i for i in range(53))
+
+
+class Histogram:
+    """Fixed-bucket histogram, percentiles are interpolated inside a bucket."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # the last slot counts values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if self.count else None,
+        }
+
+
+class RequestRecord:
+    """One HTTP request as seen by the pre and post request hooks.
+
+    Pre hooks see the request fields, post hooks additionally the outcome.
+    """
+
+    __slots__ = (
+        "endpoint",
+        "method",
+        "url",
+        "started",
+        "request_bytes",
+        "streamed",
+        "status_code",
+        "response_bytes",
+        "elapsed",
+        "time_to_first_byte",
+        "retries",
+        "error",
+    )
+
+    def __init__(
+        self, endpoint: str, method: str, url: str, request_bytes: int, streamed: bool
+    ):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.started = time.monotonic()
+        self.request_bytes = request_bytes
+        self.streamed = streamed
+        self.status_code: Optional[int] = None
+        # None when the body length is unknown, e.g. chunked streams
+        self.response_bytes: Optional[int] = None
+        self.elapsed: Optional[float] = None
+        self.time_to_first_byte: Optional[float] = None
+        self.retries = 0
+        self.error: Optional[BaseException] = None
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.requests = 0
+        self.latency = Histogram()
+        self.request_latency = Histogram()
+        self.time_to_first_byte = Histogram()
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.status_codes: Dict[int, int] = {}
+        # error class -> count, "http_<status>" for errors with a status code
+        self.errors: Dict[str, int] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "requests": self.requests,
+            "latency": self.latency.summary(),
+            "request_latency": self.request_latency.summary(),
+            "time_to_first_byte": self.time_to_first_byte.summary(),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "retries": self.retries,
+            "status_codes": dict(self.status_codes),
+            "errors": dict(self.errors),
+        }
+
+
+def error_class(error: BaseException) -> str:
+    # VectoratorError and fastapi's HTTPException, without importing fastapi
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return f"http_{status_code}"
+    return type(error).__name__
+
+
+Hook = Callable[[RequestRecord], None]
+
+
+class Metrics:
+    """Per-endpoint call and request metrics of an interactor.
+
+    Pass an instance as metrics= to VectoratorInteractor or
+    AsyncVectoratorInteractor. Endpoints are the interactor method names.
+    Hooks run for every HTTP request, pre hooks before it is sent and post
+    hooks once the response headers arrived or the request failed, which is
+    the place to export to Prometheus or OpenTelemetry. Exceptions raised by
+    hooks are logged and never break the call. Without a Metrics instance the
+    interactor skips all of this.
+    """
+
+    def __init__(
+        self,
+        pre_request: Optional[List[Hook]] = None,
+        post_request: Optional[List[Hook]] = None,
+    ):
+        self.pre_request: List[Hook] = list(pre_request or [])
+        self.post_request: List[Hook] = list(post_request or [])
+        self._endpoints: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, name: str) -> EndpointMetrics:
+        # caller holds self._lock
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = self._endpoints[name] = EndpointMetrics()
+        return endpoint
+
+    def _run_hooks(self, hooks: List[Hook], record: RequestRecord):
+        for hook in hooks:
+            try:
+                hook(record)
+            except Exception:
+                logger.exception("vectorator metrics hook %r failed", hook)
+
+    def observe_call(
+        self, name: str, elapsed: float, error: Optional[BaseException] = None
+    ):
+        with self._lock:
+            endpoint = self._endpoint(name)
+            endpoint.calls += 1
+            endpoint.latency.observe(elapsed)
+            if error is not None:
+                cls = error_class(error)
+                endpoint.errors[cls] = endpoint.errors.get(cls, 0) + 1
+
+    def begin(
+        self,
+        method: str,
+        url: str,
+        request_bytes: int = 0,
+        streamed: bool = False,
+        endpoint: Optional[str] = None,
+    ) -> RequestRecord:
+        record = RequestRecord(
+            endpoint or current_endpoint.get(), method, url, request_bytes, streamed
+        )
+        if self.pre_request:
+            self._run_hooks(self.pre_request, record)
+        return record
+
+    def end(
+        self,
+        record: RequestRecord,
+        response=None,
+        error: Optional[BaseException] = None,
+    ):
+        # response is a requests or httpx response, None if the request failed
+        record.elapsed = time.monotonic() - record.started
+        record.error = error
+        if response is not None:
+            record.status_code = response.status_code
+            record.response_bytes = _response_size(response, record.streamed)
+            record.retries = _retries(response)
+        if record.streamed:
+            # a streamed response returns once the headers are in
+            record.time_to_first_byte = record.elapsed
+        # errors are counted per call by observe_call, not per request
+        with self._lock:
+            endpoint = self._endpoint(record.endpoint)
+            endpoint.requests += 1
+            endpoint.request_bytes += record.request_bytes
+            endpoint.retries += record.retries
+            if record.streamed:
+                endpoint.time_to_first_byte.observe(record.elapsed)
+            else:
+                endpoint.request_latency.observe(record.elapsed)
+            # the body of a stream is counted by add_bytes once it was read
+            if record.response_bytes and not record.streamed:
+                endpoint.response_bytes += record.response_bytes
+            if record.status_code is not None:
+                endpoint.status_codes[record.status_code] = (
+                    endpoint.status_codes.get(record.status_code, 0) + 1
+                )
+        if self.post_request:
+            self._run_hooks(self.post_request, record)
+
+    def add_bytes(self, name: str, response_bytes: int):
+        # body bytes of a stream, known only once it was read
+        with self._lock:
+            self._endpoint(name).response_bytes += response_bytes
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: endpoint.snapshot()
+                for name, endpoint in sorted(self._endpoints.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+class StreamedCall:
+    """A streamed call of the sync interactor, recorded once it is closed.
+
+    @instrumented would stop the clock when the headers arrive, so the call
+    latency and the body bytes actually read are recorded here when chunks()
+    is exhausted or fails, or on close(). on_close runs once the stream is
+    closed, the interactor releases the routed backend there.
+
+    Iterating the call yields chunks(). close() may be called from another
+    thread while a read is blocked, the socket is shut down first so the
+    read returns.
+    """
+
+    __slots__ = (
+        "metrics",
+        "endpoint",
+        "response",
+        "started",
+        "on_close",
+        "read",
+        "finished",
+        "closed",
+        "_chunks",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        metrics: Optional["Metrics"],
+        endpoint: str,
+        response,
+        started: float,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.response = response
+        self.started = started
+        self.on_close = on_close
+        self.read = 0
+        self.finished = False
+        self.closed = False
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._chunks is None:
+            self._chunks = self.chunks()
+        return next(self._chunks)
+
+    def chunks(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        error = None
+        try:
+            for chunk in self.response.iter_content(chunk_size):
+                self.read += len(chunk)
+                yield chunk
+            self.finished = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.close(error)
+
+    def close(self, error: Optional[BaseException] = None):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        if not self.finished:
+            # the connection is dropped anyway, a finished one went back to
+            # the pool and must not be touched
+            shutdown = getattr(self.response.raw, "shutdown", None)
+            if shutdown is not None:
+                try:
+                    shutdown()
+                except (OSError, RuntimeError, ValueError):
+                    pass
+        self.response.close()
+        if self.on_close is not None:
+            self.on_close()
+        if self.metrics is not None:
+            self.metrics.add_bytes(self.endpoint, self.read)
+            self.metrics.observe_call(
+                self.endpoint, time.monotonic() - self.started, error
+            )
+
+
+def body_size(kwargs: Dict[str, Any]) -> int:
+    body = kwargs.get("data", kwargs.get("content"))
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    length = getattr(body, "length", None)
+    if length is not None:
+        return length
+    headers = kwargs.get("headers") or {}
+    return int(headers.get("Content-Length", 0))
+
+
+def _response_size(response, streamed: bool) -> Optional[int]:
+    if not streamed:
+        return len(response.content)
+    length = response.headers.get("Content-Length")
+    return int(length) if length is not None else None
+
+
+def _retries(response) -> int:
+    # urllib3 keeps the retry history on the raw response, AsyncHttpTransport
+    # puts its attempt count into the httpx response extensions
+    retry = getattr(getattr(response, "raw", None), "retries", None)
+    if retry is not None and hasattr(retry, "history"):
+        return len(retry.history)
+    return getattr(response, "extensions", {}).get("retries", 0)
+
+
+def instrumented(fn):
+    """Times an interactor method and labels its requests with its name.
+
+    Costs one attribute lookup per call when the interactor has no metrics.
+    """
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None:
+                return await fn(self, *args, **kwargs)
+            token = current_endpoint.set(name)
+            start = time.monotonic()
+            error = None
+            try:
+                return await fn(self, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                metrics.observe_call(name, time.monotonic() - start, error)
+                current_endpoint.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return fn(self, *args, **kwargs)
+        token = current_endpoint.set(name)
+        start = time.monotonic()
+        error = None
+        try:
+            return fn(self, *args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            metrics.observe_call(name, time.monotonic() - start, error)
+            current_endpoint.reset(token)
+
+    return wrapper
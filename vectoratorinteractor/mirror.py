@@ -0,0 +1,377 @@
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+from sqlalchemy import event, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, delete, func, select
+
+from vectoratorinteractor.models import (
+    Chat,
+    ChatMessage,
+    ChatWithMessagesPD,
+    DocumentUploadRequest,
+    FullDocument,
+    Project,
+)
+
+MIRROR_TABLES = [
+    Project.__table__,
+    Chat.__table__,
+    ChatMessage.__table__,
+    DocumentUploadRequest.__table__,
+    FullDocument.__table__,
+]
+
+# created with raw sql so the shared SQLModel metadata of the tables stays as
+# it is for everyone else importing the models
+MIRROR_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_mirror_project_name ON project (apporuser, name)",
+    "CREATE INDEX IF NOT EXISTS ix_mirror_chat_project ON chat (project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_mirror_chatmessage_chat "
+    "ON chatmessage (chat_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_mirror_uploadrequest_project "
+    "ON documentuploadrequest (project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_mirror_fulldocument_project "
+    "ON fulldocument (project_id, filename)",
+]
+
+
+def _utc(value: datetime) -> datetime:
+    # sqlite drops the timezone, everything is stored as naive utc
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class SyncReport(BaseModel):
+    project: str
+    chats_added: int = 0
+    chats_updated: int = 0
+    chats_removed: int = 0
+    messages_added: int = 0
+    upload_requests: int = 0
+    documents: int = 0
+    documents_removed: int = 0
+
+
+class LocalMirror:
+    """SQLite replica of one tenant's projects, documents and chats.
+
+    sync() pulls a project into the SQLModel tables of models.py, the read
+    methods then answer from local indexed queries without a network round
+    trip. Syncs are incremental: only upload requests newer than the stored
+    created_at or still unprocessed and chat messages newer than the stored
+    ones are written, chats are rewritten only when their name or state
+    changed. Chats deleted on the backend are dropped, deleted documents are
+    only reconciled with sync(full=True).
+    """
+
+    def __init__(
+        self,
+        interactor,
+        path: Union[str, os.PathLike] = ":memory:",
+        apporuser: str = "",
+    ):
+        self.interactor = interactor
+        self.apporuser = apporuser
+        self.apporuserkey = interactor.apporuserKey(apporuser)
+        path = os.fspath(path)
+        url = "sqlite://" if path == ":memory:" else f"sqlite:///{path}"
+        self.engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            # an in-memory database only lives as long as its one connection
+            **({"poolclass": StaticPool} if path == ":memory:" else {}),
+        )
+        event.listen(self.engine, "connect", _configure_sqlite)
+        SQLModel.metadata.create_all(self.engine, tables=MIRROR_TABLES)
+        with self.engine.begin() as connection:
+            for statement in MIRROR_INDEXES:
+                connection.execute(text(statement))
+        self._lock = threading.Lock()
+        self._projects: Dict[str, int] = {}
+
+    def close(self):
+        self.engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _session(self) -> Session:
+        # returned rows stay usable after the session is closed
+        return Session(self.engine, expire_on_commit=False)
+
+    def _projectId(self, session: Session, project: str, create: bool = False):
+        project_id = self._projects.get(project)
+        if project_id is not None:
+            return project_id
+        row = session.exec(
+            select(Project).where(
+                Project.apporuser == self.apporuserkey, Project.name == project
+            )
+        ).first()
+        if row is None:
+            if not create:
+                return None
+            row = Project(name=project, apporuser=self.apporuserkey)
+            session.add(row)
+            session.flush()
+        self._projects[project] = row.id
+        return row.id
+
+    # sync
+    def syncAll(self, full: bool = False) -> List[SyncReport]:
+        return [
+            self.sync(project, full)
+            for project in self.interactor.getProjects(self.apporuser)
+        ]
+
+    def sync(self, project: str, full: bool = False) -> SyncReport:
+        report = SyncReport(project=project)
+        # one sync per mirror at a time, sqlite has a single writer anyway
+        with self._lock, self._session() as session:
+            try:
+                project_id = self._projectId(session, project, create=True)
+                self._syncUploadRequests(session, project, project_id, report)
+                if full:
+                    self._syncDocuments(session, project, project_id, report)
+                self._syncChats(session, project, project_id, report)
+                session.commit()
+            except BaseException:
+                # a project row created by this sync is rolled back with it
+                self._projects.pop(project, None)
+                raise
+        return report
+
+    def _syncUploadRequests(
+        self, session: Session, project: str, project_id: int, report: SyncReport
+    ):
+        watermark = session.exec(
+            select(func.max(DocumentUploadRequest.created_at)).where(
+                DocumentUploadRequest.project_id == project_id
+            )
+        ).one()
+        unprocessed = set(
+            session.exec(
+                select(DocumentUploadRequest.id).where(
+                    DocumentUploadRequest.project_id == project_id,
+                    DocumentUploadRequest.processed == False,  # noqa: E712
+                )
+            ).all()
+        )
+        for request in self.interactor.getUploadRequests(project, self.apporuser):
+            created_at = _utc(request.created_at)
+            if (
+                watermark is not None
+                and created_at < watermark
+                and request.id not in unprocessed
+            ):
+                continue
+            session.merge(
+                DocumentUploadRequest(
+                    id=request.id,
+                    apporuser=request.apporuser,
+                    project_id=project_id,
+                    processed=request.processed,
+                    created_at=created_at,
+                    errormessage=request.errormessage,
+                )
+            )
+            report.upload_requests += 1
+            # documents only show up once their upload request is processed
+            for document in request.documents:
+                self._mergeDocument(session, document, project_id)
+                report.documents += 1
+
+    def _mergeDocument(self, session: Session, document, project_id: int):
+        session.merge(
+            FullDocument(
+                id=document.id,
+                filename=document.filename,
+                apporuser=document.apporuser,
+                project_id=project_id,
+                upload_request_id=document.upload_request_id,
+            )
+        )
+
+    def _syncDocuments(
+        self, session: Session, project: str, project_id: int, report: SyncReport
+    ):
+        seen: Set[int] = set()
+        for document in self.interactor.iterDocuments(project, self.apporuser):
+            self._mergeDocument(session, document, project_id)
+            seen.add(document.id)
+        stored = session.exec(
+            select(FullDocument.id).where(FullDocument.project_id == project_id)
+        ).all()
+        removed = [document_id for document_id in stored if document_id not in seen]
+        if removed:
+            session.exec(delete(FullDocument).where(FullDocument.id.in_(removed)))
+        report.documents = len(seen)
+        report.documents_removed = len(removed)
+
+    def _syncChats(
+        self, session: Session, project: str, project_id: int, report: SyncReport
+    ):
+        # chat id -> (name, state, newest stored message)
+        stored: Dict[int, Tuple[str, object, Optional[datetime]]] = {
+            chat_id: (name, state, newest)
+            for chat_id, name, state, newest in session.exec(
+                select(
+                    Chat.id,
+                    Chat.name,
+                    Chat.processing_state,
+                    func.max(ChatMessage.created_at),
+                )
+                .outerjoin(ChatMessage, ChatMessage.chat_id == Chat.id)
+                .where(Chat.project_id == project_id)
+                .group_by(Chat.id)
+            ).all()
+        }
+        seen: Set[int] = set()
+        # the listing has no since filter, it is streamed and old unchanged
+        # chats are skipped without touching the database
+        for chat in self.interactor.iterChats(project, self.apporuser):
+            seen.add(chat.id)
+            known = stored.get(chat.id)
+            if known is None:
+                self._mergeChat(session, chat, project_id)
+                report.chats_added += 1
+                report.messages_added += self._addMessages(session, chat, None)
+                continue
+            name, state, newest = known
+            if name != chat.name or state != chat.processing_state:
+                self._mergeChat(session, chat, project_id)
+                report.chats_updated += 1
+            report.messages_added += self._addMessages(session, chat, newest)
+        removed = [chat_id for chat_id in stored if chat_id not in seen]
+        if removed:
+            session.exec(delete(ChatMessage).where(ChatMessage.chat_id.in_(removed)))
+            session.exec(delete(Chat).where(Chat.id.in_(removed)))
+            report.chats_removed = len(removed)
+
+    def _mergeChat(self, session: Session, chat: ChatWithMessagesPD, project_id: int):
+        session.merge(
+            Chat(
+                id=chat.id,
+                name=chat.name,
+                apporuser=chat.apporuser,
+                project_id=project_id,
+                created_at=_utc(chat.created_at),
+                processing_state=chat.processing_state,
+            )
+        )
+
+    def _addMessages(
+        self, session: Session, chat: ChatWithMessagesPD, newest: Optional[datetime]
+    ) -> int:
+        added = 0
+        for message in chat.messages:
+            created_at = _utc(message.created_at)
+            # messages stamped like the newest stored one are merged again,
+            # they may have been written together with it
+            if newest is not None and created_at < newest:
+                continue
+            session.merge(
+                ChatMessage(
+                    id=message.id,
+                    message=message.message,
+                    persona=message.persona,
+                    created_at=created_at,
+                    chat_id=chat.id,
+                    langchain_document_ids=[str(d.id) for d in message.documents],
+                )
+            )
+            if newest is None or created_at > newest:
+                added += 1
+        return added
+
+    # local reads
+    def projects(self) -> List[Project]:
+        with self._session() as session:
+            return list(
+                session.exec(
+                    select(Project)
+                    .where(Project.apporuser == self.apporuserkey)
+                    .order_by(Project.name)
+                ).all()
+            )
+
+    def getChats(self, project: str) -> List[Chat]:
+        with self._session() as session:
+            project_id = self._projectId(session, project)
+            return list(
+                session.exec(
+                    select(Chat)
+                    .where(Chat.project_id == project_id)
+                    .order_by(Chat.created_at)
+                ).all()
+            )
+
+    def getChat(self, project: str, chat_id: int) -> Optional[Chat]:
+        with self._session() as session:
+            chat = session.get(Chat, chat_id)
+            if chat is None or chat.project_id != self._projectId(session, project):
+                return None
+            return chat
+
+    def getChatHistory(self, project: str, chat_id: int) -> List[ChatMessage]:
+        with self._session() as session:
+            return list(
+                session.exec(
+                    select(ChatMessage)
+                    .join(Chat, ChatMessage.chat_id == Chat.id)
+                    .where(
+                        ChatMessage.chat_id == chat_id,
+                        Chat.project_id == self._projectId(session, project),
+                    )
+                    .order_by(ChatMessage.created_at, ChatMessage.id)
+                ).all()
+            )
+
+    def getDocuments(self, project: str) -> List[FullDocument]:
+        with self._session() as session:
+            project_id = self._projectId(session, project)
+            return list(
+                session.exec(
+                    select(FullDocument)
+                    .where(FullDocument.project_id == project_id)
+                    .order_by(FullDocument.filename)
+                ).all()
+            )
+
+    def getDocumentByFilename(
+        self, project: str, filename: str
+    ) -> Optional[FullDocument]:
+        with self._session() as session:
+            return session.exec(
+                select(FullDocument).where(
+                    FullDocument.project_id == self._projectId(session, project),
+                    FullDocument.filename == filename,
+                )
+            ).first()
+
+    def getUploadRequests(self, project: str) -> List[DocumentUploadRequest]:
+        with self._session() as session:
+            project_id = self._projectId(session, project)
+            return list(
+                session.exec(
+                    select(DocumentUploadRequest)
+                    .where(DocumentUploadRequest.project_id == project_id)
+                    .order_by(DocumentUploadRequest.created_at)
+                ).all()
+            )
+
+
+def _configure_sqlite(connection, _):
+    cursor = connection.cursor()
+    # wal lets local reads run while a sync is writing
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
@@ -1,29 +1,29 @@
-import enum
 from datetime import datetime, timezone
 from typing import List, Optional
-from uuid import UUID
 
 from pydantic import BaseModel
 from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
+# the plain pydantic schemas live in schemas.py so the client can be used
+# without loading sqlmodel, they are re-exported here for existing imports
+from vectoratorinteractor.schemas import (  # noqa: F401
+    ChatMessageWithDocumentsPD,
+    ChatWithMessagesPD,
+    DocumentUploadRequestWithDocumentsPD,
+    FullDocumentWithPreview,
+    LangchainDocumentPD,
+    NewMessagePD,
+    Persona,
+    ProcessingState,
+    QuickSearchDocument,
+)
+
 
 class SummaryStore(SQLModel, table=True):
     id: Optional[str] = Field(default=None, primary_key=True)
     summary: str = Field(nullable=False)
 
 
-class ProcessingState(enum.Enum):
-    PENDING = "PENDING"
-    PROCESSING = "PROCESSING"
-    DONE = "DONE"
-    FAILED = "FAILED"
-
-
-class Persona(enum.Enum):
-    assistant = "assistant"
-    user = "user"
-
-
 class Project(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(nullable=False)
@@ -77,11 +77,6 @@ class ChatMessage(SQLModel, table=True):
     )
 
 
-class NewMessagePD(BaseModel):
-    message: str
-    persona: Persona
-
-
 class DocumentUploadRequest(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     apporuser: str = Field(nullable=False, index=True)
@@ -95,16 +90,6 @@ class DocumentUploadRequest(SQLModel, table=True):
     documents: List["FullDocument"] = Relationship(back_populates="upload_request")
 
 
-class DocumentUploadRequestWithDocumentsPD(BaseModel):
-    id: int
-    apporuser: str
-    project: str
-    processed: bool
-    created_at: datetime
-    errormessage: str | None = None
-    documents: List["FullDocumentWithPreview"] = []
-
-
 class FullDocument(SQLModel, table=True):
     id: int | None = Field(
         default=None, primary_key=True
@@ -118,56 +103,6 @@ class FullDocument(SQLModel, table=True):
     upload_request: DocumentUploadRequest = Relationship(back_populates="documents")
 
 
-class FullDocumentWithPreview(BaseModel):
-    id: int | None = None
-    filename: str
-    apporuser: str
-    project_id: int
-    upload_request_id: int
-    cover_url: str | None = None
-    zoomed_in_url: str | None = None
-
-
-class LangchainDocumentPD(BaseModel):
-    id: UUID
-    filename: str
-    filetype: str
-    source: str
-    content: str
-    # summary: str
-    url: str
-    cover_url: str
-    zoomed_in_url: str | None = None
-    page_number: int | None = None
-
-
-class QuickSearchDocument(BaseModel):
-    score: int
-    filename: str
-    content: str
-    fullcontent: str
-    # summary: str
-    timestamp: str
-
-
-class ChatMessageWithDocumentsPD(BaseModel):
-    id: int
-    message: str
-    persona: Persona
-    created_at: datetime
-    documents: List[LangchainDocumentPD] = []
-
-
-class ChatWithMessagesPD(BaseModel):
-    id: int
-    name: str
-    apporuser: str
-    project: str
-    created_at: datetime
-    processing_state: ProcessingState
-    messages: List[ChatMessageWithDocumentsPD] = []
-
-
 class NewChatPD(BaseModel):
     name: str
     apporuser: str
@@ -0,0 +1,203 @@
+import asyncio
+import mimetypes
+import os
+import uuid
+from typing import (
+    IO,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# called with (bytes sent so far, total bytes or None if unknown)
+ProgressCallback = Callable[[int, Optional[int]], None]
+# a fastapi UploadFile, a path, an open binary file or
+# (filename, fileobj[, content_type])
+UploadSource = Union[str, os.PathLike, IO[bytes], tuple]
+
+
+class _FilePart:
+    def __init__(self, name: str, source):
+        self.name = name
+        self.path: Optional[str] = None
+        self.fileobj: Optional[IO[bytes]] = None
+        self.content_type: Optional[str] = None
+        if isinstance(source, (str, os.PathLike)):
+            # paths are opened lazily so huge batches do not hold every fd open
+            self.path = os.fspath(source)
+            self.filename = os.path.basename(self.path)
+            self.size: Optional[int] = os.path.getsize(self.path)
+        else:
+            if isinstance(source, tuple):
+                self.filename, self.fileobj = source[0], source[1]
+                if len(source) > 2:
+                    self.content_type = source[2]
+            elif hasattr(source, "file") and hasattr(source, "filename"):
+                # fastapi / starlette UploadFile
+                self.filename = source.filename
+                self.fileobj = source.file
+                self.content_type = getattr(source, "content_type", None)
+            elif hasattr(source, "read"):
+                self.fileobj = source
+                self.filename = os.path.basename(getattr(source, "name", "upload"))
+            else:
+                raise TypeError(f"cannot upload object of type {type(source)!r}")
+            self.size = _remaining_size(self.fileobj)
+        if not self.content_type:
+            self.content_type = (
+                mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+            )
+        self.header = (
+            f'Content-Disposition: form-data; name="{_quote(name)}"; '
+            f'filename="{_quote(self.filename)}"\r\n'
+            f"Content-Type: {self.content_type}\r\n\r\n"
+        ).encode("utf-8")
+
+    def open(self) -> IO[bytes]:
+        if self.path is not None:
+            self.fileobj = open(self.path, "rb")
+        return self.fileobj
+
+    def release(self):
+        # only files we opened ourselves are closed
+        if self.path is not None and self.fileobj is not None:
+            self.fileobj.close()
+            self.fileobj = None
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r\n", "%0D%0A")
+
+
+def _remaining_size(fileobj) -> Optional[int]:
+    # seek/tell first, fileno() on a SpooledTemporaryFile would roll it to disk
+    try:
+        if fileobj.seekable():
+            position = fileobj.tell()
+            end = fileobj.seek(0, os.SEEK_END)
+            fileobj.seek(position)
+            return end - position
+    except (AttributeError, OSError, ValueError):
+        pass
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class MultipartEncoder:
+    """Streams a multipart/form-data body file by file in fixed-size chunks.
+
+    Only one chunk per file is held in memory, so peak memory does not depend
+    on the upload size. When every file size is known length and len() give
+    the exact body length and the request is sent with Content-Length.
+    Otherwise length is None and len() raises, hand iter(encoder) to the HTTP
+    client then so the body is sent chunked. The encoder can be consumed once.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[Tuple[str, UploadSource]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+        boundary: Optional[str] = None,
+    ):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.parts: List[_FilePart] = [_FilePart(name, f) for name, f in files]
+        self._delimiter = f"--{self.boundary}\r\n".encode("ascii")
+        self._closing = f"--{self.boundary}--\r\n".encode("ascii")
+        self.length: Optional[int] = self._length()
+        self.sent = 0
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._chunk = b""
+        self._offset = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _length(self) -> Optional[int]:
+        total = len(self._closing)
+        for part in self.parts:
+            if part.size is None:
+                return None
+            total += len(self._delimiter) + len(part.header) + part.size + 2
+        return total
+
+    def __len__(self) -> int:
+        if self.length is None:
+            raise TypeError("length of the multipart body is unknown")
+        return self.length
+
+    def _report(self, chunk: bytes) -> bytes:
+        self.sent += len(chunk)
+        if self.progress is not None:
+            self.progress(self.sent, self.length)
+        return chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            for part in self.parts:
+                yield self._report(self._delimiter + part.header)
+                fileobj = part.open()
+                try:
+                    while True:
+                        chunk = fileobj.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        yield self._report(chunk)
+                finally:
+                    part.release()
+                yield self._report(b"\r\n")
+            yield self._report(self._closing)
+        finally:
+            self.close()
+
+    def read(self, size: int = -1) -> bytes:
+        # file-like interface used by http.client to pull the body. the current
+        # chunk is kept with an offset into it, so a read only copies the bytes
+        # it returns and never the rest of the chunk
+        if self._chunks is None:
+            self._chunks = iter(self)
+        pieces = []
+        wanted = size
+        while size < 0 or wanted > 0:
+            if self._offset >= len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk, self._offset = chunk, 0
+            end = len(self._chunk)
+            if size >= 0:
+                end = min(end, self._offset + wanted)
+                wanted -= end - self._offset
+            if self._offset == 0 and end == len(self._chunk):
+                pieces.append(self._chunk)
+            else:
+                pieces.append(memoryview(self._chunk)[self._offset : end])
+            self._offset = end
+        if len(pieces) == 1 and isinstance(pieces[0], bytes):
+            return pieces[0]
+        return b"".join(pieces)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        # file reads run in a worker thread so the event loop never blocks
+        chunks = iter(self)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def close(self):
+        for part in self.parts:
+            part.release()
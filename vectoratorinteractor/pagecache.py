@@ -0,0 +1,356 @@
+import hashlib
+import inspect
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.singleflight import SingleFlight
+
+# (apporuser key, project, file, page), page None is the cover
+PageKey = Tuple[str, str, str, Optional[int]]
+
+# object stores answer a missing page with 403 or 404
+MISSING_STATUS_CODES = frozenset({403, 404})
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS pages ("
+    "key TEXT PRIMARY KEY, digest TEXT NOT NULL, accessed REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_pages_accessed ON pages (accessed)",
+    "CREATE INDEX IF NOT EXISTS ix_pages_digest ON pages (digest)",
+    "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)",
+]
+
+
+def _key(key: PageKey) -> str:
+    apporuserkey, project, filename, page = key
+    return "\x1f".join(
+        (apporuserkey, project, filename, "cover" if page is None else str(page))
+    )
+
+
+class PageImageCache:
+    """Size-capped on-disk cache of page images and covers.
+
+    Bytes are stored content addressed under objects/<sha256>, so identical
+    images of different keys are stored once, and a small sqlite index maps
+    keys to digests and keeps the access order. Once the stored bytes exceed
+    max_bytes the least recently used keys are evicted. Reads hand out file
+    paths or read-only memory maps; a file evicted while it is open stays
+    readable through the open handle.
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike], max_bytes: int = 1024**3):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self._objects = os.path.join(self.directory, "objects")
+        os.makedirs(self._objects, exist_ok=True)
+        # plain sqlite3, the index is too small to need the ORM
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._lock = threading.Lock()
+        self.size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _objectPath(self, digest: str) -> str:
+        return os.path.join(self._objects, digest[:2], digest)
+
+    def path(self, key: PageKey) -> Optional[str]:
+        """Path of the cached bytes, None on a miss."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM pages WHERE key = ?", (_key(key),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE pages SET accessed = ? WHERE key = ?", (time.time(), _key(key))
+            )
+            self.hits += 1
+            return self._objectPath(row[0])
+
+    def __contains__(self, key: PageKey) -> bool:
+        with self._lock:
+            return (
+                self._db.execute(
+                    "SELECT 1 FROM pages WHERE key = ?", (_key(key),)
+                ).fetchone()
+                is not None
+            )
+
+    def get(self, key: PageKey) -> Optional[bytes]:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # evicted between the lookup and the read
+            return None
+
+    def mmap(self, key: PageKey) -> Optional[memoryview]:
+        """Read-only view of the cached bytes, mapped instead of copied."""
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: PageKey, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._objectPath(digest)
+        with self._lock:
+            known = self._db.execute(
+                "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+            if known is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # written next to the target and renamed, readers never see a
+                # partial file
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                self._db.execute(
+                    "INSERT INTO blobs (digest, size) VALUES (?, ?)",
+                    (digest, len(data)),
+                )
+                self.size += len(data)
+            previous = self._db.execute(
+                "SELECT digest FROM pages WHERE key = ?", (_key(key),)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (key, digest, accessed) VALUES (?, ?, ?)",
+                (_key(key), digest, time.time()),
+            )
+            if previous is not None and previous[0] != digest:
+                self._release(previous[0])
+            self._evict(keep=digest)
+        return path
+
+    def _release(self, digest: str):
+        # caller holds self._lock, drops a blob no key points to anymore
+        if self._db.execute(
+            "SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return
+        row = self._db.execute(
+            "SELECT size FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self.size -= row[0]
+        try:
+            os.unlink(self._objectPath(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None):
+        # caller holds self._lock
+        while self.size > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, digest FROM pages ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            rows = [row for row in rows if row[1] != keep]
+            if not rows:
+                return
+            for key, digest in rows:
+                self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._release(digest)
+                self.evictions += 1
+                if self.size <= self.max_bytes:
+                    return
+
+    def invalidate(self, apporuserkey: str, project: Optional[str] = None) -> int:
+        prefix = apporuserkey + "\x1f" + (project + "\x1f" if project else "")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, digest FROM pages WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+            for key, digest in rows:
+                self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._release(digest)
+            return len(rows)
+
+    def clear(self):
+        with self._lock:
+            digests = [row[0] for row in self._db.execute("SELECT digest FROM blobs")]
+            self._db.execute("DELETE FROM pages")
+            for digest in digests:
+                self._release(digest)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class PagePrefetcher:
+    """Downloads page images and covers into a PageImageCache.
+
+    getPage() and getCover() return the path of the cached PNG and only go to
+    the network on a miss: one presigned url request to the backend, one
+    download from the object store. Concurrent requests for the same image
+    share one download. prefetchPages() and prefetchDocument() fill the
+    cache in parallel on max_workers threads. Needs a VectoratorInteractor,
+    the downloads are blocking calls on its transport.
+    """
+
+    def __init__(
+        self,
+        interactor,
+        cache: PageImageCache,
+        apporuser: str = "",
+        max_workers: int = 8,
+    ):
+        if inspect.iscoroutinefunction(interactor.getPdfPagePicture):
+            raise TypeError(
+                "PagePrefetcher needs a VectoratorInteractor, not an async one"
+            )
+        self.interactor = interactor
+        self.cache = cache
+        self.apporuser = apporuser
+        self.apporuserkey = interactor.apporuserKey(apporuser)
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="vectorator-pages"
+        )
+        self._flight = SingleFlight()
+        # updated from the worker threads
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.downloaded_bytes = 0
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _download(self, presigned: str) -> bytes:
+        # straight to the object store, bypassing the backend's breaker and
+        # metrics but reusing the pooled connections
+        response = self.interactor.transport.request("GET", presigned)
+        if not response.ok:
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        with self._lock:
+            self.downloads += 1
+            self.downloaded_bytes += len(response.content)
+        return response.content
+
+    def _fetch(self, key: PageKey, presign) -> str:
+        path = self.cache.path(key)
+        if path is not None:
+            return path
+        return self._flight.do(
+            key, lambda: self.cache.put(key, self._download(presign()))
+        )
+
+    def getPage(self, project: str, pdffilename: str, page: int) -> str:
+        return self._fetch(
+            (self.apporuserkey, project, pdffilename, page),
+            lambda: self.interactor.getPdfPagePicture(
+                project, pdffilename, page, self.apporuser
+            ),
+        )
+
+    def getCover(self, project: str, filename: str) -> str:
+        return self._fetch(
+            (self.apporuserkey, project, filename, None),
+            lambda: self.interactor.getCoverForBook(project, filename, self.apporuser),
+        )
+
+    def prefetchPages(
+        self, project: str, pdffilename: str, pages: Iterable[int]
+    ) -> Dict[int, "Future[str]"]:
+        return {
+            page: self._executor.submit(self.getPage, project, pdffilename, page)
+            for page in pages
+        }
+
+    def prefetchDocument(
+        self,
+        project: str,
+        pdffilename: str,
+        first_page: int = 0,
+        max_pages: Optional[int] = None,
+    ) -> List[str]:
+        """Caches every page of a document, returns their paths in order.
+
+        The page count is not known up front, so pages are fetched in
+        parallel windows of max_workers until the first missing page.
+        """
+        paths: List[str] = []
+        page = first_page
+        last = first_page + max_pages if max_pages is not None else None
+        while last is None or page < last:
+            end = page + self.max_workers
+            if last is not None:
+                end = min(end, last)
+            window = self.prefetchPages(project, pdffilename, range(page, end))
+            for number in range(page, end):
+                try:
+                    paths.append(window[number].result())
+                except VectoratorError as e:
+                    if e.status_code not in MISSING_STATUS_CODES:
+                        raise
+                    for future in window.values():
+                        future.cancel()
+                    return paths
+            page = end
+        return paths
@@ -0,0 +1,291 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from vectoratorinteractor.errors import VectoratorError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# called with (breaker name, old state, new state)
+TransitionCallback = Callable[[str, str, str], None]
+
+
+class CircuitOpenError(VectoratorError):
+    """Raised without contacting the backend while its circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(
+            status_code=503,
+            detail=f"circuit for {name} is open, retry in {retry_in:.1f}s",
+        )
+        self.args = (name, retry_in)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Fails calls fast while a backend keeps failing.
+
+    After failure_threshold consecutive failures (connection errors or 5xx
+    answers) the circuit opens and every call raises CircuitOpenError right
+    away. After recovery_timeout up to half_open_max_calls trial calls go
+    through, a success closes the circuit again and a failure reopens it.
+    Every transition is passed to the on_transition callbacks.
+    """
+
+    def __init__(
+        self,
+        name: str = "vectorator",
+        failure_threshold: int = 5,
+        recovery_timeout: float = 10.0,
+        half_open_max_calls: int = 1,
+        on_transition: Iterable[TransitionCallback] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1 or half_open_max_calls < 1:
+            raise ValueError("thresholds have to be at least 1")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_transition: List[TransitionCallback] = list(on_transition)
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+
+    def clone(self, name: str) -> "CircuitBreaker":
+        """A new closed breaker with the same settings and callbacks."""
+        return CircuitBreaker(
+            name,
+            self.failure_threshold,
+            self.recovery_timeout,
+            self.half_open_max_calls,
+            self.on_transition,
+            self.clock,
+        )
+
+    def _transition(self, state: str) -> Optional[tuple]:
+        # caller holds self._lock, callbacks run after it is released
+        if state == self.state:
+            return None
+        old, self.state = self.state, state
+        self.transitions[state] += 1
+        if state == OPEN:
+            self.opened_at = self.clock()
+        self._trials = 0
+        return (self.name, old, state)
+
+    def _notify(self, transition: Optional[tuple]):
+        if transition is not None:
+            for callback in self.on_transition:
+                callback(*transition)
+
+    def before(self):
+        """Raises CircuitOpenError if the call must not be made."""
+        transition = None
+        with self._lock:
+            if self.state == OPEN:
+                waited = self.clock() - self.opened_at
+                if waited < self.recovery_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.recovery_timeout - waited)
+                transition = self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._trials += 1
+        self._notify(transition)
+
+    def available(self) -> bool:
+        """Whether before() would let a call through, without counting one."""
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() - self.opened_at >= self.recovery_timeout
+            if self.state == HALF_OPEN:
+                return self._trials < self.half_open_max_calls
+            return True
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.failures = 0
+                transition = self._transition(CLOSED)
+            else:
+                self.failures += 1
+                if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                    transition = self._transition(OPEN)
+                else:
+                    transition = None
+        self._notify(transition)
+
+    def record_status(self, status_code: int):
+        self.record(status_code < 500)
+
+    def cancel(self):
+        """Ends a call without an outcome, e.g. a cancelled one.
+
+        Nothing is counted, a half-open trial gives its slot back.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions),
+            }
+
+
+def _server_error(result: Any) -> bool:
+    # a 5xx answer does not win a hedge, the other copy may still succeed
+    return getattr(result, "status_code", 0) >= 500
+
+
+def _close_result(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), "close", None)
+        if close is not None:
+            close()
+
+
+class Hedging:
+    """Sends a second copy of a slow idempotent read and takes the first answer.
+
+    If the first request has not answered after delay seconds, a hedge request
+    is sent and whichever completes first successfully wins. Hedges are paid
+    from a budget: every request earns budget tokens (capped at burst) and a
+    hedge costs one, so at most about budget * requests hedges are sent and a
+    slow backend never sees its load doubled. Only endpoints listed in
+    endpoints are hedged.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0.05,
+        budget: float = 0.1,
+        burst: float = 5.0,
+        endpoints: Iterable[str] = ("quicksearch",),
+        max_workers: int = 16,
+    ):
+        self.delay = delay
+        self.budget = budget
+        self.burst = burst
+        self.endpoints = frozenset(endpoints)
+        self.max_workers = max_workers
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _earn(self):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+
+    def _won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        # both copies run in worker threads so the caller can return as soon
+        # as either answers, the slower one finishes in the background
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="vectorator-hedge"
+                )
+            executor = self._executor
+        self._earn()
+        # copies of the caller's context keep the metrics endpoint label
+        primary = executor.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([primary], timeout=self.delay)
+        if done or not self._spend():
+            return primary.result()
+        hedge = executor.submit(contextvars.copy_context().run, fn)
+        pending = {primary, hedge}
+        failed = []
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None and not _server_error(
+                        future.result()
+                    ):
+                        if future is hedge:
+                            self._won()
+                        return future.result()
+                    failed.append(future)
+            # both failed, the last answer or error is the caller's
+            return failed.pop().result()
+        finally:
+            # a thread can not be interrupted: a loser that did not start yet
+            # is cancelled, the others are closed as soon as they answer
+            for future in pending.union(failed):
+                future.cancel()
+                future.add_done_callback(_close_result)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._earn()
+        primary = asyncio.ensure_future(fn())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.delay)
+            if done or not self._spend():
+                return await primary
+            hedge = asyncio.ensure_future(fn())
+            pending.add(hedge)
+            failed = []
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None and not _server_error(task.result()):
+                        if task is hedge:
+                            self._won()
+                        return task.result()
+                    failed.append(task)
+            return failed.pop().result()
+        finally:
+            # the losing request is cancelled, httpx closes its connection
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "tokens": self._tokens,
+            }
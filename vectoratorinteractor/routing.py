@@ -0,0 +1,288 @@
+import bisect
+import hashlib
+import logging
+import random
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.resilience import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class Backend:
+    """One vectorator deployment as seen by the router."""
+
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        # set by the health checks, the breaker covers failures of real calls
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self._checks_failed = 0
+        self._checks_passed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.breaker.available()
+
+    def acquire(self):
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+
+    def release(self):
+        with self._lock:
+            self.outstanding -= 1
+
+
+class HashRing:
+    """Consistent hash ring, every node owns replicas points on the ring.
+
+    Adding or removing one of n nodes only moves the keys of about 1/n of
+    the ring, everything else keeps its node.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def nodes(self, key: str):
+        """Distinct nodes in ring order starting at the owner of key."""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        for i in range(len(self._points)):
+            owner = self._owners[(start + i) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+
+
+class BackendRouter:
+    """Spreads the calls of an interactor over several vectorator backends.
+
+    Calls of a tenant, the mainappname_apporuser key, are pinned to one
+    backend by consistent hashing, so a tenant's projects, documents and
+    chats always live on the same deployment. Calls listed in stateless,
+    presigned url signing by default, go to the available backend with the
+    fewest outstanding requests instead.
+
+    A backend is ejected while its health checks fail or its circuit
+    breaker is open. Stateless calls then go to the other backends, tenant
+    calls fail with CircuitOpenError until it recovers: no other deployment
+    holds the tenant's data, and writes there would split the tenant. Health
+    checks GET health_path every health_interval seconds in a background
+    thread, any answer below 500 counts as healthy.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        replicas: int = 160,
+        stateless: Iterable[str] = ("presigned_url",),
+        health_path: str = "/",
+        health_interval: float = 10.0,
+        health_timeout: float = 2.0,
+        unhealthy_threshold: int = 2,
+        healthy_threshold: int = 1,
+        breaker_factory: Optional[Callable[[str], CircuitBreaker]] = None,
+    ):
+        self.replicas = replicas
+        self.stateless = frozenset(stateless)
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.unhealthy_threshold = unhealthy_threshold
+        self.healthy_threshold = healthy_threshold
+        self.breaker_factory = breaker_factory or (lambda url: CircuitBreaker(url))
+        self._ring = HashRing(replicas=replicas)
+        self._backends: Dict[str, Backend] = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for url in urls:
+            self.add(url)
+        if not self._backends:
+            raise ValueError("BackendRouter needs at least one backend url")
+        if health_interval > 0:
+            self._thread = threading.Thread(
+                target=self._checkLoop, name="vectorator-health", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def backends(self) -> List[Backend]:
+        with self._lock:
+            return list(self._backends.values())
+
+    @property
+    def urls(self) -> List[str]:
+        return [backend.url for backend in self.backends]
+
+    def add(self, url: str) -> Backend:
+        url = url.rstrip("/")
+        with self._lock:
+            backend = self._backends.get(url)
+            if backend is None:
+                backend = Backend(url, self.breaker_factory(url))
+                self._backends[url] = backend
+                self._ring.add(url)
+            return backend
+
+    def remove(self, url: str):
+        url = url.rstrip("/")
+        with self._lock:
+            if self._backends.pop(url, None) is not None:
+                self._ring.remove(url)
+
+    def route(self, key: str, call: Optional[str] = None) -> str:
+        """Base url of the backend for the tenant key.
+
+        Raises CircuitOpenError if the tenant's backend is ejected, only
+        stateless calls fail over to other backends.
+        """
+        with self._lock:
+            if call is not None and call in self.stateless:
+                return self._leastOutstanding().url
+            owner = next(self._ring.nodes(key), None)
+            if owner is None:
+                raise VectoratorError(503, "no vectorator backends left")
+            backend = self._backends[owner]
+        if not backend.available:
+            raise CircuitOpenError(owner, self._retryIn(backend))
+        return owner
+
+    def _retryIn(self, backend: Backend) -> float:
+        # until the breaker lets a trial call through, or the next health check
+        breaker = backend.breaker
+        if not breaker.available():
+            waited = breaker.clock() - breaker.opened_at
+            return max(breaker.recovery_timeout - waited, 0.0)
+        return self.health_interval
+
+    def _leastOutstanding(self) -> Backend:
+        # caller holds self._lock
+        backends = [b for b in self._backends.values() if b.available]
+        if not backends:
+            backends = list(self._backends.values())
+        fewest = min(backend.outstanding for backend in backends)
+        return random.choice([b for b in backends if b.outstanding == fewest])
+
+    def backend(self, url: str) -> Optional[Backend]:
+        """The backend a request url goes to."""
+        with self._lock:
+            for base, backend in self._backends.items():
+                if url == base or url.startswith(base + "/"):
+                    return backend
+        return None
+
+    def check(self, backend: Backend) -> bool:
+        try:
+            response = self._session.get(
+                backend.url + self.health_path, timeout=self.health_timeout
+            )
+            passed = response.status_code < 500
+            response.close()
+        except requests.RequestException:
+            passed = False
+        with backend._lock:
+            if passed:
+                backend._checks_failed = 0
+                backend._checks_passed += 1
+                if (
+                    not backend.healthy
+                    and backend._checks_passed >= self.healthy_threshold
+                ):
+                    backend.healthy = True
+                    logger.info("vectorator backend %s is healthy again", backend.url)
+            else:
+                backend._checks_passed = 0
+                backend._checks_failed += 1
+                if (
+                    backend.healthy
+                    and backend._checks_failed >= self.unhealthy_threshold
+                ):
+                    backend.healthy = False
+                    logger.warning("vectorator backend %s is unhealthy", backend.url)
+        return passed
+
+    def checkAll(self):
+        for backend in self.backends:
+            self.check(backend)
+
+    def _checkLoop(self):
+        while not self._stop.wait(self.health_interval):
+            self.checkAll()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._session.close()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            backend.url: {
+                "healthy": backend.healthy,
+                "available": backend.available,
+                "outstanding": backend.outstanding,
+                "requests": backend.requests,
+                "breaker": backend.breaker.stats(),
+            }
+            for backend in self.backends
+        }
+
+
+def split_urls(
+    vectoratorurl,
+    router: Optional[BackendRouter],
+    circuit_breaker: Optional[CircuitBreaker] = None,
+) -> Tuple[str, Optional[BackendRouter], bool]:
+    # vectoratorurl is one url or several, returns the primary url, the
+    # router and whether the interactor created the router and closes it.
+    # with several urls circuit_breaker is the template of the per-backend
+    # breakers, a passed router brings its own breaker_factory
+    if router is not None:
+        if circuit_breaker is not None:
+            raise ValueError(
+                "pass either a router or a circuit_breaker, configure the "
+                "router's breakers with its breaker_factory"
+            )
+        return router.urls[0], router, False
+    if isinstance(vectoratorurl, str):
+        return vectoratorurl, None, False
+    urls = list(vectoratorurl)
+    if len(urls) == 1:
+        return urls[0], None, False
+    factory = circuit_breaker.clone if circuit_breaker is not None else None
+    return urls[0], BackendRouter(urls, breaker_factory=factory), True
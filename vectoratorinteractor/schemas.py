@@ -0,0 +1,83 @@
+import enum
+from datetime import datetime
+from typing import List
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class ProcessingState(enum.Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class Persona(enum.Enum):
+    assistant = "assistant"
+    user = "user"
+
+
+class NewMessagePD(BaseModel):
+    message: str
+    persona: Persona
+
+
+class DocumentUploadRequestWithDocumentsPD(BaseModel):
+    id: int
+    apporuser: str
+    project: str
+    processed: bool
+    created_at: datetime
+    errormessage: str | None = None
+    documents: List["FullDocumentWithPreview"] = []
+
+
+class FullDocumentWithPreview(BaseModel):
+    id: int | None = None
+    filename: str
+    apporuser: str
+    project_id: int
+    upload_request_id: int
+    cover_url: str | None = None
+    zoomed_in_url: str | None = None
+
+
+class LangchainDocumentPD(BaseModel):
+    id: UUID
+    filename: str
+    filetype: str
+    source: str
+    content: str
+    # summary: str
+    url: str
+    cover_url: str
+    zoomed_in_url: str | None = None
+    page_number: int | None = None
+
+
+class QuickSearchDocument(BaseModel):
+    score: int
+    filename: str
+    content: str
+    fullcontent: str
+    # summary: str
+    timestamp: str
+
+
+class ChatMessageWithDocumentsPD(BaseModel):
+    id: int
+    message: str
+    persona: Persona
+    created_at: datetime
+    documents: List[LangchainDocumentPD] = []
+
+
+class ChatWithMessagesPD(BaseModel):
+    id: int
+    name: str
+    apporuser: str
+    project: str
+    created_at: datetime
+    processing_state: ProcessingState
+    messages: List[ChatMessageWithDocumentsPD] = []
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+FlightKey = Tuple[str, str, Optional[tuple]]
+
+
+def flight_key(
+    method: str, url: str, params: Optional[Mapping[str, Any]] = None
+) -> FlightKey:
+    return (method, url, tuple(sorted(params.items())) if params else None)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls from many threads into one.
+
+    The first caller of a key runs fn, every caller arriving while it is in
+    flight waits for it and gets the same result object or exception. Nothing
+    is kept once the call finishes, the next caller starts a new one.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight.
+
+    The shared call runs as its own task, so cancelling one waiter does not
+    cancel the request for the others. Once every waiter is cancelled the
+    task is cancelled too, which aborts the request in flight.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], _Flight] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # tasks belong to one event loop, so flights are kept apart per loop
+        loopkey = (id(asyncio.get_running_loop()), key)
+        flight = self._calls.get(loopkey)
+        if flight is not None:
+            self.shared += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[loopkey] = flight
+            self.calls += 1
+            flight.task.add_done_callback(lambda _: self._forget(loopkey, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # the last waiter left, later callers start a new flight
+                self._forget(loopkey, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, loopkey: Tuple[int, Hashable], flight: _Flight):
+        if self._calls.get(loopkey) is flight:
+            del self._calls[loopkey]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._calls),
+        }
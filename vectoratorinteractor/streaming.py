@@ -0,0 +1,269 @@
+import codecs
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from vectoratorinteractor.errors import VectoratorError
+
+
+class StreamToken(BaseModel):
+    index: int
+    text: str
+
+
+class StreamEvent(BaseModel):
+    index: int
+    event: str = "message"
+    # json decoded when the payload is valid json, the raw string otherwise
+    data: Any = None
+    id: Optional[str] = None
+
+
+class StreamStats(BaseModel):
+    bytes: int = 0
+    items: int = 0
+    time_to_first_byte: Optional[float] = None
+    time_to_first_token: Optional[float] = None
+    elapsed: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.items == 0 or self.time_to_first_token is None:
+            return 0.0
+        generating = self.elapsed - self.time_to_first_token
+        return self.items / generating if generating > 0 else float(self.items)
+
+
+class TokenDecoder:
+    """Turns raw byte chunks into text pieces.
+
+    Multibyte characters split across chunks are held back until complete.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._index = 0
+
+    def _tokens(self, text: str) -> List[StreamToken]:
+        if not text:
+            return []
+        self._index += 1
+        return [StreamToken(index=self._index - 1, text=text)]
+
+    def feed(self, chunk: bytes) -> List[StreamToken]:
+        return self._tokens(self._decoder.decode(chunk))
+
+    def flush(self) -> List[StreamToken]:
+        return self._tokens(self._decoder.decode(b"", final=True))
+
+
+_FIELDS = ("event", "data", "id", "retry")
+
+
+class EventDecoder:
+    """Incremental server-sent events parser.
+
+    Frames are separated by a blank line and may arrive split over any number
+    of chunks. Lines without an SSE field prefix (newline delimited json) are
+    treated as data of a "message" event, outside of a frame each of them is
+    emitted as soon as its line is complete.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        # a trailing \r may be the first half of a \r\n split over chunks
+        self._cr = False
+        self._index = 0
+
+    def _text(self, chunk: bytes, final: bool = False) -> str:
+        # decoded chunk with \r\n and \r line ends turned into \n
+        text = self._decoder.decode(chunk, final)
+        if self._cr:
+            text = "\r" + text
+        self._cr = text.endswith("\r") and not final
+        if self._cr:
+            text = text[:-1]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        buffer = self._buffer + self._text(chunk)
+        events = []
+        # scan with an index and trim the buffer once at the end, so a chunk
+        # with many lines is parsed in linear time
+        pos = 0
+        while True:
+            # newline delimited json has no blank lines between items, plain
+            # lines at the start of a frame are emitted as soon as complete
+            line_end = buffer.find("\n", pos)
+            if line_end < 0:
+                break
+            line = buffer[pos:line_end]
+            if not line or self._plain(line):
+                pos = line_end + 1
+                if line:
+                    events.append(self._event("message", line, None))
+                continue
+            end = buffer.find("\n\n", pos)
+            if end < 0:
+                break
+            events.extend(self._parse(buffer[pos:end]))
+            pos = end + 2
+        self._buffer = buffer[pos:]
+        return events
+
+    def flush(self) -> List[StreamEvent]:
+        frame = self._buffer + self._text(b"", final=True)
+        self._buffer = ""
+        return self._parse(frame)
+
+    def _event(self, event: str, data: Optional[str], id: Optional[str]):
+        if data is not None:
+            try:
+                data = json.loads(data)
+            except ValueError:
+                pass
+        self._index += 1
+        return StreamEvent(index=self._index - 1, event=event, data=data, id=id)
+
+    @staticmethod
+    def _plain(line: str) -> bool:
+        # neither an SSE comment nor an SSE field
+        if line.startswith(":"):
+            return False
+        field, sep, _ = line.partition(":")
+        return not sep or field not in _FIELDS
+
+    def _parse(self, frame: str) -> List[StreamEvent]:
+        event, id, data = "message", None, []
+        plain = []
+        for line in frame.split("\n"):
+            if not line or line.startswith(":"):
+                continue
+            if self._plain(line):
+                plain.append(line)
+                continue
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+            elif field == "id":
+                id = value
+        events = []
+        if data or event != "message":
+            events.append(self._event(event, "\n".join(data) if data else None, id))
+        events.extend(self._event("message", line, None) for line in plain)
+        return events
+
+
+class _ParsedStream:
+    def __init__(self, decoder, start: Optional[float] = None):
+        self.decoder = decoder
+        self.stats = StreamStats()
+        # timings are relative to start, pass the time the request was sent
+        self._start = start if start is not None else time.monotonic()
+        self.closed = False
+
+    def _account(self, chunk: bytes, items: list) -> list:
+        now = time.monotonic() - self._start
+        self.stats.elapsed = now
+        if chunk:
+            self.stats.bytes += len(chunk)
+            if self.stats.time_to_first_byte is None:
+                self.stats.time_to_first_byte = now
+        if items:
+            if self.stats.time_to_first_token is None:
+                self.stats.time_to_first_token = now
+            self.stats.items += len(items)
+        return items
+
+
+class ParsedStream(_ParsedStream):
+    """Iterator of StreamToken or StreamEvent objects over a streamed response.
+
+    close() (or leaving the with block) drops the connection right away so the
+    backend stops generating.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterator[bytes],
+        decoder,
+        close: Callable[[], None],
+        start: Optional[float] = None,
+    ):
+        super().__init__(decoder, start)
+        self._chunks = chunks
+        self._close = close
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                yield from self._account(chunk, self.decoder.feed(chunk))
+            yield from self._account(b"", self.decoder.flush())
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncParsedStream(_ParsedStream):
+    """asyncio counterpart of ParsedStream, opens the request on first use."""
+
+    def __init__(self, open_stream: Callable[[], Any], decoder):
+        super().__init__(decoder)
+        self._open_stream = open_stream
+        self._context = None
+
+    async def _open(self):
+        self._start = time.monotonic()
+        self._context = self._open_stream()
+        response = await self._context.__aenter__()
+        if not response.is_success:
+            await response.aread()
+            await self.aclose()
+            raise VectoratorError(
+                status_code=response.status_code, detail=response.text
+            )
+        return response
+
+    async def __aiter__(self) -> AsyncIterator:
+        if self.closed:
+            return
+        try:
+            response = await self._open()
+            async for chunk in response.aiter_bytes():
+                for item in self._account(chunk, self.decoder.feed(chunk)):
+                    yield item
+            for item in self._account(b"", self.decoder.flush()):
+                yield item
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if not self.closed:
+            self.closed = True
+            if self._context is not None:
+                await self._context.__aexit__(None, None, None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# only methods that are safe to repeat are retried. PUT is left out on purpose:
+# addMessage uses PUT and appends a message on every call.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class HttpTransport:
+    """Pooled keep-alive HTTP transport shared by all calls of one interactor.
+
+    pool_connections is the number of per-host pools kept alive, pool_maxsize
+    the number of connections kept per host. With pool_block=True callers wait
+    for a free connection instead of opening extra ones beyond pool_maxsize.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        pool_block: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: Optional[float] = 120.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.3,
+        retry_methods: Iterable[str] = IDEMPOTENT_METHODS,
+        retry_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+        session: Optional[requests.Session] = None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            allowed_methods=frozenset(m.upper() for m in retry_methods),
+            status_forcelist=frozenset(retry_status_codes),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=self.retry,
+        )
+        self.session = session if session is not None else requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.closed = False
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.closed:
+            raise RuntimeError("transport is closed")
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncHttpTransport:
+    """asyncio counterpart of HttpTransport built on a shared httpx.AsyncClient.
+
+    max_connections caps all open connections, max_keepalive_connections the
+    idle ones kept for reuse. Idempotent requests are retried with exponential
+    backoff on connection errors and on RETRY_STATUS_CODES.
+    """
+
+    # httpx is imported lazily so sync-only users never pay for it
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: Optional[float] = 120.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.3,
+        retry_methods: Iterable[str] = IDEMPOTENT_METHODS,
+        retry_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+        client=None,
+    ):
+        import httpx
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_methods = frozenset(m.upper() for m in retry_methods)
+        self.retry_status_codes = frozenset(retry_status_codes)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(
+                    read_timeout, connect=connect_timeout, pool=connect_timeout
+                ),
+            )
+        self.client = client
+        self.closed = False
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_factor * (2**attempt)
+
+    async def request(self, method: str, url: str, **kwargs):
+        import httpx
+
+        if self.closed:
+            raise RuntimeError("transport is closed")
+        retries = self.max_retries if method.upper() in self.retry_methods else 0
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in self.retry_status_codes
+                    or attempt >= retries
+                ):
+                    response.extensions["retries"] = attempt
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stream(self, method: str, url: str, **kwargs):
+        # streamed requests are never retried, the body is handed to the caller
+        if self.closed:
+            raise RuntimeError("transport is closed")
+        return self.client.stream(method, url, **kwargs)
+
+    async def aclose(self):
+        if not self.closed:
+            self.closed = True
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from vectoratorinteractor.schemas import QuickSearchDocument
+
+logger = logging.getLogger(__name__)
+
+ProjectKey = Tuple[str, str]
+
+
+class QuickSearchUpdate(BaseModel):
+    query: str
+    documents: List[QuickSearchDocument]
+    # narrowed down from the results of a shorter cached query, the real
+    # results follow once the backend answered
+    provisional: bool = False
+    cached: bool = False
+
+
+class QuickSearchCache:
+    """Recent quicksearch results, a small LRU per project."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._projects: Dict[ProjectKey, "OrderedDict[str, list]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, project: ProjectKey, query: str) -> Optional[list]:
+        with self._lock:
+            entries = self._projects.get(project)
+            documents = entries.get(query) if entries is not None else None
+            if documents is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(query)
+            self.hits += 1
+            return documents
+
+    def put(self, project: ProjectKey, query: str, documents: list):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            entries = self._projects.setdefault(project, OrderedDict())
+            entries[query] = documents
+            entries.move_to_end(query)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def prefix(self, project: ProjectKey, query: str) -> Optional[Tuple[str, list]]:
+        # the longest cached query that query extends, "inv" for "invoi"
+        with self._lock:
+            entries = self._projects.get(project)
+            if not entries:
+                return None
+            best = None
+            for cached in entries:
+                if len(cached) < len(query) and query.startswith(cached):
+                    if best is None or len(cached) > len(best):
+                        best = cached
+            return (best, entries[best]) if best is not None else None
+
+    def invalidate(self, project: Optional[ProjectKey] = None):
+        with self._lock:
+            if project is None:
+                self._projects.clear()
+            else:
+                self._projects.pop(project, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "projects": len(self._projects),
+                "size": sum(len(entries) for entries in self._projects.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def narrow(
+    documents: List[QuickSearchDocument], query: str
+) -> List[QuickSearchDocument]:
+    # results of "inv" that still match "invoice", as a placeholder
+    needle = query.casefold()
+    return [
+        document
+        for document in documents
+        if needle in document.filename.casefold()
+        or needle in document.content.casefold()
+    ]
+
+
+class _SessionBase:
+    def __init__(
+        self,
+        interactor,
+        project: str,
+        on_results: Optional[Callable[[QuickSearchUpdate], None]],
+        apporuser: str,
+        debounce: float,
+        min_length: int,
+        cache: Optional[QuickSearchCache],
+    ):
+        self.interactor = interactor
+        self.project = project
+        self.apporuser = apporuser
+        self.on_results = on_results
+        self.debounce = debounce
+        self.min_length = min_length
+        self.cache = cache if cache is not None else QuickSearchCache()
+        self._key = (interactor.apporuserKey(apporuser), project)
+        self._generation = 0
+        self.requests = 0
+        self.stale = 0
+        self.provisional = 0
+
+    def _immediate(self, query: str) -> Optional[List[QuickSearchDocument]]:
+        # results that need no request: too short queries and cache hits
+        if len(query.strip()) < self.min_length:
+            return []
+        return self.cache.get(self._key, query)
+
+    def _provisional(self, query: str) -> Optional[QuickSearchUpdate]:
+        found = self.cache.prefix(self._key, query)
+        if found is None:
+            return None
+        documents = narrow(found[1], query)
+        if not documents:
+            return None
+        self.provisional += 1
+        return QuickSearchUpdate(query=query, documents=documents, provisional=True)
+
+    def _notify(self, update: QuickSearchUpdate):
+        if self.on_results is None:
+            return
+        try:
+            self.on_results(update)
+        except Exception:
+            logger.exception("quicksearch on_results callback failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "stale": self.stale,
+            "provisional": self.provisional,
+            "cache_hits": self.cache.hits,
+        }
+
+
+class QuickSearchSession(_SessionBase):
+    """Typeahead search over one project for VectoratorInteractor.
+
+    Call update() on every keystroke. A query is only sent once the input has
+    been quiet for debounce seconds, repeated and backspaced queries are
+    answered from a per-project LRU of recent results without a request, and
+    while a query is pending the narrowed results of a cached prefix are
+    delivered as provisional. on_results only ever sees the latest query:
+    results of superseded queries are dropped and their futures cancelled. A
+    blocking request cannot be aborted, so a stale one runs to completion in
+    the background and its results still go to the cache.
+    """
+
+    def __init__(
+        self,
+        interactor,
+        project: str,
+        on_results: Optional[Callable[[QuickSearchUpdate], None]] = None,
+        apporuser: str = "",
+        debounce: float = 0.15,
+        min_length: int = 1,
+        cache: Optional[QuickSearchCache] = None,
+        max_in_flight: int = 4,
+    ):
+        super().__init__(
+            interactor, project, on_results, apporuser, debounce, min_length, cache
+        )
+        # reentrant, on_results may call update() again
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._future: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="vectorator-typeahead"
+        )
+        self._closed = False
+
+    def update(self, query: str) -> "Future[List[QuickSearchDocument]]":
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("QuickSearchSession is closed")
+            self._supersede()
+            self._generation += 1
+            generation = self._generation
+            self._future = future
+            documents = self._immediate(query)
+            if documents is not None:
+                self._deliver(generation, query, documents, cached=True)
+                return future
+            provisional = self._provisional(query)
+            if provisional is not None:
+                self._notify(provisional)
+            self._timer = threading.Timer(
+                self.debounce, self._submit, (generation, query)
+            )
+            self._timer.daemon = True
+            self._timer.start()
+        return future
+
+    def _supersede(self):
+        # caller holds self._lock
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._future is not None and self._future.cancel():
+            self.stale += 1
+        self._future = None
+
+    def _submit(self, generation: int, query: str):
+        with self._lock:
+            if generation != self._generation or self._closed:
+                return
+            self.requests += 1
+            self._executor.submit(self._fetch, generation, query)
+
+    def _fetch(self, generation: int, query: str):
+        try:
+            documents = self.interactor.quicksearch(self.project, query, self.apporuser)
+        except Exception as e:
+            with self._lock:
+                if generation == self._generation and self._future is not None:
+                    if self._future.set_running_or_notify_cancel():
+                        self._future.set_exception(e)
+            return
+        self.cache.put(self._key, query, documents)
+        with self._lock:
+            self._deliver(generation, query, documents, cached=False)
+
+    def _deliver(self, generation: int, query: str, documents, cached: bool):
+        # caller holds self._lock, so an older answer can never overtake
+        if generation != self._generation:
+            return
+        future, self._future = self._future, None
+        if future is None or not future.set_running_or_notify_cancel():
+            return
+        future.set_result(documents)
+        self._notify(QuickSearchUpdate(query=query, documents=documents, cached=cached))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._supersede()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncQuickSearchSession(_SessionBase):
+    """QuickSearchSession for AsyncVectoratorInteractor.
+
+    update() has to be called from the event loop. The debounce wait and the
+    request run in one task per query, superseding a query cancels its task,
+    which also aborts a request already in flight. With single flight a
+    request that other callers still wait for keeps running for them.
+    """
+
+    def __init__(
+        self,
+        interactor,
+        project: str,
+        on_results: Optional[Callable[[QuickSearchUpdate], None]] = None,
+        apporuser: str = "",
+        debounce: float = 0.15,
+        min_length: int = 1,
+        cache: Optional[QuickSearchCache] = None,
+    ):
+        super().__init__(
+            interactor, project, on_results, apporuser, debounce, min_length, cache
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, query: str) -> "asyncio.Future[List[QuickSearchDocument]]":
+        self._supersede()
+        self._generation += 1
+        documents = self._immediate(query)
+        if documents is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(documents)
+            self._notify(
+                QuickSearchUpdate(query=query, documents=documents, cached=True)
+            )
+            return future
+        provisional = self._provisional(query)
+        if provisional is not None:
+            self._notify(provisional)
+        self._task = asyncio.ensure_future(self._run(self._generation, query))
+        return self._task
+
+    async def search(self, query: str) -> List[QuickSearchDocument]:
+        """update() and wait, raises CancelledError if superseded meanwhile."""
+        return await self.update(query)
+
+    def _supersede(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.stale += 1
+        self._task = None
+
+    async def _run(self, generation: int, query: str) -> List[QuickSearchDocument]:
+        await asyncio.sleep(self.debounce)
+        self.requests += 1
+        documents = await self.interactor.quicksearch(
+            self.project, query, self.apporuser
+        )
+        self.cache.put(self._key, query, documents)
+        if generation == self._generation:
+            self._notify(QuickSearchUpdate(query=query, documents=documents))
+        return documents
+
+    async def aclose(self):
+        task = self._task
+        self._supersede()
+        if task is not None and not task.done():
+            await asyncio.wait({task})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
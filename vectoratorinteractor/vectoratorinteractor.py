@@ -1,23 +1,76 @@
-import json
+import threading
+import time
 from datetime import date
-from typing import List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 
 import requests
-from fastapi import HTTPException, UploadFile
 
-from vectoratorinteractor.models import (
-    ChatMessage,
+from vectoratorinteractor.batch import BatchResult, run_bounded
+from vectoratorinteractor.cache import (
+    CHAT_ENDPOINTS,
+    DOCUMENT_ENDPOINTS,
+    ResponseCache,
+    TTLCache,
+    presigned_ttl,
+)
+from vectoratorinteractor.compact import CompactChat, compaction
+from vectoratorinteractor.decoding import (
+    JSON_HEADERS,
+    JsonArraySplitter,
+    decode,
+    decode_items,
+    encode_messages,
+)
+from vectoratorinteractor.errors import http_error
+from vectoratorinteractor.metrics import (
+    Metrics,
+    StreamedCall,
+    body_size,
+    current_endpoint,
+    instrumented,
+)
+from vectoratorinteractor.multipart import (
+    DEFAULT_CHUNK_SIZE,
+    MultipartEncoder,
+    ProgressCallback,
+    UploadSource,
+)
+from vectoratorinteractor.resilience import CircuitBreaker, Hedging
+from vectoratorinteractor.routing import BackendRouter, split_urls
+from vectoratorinteractor.schemas import (
     ChatWithMessagesPD,
-    DocumentUploadRequest,
     DocumentUploadRequestWithDocumentsPD,
     FullDocumentWithPreview,
-    NewChatPD,
     NewMessagePD,
     Persona,
     ProcessingState,
-    Project,
     QuickSearchDocument,
 )
+from vectoratorinteractor.singleflight import SingleFlight, flight_key
+from vectoratorinteractor.streaming import EventDecoder, ParsedStream, TokenDecoder
+from vectoratorinteractor.transport import HttpTransport
+from vectoratorinteractor.waiting import (
+    TERMINAL_STATES,
+    WaitPolicy,
+    WaitResult,
+    watch_events,
+)
+
+if TYPE_CHECKING:
+    # only for annotations, fastapi and the sqlmodel tables are loaded lazily
+    from fastapi import UploadFile
+
+    from vectoratorinteractor.models import ChatMessage, DocumentUploadRequest, Project
 
 
 class VectoratorInteractor:
@@ -25,11 +78,179 @@ class VectoratorInteractor:
         self,
         mainappname: str = "vinteractor",
         apporuserdefault: str = "",
-        vectoratorurl: str = "http://vectorator-service.vectorator.svc.cluster.local:8000",
+        vectoratorurl: Union[
+            str, Sequence[str]
+        ] = "http://vectorator-service.vectorator.svc.cluster.local:8000",
+        transport: Optional[HttpTransport] = None,
+        presigned_cache_size: int = 4096,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: bool = True,
+        metrics: Optional[Metrics] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedging: Optional[Hedging] = None,
+        router: Optional[BackendRouter] = None,
     ):
         self.mainappname = mainappname
-        self.vectoratorurl = vectoratorurl
+        # several backend urls or a BackendRouter shard tenants over several
+        # deployments, vectoratorurl is then the first of them. every backend
+        # gets its own breaker, circuit_breaker is their template
+        self.vectoratorurl, self.router, self._ownsRouter = split_urls(
+            vectoratorurl, router, circuit_breaker
+        )
         self.apporuserdefault = apporuserdefault
+        # presigned urls for files, page pictures and covers are cached for a
+        # fraction of the validity their expiry query parameters state
+        self.presignedCache = TTLCache(maxsize=presigned_cache_size)
+        # optional read-through cache for listings, off unless a ResponseCache
+        # is passed. mutations through this client invalidate it
+        self.responseCache = response_cache
+        # per-endpoint latency, bytes, status codes and request hooks, see Metrics
+        self.metrics = metrics
+        # fail fast while the backend is unhealthy, and hedge slow reads of the
+        # endpoints listed in hedging.endpoints (quicksearch by default)
+        self.circuitBreaker = circuit_breaker
+        self.hedging = hedging
+        self.singleFlight = SingleFlight() if single_flight else None
+        # one pooled keep-alive transport for all calls, pass your own HttpTransport
+        # to tune pool sizes, timeouts and retries
+        self.transport = transport if transport is not None else HttpTransport()
+
+    def close(self):
+        if self.hedging is not None:
+            self.hedging.close()
+        if self._ownsRouter:
+            self.router.close()
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # with a router every backend has its own breaker
+        backend = self.router.backend(url) if self.router is not None else None
+        breaker = backend.breaker if backend is not None else self.circuitBreaker
+        if breaker is None:
+            return self._send(method, url, **kwargs)
+        breaker.before()
+        if backend is not None:
+            backend.acquire()
+        held = False
+        try:
+            response = self._send(method, url, **kwargs)
+            # a streamed body is still being read, StreamedCall releases the
+            # backend once the stream is closed
+            held = backend is not None and kwargs.get("stream", False)
+        except Exception:
+            breaker.record(False)
+            raise
+        except BaseException:
+            # cancelled, e.g. the losing copy of a hedged read, is no failure
+            breaker.cancel()
+            raise
+        finally:
+            if backend is not None and not held:
+                backend.release()
+        breaker.record_status(response.status_code)
+        return response
+
+    def _base(self, apporuser: str, call: Optional[str] = None) -> str:
+        # backend url for the tenant, always vectoratorurl without a router
+        return self._tenantBase(self.apporuserKey(apporuser), call)
+
+    def _tenantBase(self, apporuserkey: str, call: Optional[str] = None) -> str:
+        if self.router is None:
+            return self.vectoratorurl
+        return self.router.route(apporuserkey, call)
+
+    def _read(self, url: str, endpoint: str, **kwargs) -> requests.Response:
+        # idempotent GET, hedged when the endpoint is configured for it
+        hedging = self.hedging
+        if hedging is None or endpoint not in hedging.endpoints:
+            return self._request("GET", url, **kwargs)
+        return hedging.call(lambda: self._request("GET", url, **kwargs))
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        metrics = self.metrics
+        if metrics is None:
+            return self.transport.request(method, url, **kwargs)
+        record = metrics.begin(
+            method, url, body_size(kwargs), kwargs.get("stream", False)
+        )
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except Exception as e:
+            metrics.end(record, error=e)
+            raise
+        metrics.end(record, response)
+        return response
+
+    def _cachedGet(
+        self, url: str, apporuserkey: str, project: Optional[str], endpoint: str
+    ) -> bytes:
+        cache = self.responseCache
+        if cache is None or not cache.enabled(endpoint):
+            response = self._read(url, endpoint)
+            if not response.ok:
+                raise http_error(status_code=response.status_code, detail=response.text)
+            return response.content
+        key = (apporuserkey, project, endpoint, url)
+        generation = cache.generation
+        entry, fresh = cache.lookup(key)
+        if fresh:
+            return entry.content
+        headers = entry.validators if entry is not None else {}
+        response = self._read(url, endpoint, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            cache.refresh(key, entry, response.headers, generation)
+            return entry.content
+        if not response.ok:
+            raise http_error(status_code=response.status_code, detail=response.text)
+        return cache.store(key, response.content, response.headers, generation).content
+
+    def _get(
+        self,
+        tp,
+        url: str,
+        apporuserkey: str,
+        project: Optional[str],
+        endpoint: str,
+        decoder: Optional[Callable[[bytes], Any]] = None,
+    ):
+        # identical reads that are in flight at the same time share one request
+        # and one decoded result, nothing is kept after the call finishes.
+        # decoder replaces decode(tp, ...), only reads with the same decoder
+        # share a result
+        def fetch():
+            content = self._cachedGet(url, apporuserkey, project, endpoint)
+            return decode(tp, content) if decoder is None else decoder(content)
+
+        if self.singleFlight is None:
+            return fetch()
+        key = flight_key("GET", url, {"decoder": decoder} if decoder else None)
+        return self.singleFlight.do(key, fetch)
+
+    def _invalidateResponses(
+        self, apporuserkey: str, project: Optional[str], *endpoints: str
+    ):
+        if self.responseCache is not None:
+            self.responseCache.invalidate(apporuserkey, project, endpoints or None)
+
+    def invalidatePresignedUrls(
+        self, project: Optional[str] = None, apporuser: str = ""
+    ) -> int:
+        if project is None and apporuser == "":
+            return self.presignedCache.invalidate()
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        return self.presignedCache.invalidate(
+            lambda key: key[0] == apporuserkey and project in (None, key[1])
+        )
+
+    def apporuserKey(self, apporuser: str = "") -> str:
+        # the tenant key the backend stores as apporuser
+        return self.__getOrRaiseApporuserConstructor(apporuser)
 
     def __getOrRaiseApporuserConstructor(self, apporuser: str):
         if (
@@ -45,94 +266,179 @@ class VectoratorInteractor:
         else:
             return self.mainappname + "_" + self.apporuserdefault
 
+    def _openStream(
+        self, endpoint: str, method: str, url: str, **kwargs
+    ) -> StreamedCall:
+        # streamed calls return lazily, so they are timed by StreamedCall
+        # instead of @instrumented, the request is labelled with endpoint
+        metrics = self.metrics
+        token = current_endpoint.set(endpoint) if metrics is not None else None
+        start = time.monotonic()
+        backend = self.router.backend(url) if self.router is not None else None
+        release = backend.release if backend is not None else None
+        try:
+            response = self._request(method, url, stream=True, **kwargs)
+            if not response.ok:
+                try:
+                    detail = response.text
+                finally:
+                    response.close()
+                    if release is not None:
+                        release()
+                raise http_error(status_code=response.status_code, detail=detail)
+        except BaseException as e:
+            if metrics is not None:
+                metrics.observe_call(endpoint, time.monotonic() - start, e)
+            raise
+        finally:
+            if token is not None:
+                current_endpoint.reset(token)
+        return StreamedCall(metrics, endpoint, response, start, release)
+
+    def __iterArray(self, endpoint: str, url: str, tp, chunk_size: int) -> Iterator:
+        call = self._openStream(endpoint, "GET", url)
+
+        def items():
+            splitter = JsonArraySplitter()
+            try:
+                for chunk in call.chunks(chunk_size):
+                    yield from decode_items(tp, splitter.feed(chunk))
+                splitter.close()
+            finally:
+                call.close()
+
+        return items()
+
+    @instrumented
     def uploadDocuments(
         self,
         project: str,
-        files: List[UploadFile],
+        files: List[Union["UploadFile", UploadSource]],
         apporuser: str = "",
         highresmode: bool = False,
-    ) -> DocumentUploadRequest:
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> "DocumentUploadRequest":
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/upload/"
         )
-        newFiles = []
-        for f in files:
-            newFiles.append(("upload_files", (f.filename, f.file, f.content_type)))
-
-        response = requests.post(
-            url, files=newFiles, params={"highresmode": highresmode}
+        # the multipart body is streamed in chunk_size pieces instead of being
+        # built in memory, files can be UploadFiles, paths or open binary files
+        body = MultipartEncoder(
+            [("upload_files", f) for f in files], chunk_size, progress
         )
+        headers = {"Content-Type": body.content_type}
+        if body.length is not None:
+            headers["Content-Length"] = str(body.length)
+        try:
+            # requests calls len() on the body, a plain iterator makes it
+            # fall back to chunked transfer encoding for unknown sizes
+            response = self._request(
+                "POST",
+                url,
+                data=body if body.length is not None else iter(body),
+                headers=headers,
+                params={"highresmode": highresmode},
+            )
+        finally:
+            body.close()
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return DocumentUploadRequest(**response.json())
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser),
+            project,
+            *DOCUMENT_ENDPOINTS,
+        )
+        from vectoratorinteractor.models import DocumentUploadRequest
 
+        return decode(DocumentUploadRequest, response.content)
+
+    @instrumented
     def getUploadRequests(
         self, project: str, apporuser: str = ""
     ) -> List[DocumentUploadRequestWithDocumentsPD]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/uploadrequests"
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/uploadrequests"
+        )
+        return self._get(
+            List[DocumentUploadRequestWithDocumentsPD],
+            url,
+            apporuserkey,
+            project,
+            "uploadrequests",
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return [DocumentUploadRequestWithDocumentsPD(**req) for req in response.json()]
 
+    @instrumented
     def getUploadRequestById(
         self, project: str, uploadrequest_id: int, apporuser: str = ""
     ) -> DocumentUploadRequestWithDocumentsPD:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/uploadrequests/{uploadrequest_id}"
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/uploadrequests/{uploadrequest_id}"
+        )
+        return self._get(
+            DocumentUploadRequestWithDocumentsPD,
+            url,
+            apporuserkey,
+            project,
+            "uploadrequest",
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return DocumentUploadRequestWithDocumentsPD(**response.json())
 
+    @instrumented
     def getProjects(self, apporuser: str) -> List[str]:
-        url = (
-            self.vectoratorurl
-            + f"/projects/{self.__getOrRaiseApporuserConstructor(apporuser)}/"
-        )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/projects/{apporuserkey}/"
+        return self._get(List[str], url, apporuserkey, None, "projects")
 
-    def createProject(self, project: str, apporuser: str = "") -> Project:
+    @instrumented
+    def createProject(self, project: str, apporuser: str = "") -> "Project":
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/"
         )
-        response = requests.post(url)
+        response = self._request("POST", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return Project(**response.json())
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), None, "projects"
+        )
+        from vectoratorinteractor.models import Project
 
+        return decode(Project, response.content)
+
+    @instrumented
     def listFiles(self, project: str, apporuser: str = "") -> List[str]:
-        url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/s3files"
-        )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/documents/{apporuserkey}/{project}/s3files"
+        return self._get(List[str], url, apporuserkey, project, "files")
 
+    @instrumented
     def getPresignedUrl(
         self, project: str, filename: str, apporuser: str = "", validity_days: int = 7
     ) -> str:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, filename, validity_days)
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/presigned_url/{filename}"
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{filename}"
         )
-        response = requests.get(url, params={"validityDays": validity_days})
+        response = self._request("GET", url, params={"validityDays": validity_days})
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.text.replace('"', "")
+            raise http_error(status_code=response.status_code, detail=response.text)
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(
+            cachekey, presigned, presigned_ttl(presigned, validity_days)
+        )
+        return presigned
 
+    @instrumented
     def getPdfPagePicture(
         self, project: str, pdffilename: str, page: int, apporuser: str = ""
     ):
@@ -140,170 +446,315 @@ class VectoratorInteractor:
         justfilename = pdffilename[:-4]
         if "/" in justfilename:
             justfilename = justfilename.split("/")[-1]
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, f"{justfilename}/{page}.png")
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/presigned_url/{justfilename}/{page}.png"
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{justfilename}/{page}.png"
         )
-        response = requests.get(url)
+        response = self._request("GET", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.text.replace('"', "")
+            raise http_error(status_code=response.status_code, detail=response.text)
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(cachekey, presigned, presigned_ttl(presigned))
+        return presigned
 
+    @instrumented
     def getCoverForBook(self, project: str, filename: str, apporuser: str = "") -> str:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        cachekey = (apporuserkey, project, filename + ".png")
+        presigned = self.presignedCache.get(cachekey)
+        if presigned is not None:
+            return presigned
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/presigned_url/{filename + '.png'}"
+            self._base(apporuser, "presigned_url")
+            + f"/documents/{apporuserkey}/{project}/presigned_url/{filename + '.png'}"
         )
-        response = requests.get(url)
+        response = self._request("GET", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.text.replace('"', "")
+            raise http_error(status_code=response.status_code, detail=response.text)
+        presigned = response.text.replace('"', "")
+        self.presignedCache.set(cachekey, presigned, presigned_ttl(presigned))
+        return presigned
 
+    @instrumented
     def deleteProjectFromBackend(self, project: str, apporuser: str = ""):
-        url = (
-            self.vectoratorurl
-            + f"/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/"
-        )
-        response = requests.delete(url)
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/{apporuserkey}/{project}/"
+        response = self._request("DELETE", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(apporuserkey, project)
+        self._invalidateResponses(apporuserkey, None, "projects")
+        self.invalidatePresignedUrls(project, apporuser)
 
+    @instrumented
     def quicksearch(
         self, project: str, query: str, apporuser: str = ""
     ) -> List[QuickSearchDocument]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/quicksearch/{query}"
+            self._base(apporuser)
+            + f"/documents/{apporuserkey}/{project}/quicksearch/{query}"
+        )
+        return self._get(
+            List[QuickSearchDocument], url, apporuserkey, project, "quicksearch"
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return [QuickSearchDocument(**doc) for doc in response.json()]
 
     # Document operations
+    @instrumented
     def getDocuments(
         self, project: str, apporuser: str = ""
     ) -> List[FullDocumentWithPreview]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/documents/{apporuserkey}/{project}"
+        return self._get(
+            List[FullDocumentWithPreview], url, apporuserkey, project, "documents"
+        )
+
+    def iterDocuments(
+        self, project: str, apporuser: str = "", chunk_size: int = 64 * 1024
+    ) -> Iterator[FullDocumentWithPreview]:
+        # yields documents while the listing is still downloading, only one
+        # document is held in memory at a time
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}"
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return [FullDocumentWithPreview(**doc) for doc in response.json()]
+        return self.__iterArray(
+            "iterDocuments", url, FullDocumentWithPreview, chunk_size
+        )
 
+    @instrumented
     def getDocumentById(self, project: str, document_id: int, apporuser: str = ""):
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
         url = (
-            self.vectoratorurl
-            + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{document_id}"
+            self._base(apporuser) + f"/documents/{apporuserkey}/{project}/{document_id}"
+        )
+        return self._get(
+            FullDocumentWithPreview, url, apporuserkey, project, "document"
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return FullDocumentWithPreview(**response.json())
 
+    @instrumented
     def deleteDocumentById(self, project: str, document_id: int, apporuser: str = ""):
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/documents/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{document_id}"
         )
-        response = requests.delete(url)
+        response = self._request("DELETE", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser),
+            project,
+            *DOCUMENT_ENDPOINTS,
+        )
+        # only the id is known here, so every url of the project is dropped
+        self.invalidatePresignedUrls(project, apporuser)
 
     ### Chat routes
-    def getChats(self, project: str, apporuser: str = "") -> List[ChatWithMessagesPD]:
+    @instrumented
+    def getChats(
+        self,
+        project: str,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[List[ChatWithMessagesPD], List[CompactChat]]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/"
+        compactor = compaction(compact, drop_fields)
+        return self._get(
+            List[ChatWithMessagesPD],
+            url,
+            apporuserkey,
+            project,
+            "chats",
+            compactor.chats if compactor else None,
+        )
+
+    def iterChats(
+        self, project: str, apporuser: str = "", chunk_size: int = 64 * 1024
+    ) -> Iterator[ChatWithMessagesPD]:
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/"
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return [ChatWithMessagesPD(**chat) for chat in response.json()]
+        return self.__iterArray("iterChats", url, ChatWithMessagesPD, chunk_size)
 
+    @instrumented
     def getChat(
-        self, project: str, chat_id: int, apporuser: str = ""
-    ) -> ChatWithMessagesPD:
-        url = (
-            self.vectoratorurl
-            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}"
+        self,
+        project: str,
+        chat_id: int,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/{chat_id}"
+        compactor = compaction(compact, drop_fields)
+        return self._get(
+            ChatWithMessagesPD,
+            url,
+            apporuserkey,
+            project,
+            "chat",
+            compactor.chat if compactor else None,
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ChatWithMessagesPD(**response.json())
 
+    @instrumented
     def getChatByName(
-        self, project: str, chatname: str, apporuser: str = ""
-    ) -> ChatWithMessagesPD:
+        self,
+        project: str,
+        chatname: str,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
         url = (
-            self.vectoratorurl
-            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/by_name/{chatname}"
+            self._base(apporuser) + f"/chat/{apporuserkey}/{project}/by_name/{chatname}"
+        )
+        compactor = compaction(compact, drop_fields)
+        return self._get(
+            ChatWithMessagesPD,
+            url,
+            apporuserkey,
+            project,
+            "chatbyname",
+            compactor.chat if compactor else None,
         )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ChatWithMessagesPD(**response.json())
 
+    @instrumented
     def getChatStatus(
         self, project: str, chat_id: int, apporuser: str = ""
     ) -> ProcessingState:
-        url = (
-            self.vectoratorurl
-            + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/status/{chat_id}"
-        )
-        response = requests.get(url)
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ProcessingState(response.json())
+        apporuserkey = self.__getOrRaiseApporuserConstructor(apporuser)
+        url = self._base(apporuser) + f"/chat/{apporuserkey}/{project}/status/{chat_id}"
+        return self._get(ProcessingState, url, apporuserkey, project, "chatstatus")
 
+    @instrumented
     def createChat(
         self, project: str, chatname: str, apporuser: str = ""
     ) -> ChatWithMessagesPD:
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chatname}"
         )
 
-        response = requests.post(url)
+        response = self._request("POST", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ChatWithMessagesPD(**response.json())
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        return decode(ChatWithMessagesPD, response.content)
 
+    @instrumented
     def renameChat(
         self, project: str, chat_id: int, new_name: str, apporuser: str = ""
     ) -> ChatWithMessagesPD:
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}/rename"
         )
-        response = requests.put(url, params={"new_name": new_name})
+        response = self._request("PUT", url, params={"new_name": new_name})
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ChatWithMessagesPD(**response.json())
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        return decode(ChatWithMessagesPD, response.content)
 
+    @instrumented
     def addMessage(
-        self, project: str, chat_id: int, message: NewMessagePD, apporuser: str = ""
-    ) -> ChatWithMessagesPD:
+        self,
+        project: str,
+        chat_id: int,
+        message: NewMessagePD,
+        apporuser: str = "",
+        compact: bool = False,
+        drop_fields: Sequence[str] = (),
+    ) -> Union[ChatWithMessagesPD, CompactChat]:
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}/message"
         )
-        response = requests.put(url, json=json.loads(message.model_dump_json()))
+        response = self._request(
+            "PUT", url, data=message.model_dump_json().encode(), headers=JSON_HEADERS
+        )
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return ChatWithMessagesPD(**response.json())
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+        compactor = compaction(compact, drop_fields)
+        if compactor:
+            return compactor.chat(response.content)
+        return decode(ChatWithMessagesPD, response.content)
 
+    @instrumented
     def deleteChat(self, project: str, chat_id: int, apporuser: str = ""):
         url = (
-            self.vectoratorurl
+            self._base(apporuser)
             + f"/chat/{self.__getOrRaiseApporuserConstructor(apporuser)}/{project}/{chat_id}"
         )
-        response = requests.delete(url)
+        response = self._request("DELETE", url)
         if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+            raise http_error(status_code=response.status_code, detail=response.text)
+        self._invalidateResponses(
+            self.__getOrRaiseApporuserConstructor(apporuser), project, *CHAT_ENDPOINTS
+        )
+
+    # Bulk operations, results keep input order and failed items end up in
+    # BatchResult.errors instead of aborting the whole batch
+    @instrumented
+    def getDocumentsByIds(
+        self,
+        project: str,
+        document_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 8,
+    ) -> BatchResult[FullDocumentWithPreview]:
+        return run_bounded(
+            lambda document_id: self.getDocumentById(project, document_id, apporuser),
+            document_ids,
+            max_concurrency,
+        )
+
+    @instrumented
+    def getChatsByIds(
+        self,
+        project: str,
+        chat_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 8,
+    ) -> BatchResult[ChatWithMessagesPD]:
+        return run_bounded(
+            lambda chat_id: self.getChat(project, chat_id, apporuser),
+            chat_ids,
+            max_concurrency,
+        )
+
+    @instrumented
+    def getUploadRequestsByIds(
+        self,
+        project: str,
+        uploadrequest_ids: List[int],
+        apporuser: str = "",
+        max_concurrency: int = 8,
+    ) -> BatchResult[DocumentUploadRequestWithDocumentsPD]:
+        return run_bounded(
+            lambda uploadrequest_id: self.getUploadRequestById(
+                project, uploadrequest_id, apporuser
+            ),
+            uploadrequest_ids,
+            max_concurrency,
+        )
 
     # def simpleQuestion(
     #     self,
@@ -323,75 +774,143 @@ class VectoratorInteractor:
     #     return chat.id
 
     # simplified question route
+    @instrumented
     def questionWaitUntilFinished(
-        self, project: str, question: str, apporuser: str = "", chat_id: int = None
+        self,
+        project: str,
+        question: str,
+        apporuser: str = "",
+        chat_id: int = None,
+        policy: Optional[WaitPolicy] = None,
+        events: Optional[Iterable] = None,
     ) -> ChatWithMessagesPD:
-        if chat_id is not None:
-            message = ChatMessage(
-                chat_id=chat_id, message=question, persona=Persona.user
-            )
-            chat = self.addMessage(apporuser, project, message)
-        else:
-            new_chat = NewChatPD(
-                name="new chat " + date.today().isoformat(),
-                apporuser=apporuser,
-                project=project,
-                messages=[ChatMessage(message=question, persona=Persona.user)],
-            )
-            chat = self.createChat(apporuser, project, new_chat)
-
-        maxtries = 30
-        crntTry = 0
-        while chat.processing_state != ProcessingState.DONE and crntTry < maxtries:
-            # Use the new getChatStatus endpoint for efficiency
-            status = self.getChatStatus(apporuser, project, chat.id)
-            if status == ProcessingState.DONE:
-                break
-            crntTry += 1
-
-        # Fetch the full chat once the status is DONE or we've reached max tries
-        chat = self.getChat(apporuser, project, chat.id)
-
-        if chat.processing_state != ProcessingState.DONE:
-            raise HTTPException(
-                status_code=408, detail="Request timeout while processing chat"
+        if chat_id is None:
+            chat = self.createChat(
+                project, "new chat " + date.today().isoformat(), apporuser
             )
+            chat_id = chat.id
+        chat = self.addMessage(
+            project,
+            chat_id,
+            NewMessagePD(message=question, persona=Persona.user),
+            apporuser,
+        )
+        result = self.waitForChat(project, chat, apporuser, policy, events)
+        if result.chat.processing_state == ProcessingState.FAILED:
+            raise http_error(status_code=500, detail="Chat processing failed")
+        return result.chat
 
-        return chat
+    @instrumented
+    def waitForChat(
+        self,
+        project: str,
+        chat: Union[int, ChatWithMessagesPD],
+        apporuser: str = "",
+        policy: Optional[WaitPolicy] = None,
+        events: Optional[Iterable] = None,
+    ) -> WaitResult:
+        # polls getChatStatus with jittered exponential backoff until the chat
+        # is DONE or FAILED or policy.timeout is used up. events can be the
+        # iterator of stream_answer_events for the same answer, its end wakes
+        # the waiter up right away instead of sleeping out the backoff
+        policy = policy or WaitPolicy()
+        start = time.monotonic()
+        deadline = start + policy.timeout
+        chat_id = chat if isinstance(chat, int) else chat.id
+        status = None if isinstance(chat, int) else chat.processing_state
+        wake = stop = None
+        if events is not None:
+            wake = threading.Event()
+            stop = watch_events(events, wake)
+        woken = False
+        polls = 0
+        delays = policy.delays()
+        try:
+            while status not in TERMINAL_STATES:
+                if status is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise http_error(
+                            status_code=408,
+                            detail="Request timeout while processing chat",
+                        )
+                    delay = min(next(delays), remaining)
+                    if wake is not None and wake.wait(delay):
+                        # the event fires once, afterwards plain backoff again
+                        woken = True
+                        wake = None
+                    elif wake is None:
+                        time.sleep(delay)
+                status = self.getChatStatus(project, chat_id, apporuser)
+                polls += 1
+        finally:
+            # polling may see the terminal state before the stream ends
+            if stop is not None:
+                stop()
+
+        return WaitResult(
+            chat=self.getChat(project, chat_id, apporuser),
+            polls=polls,
+            waited=time.monotonic() - start,
+            woken_by_event=woken,
+        )
 
-    def stream_answer(self, apporuser: str, project: str, messages: list[ChatMessage]):
-        url = self.vectoratorurl + f"/stream/{apporuser}/{project}/"
-        response = requests.post(
+    def stream_answer(
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
+    ):
+        # parsed=True yields StreamToken objects and records timing stats
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/"
+        call = self._openStream(
+            "stream_answer",
+            "POST",
             url,
-            json={"messages": [json.loads(m.model_dump_json()) for m in messages]},
-            stream=True,
+            data=encode_messages(messages),
+            headers=JSON_HEADERS,
         )
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.iter_content(chunk_size=None)
+        if parsed:
+            return ParsedStream(call.chunks(), TokenDecoder(), call.close, call.started)
+        return call
 
     def stream_answer_tokens(
-        self, apporuser: str, project: str, messages: list[ChatMessage]
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
     ):
-        url = self.vectoratorurl + f"/stream/{apporuser}/{project}/tokens"
-        response = requests.post(
+        # parsed=True yields StreamToken objects and records timing stats
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/tokens"
+        call = self._openStream(
+            "stream_answer_tokens",
+            "POST",
             url,
-            json={"messages": [json.loads(m.model_dump_json()) for m in messages]},
-            stream=True,
+            data=encode_messages(messages),
+            headers=JSON_HEADERS,
         )
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.iter_content(chunk_size=None)
+        if parsed:
+            return ParsedStream(call.chunks(), TokenDecoder(), call.close, call.started)
+        return call
 
     def stream_answer_events(
-        self, apporuser: str, project: str, messages: list[ChatMessage]
+        self,
+        apporuser: str,
+        project: str,
+        messages: list["ChatMessage"],
+        parsed: bool = False,
     ):
-        url = self.vectoratorurl + f"/stream/{apporuser}/{project}/events"
-        response = requests.post(
+        # parsed=True yields StreamEvent objects and records timing stats
+        url = self._tenantBase(apporuser) + f"/stream/{apporuser}/{project}/events"
+        call = self._openStream(
+            "stream_answer_events",
+            "POST",
             url,
-            json={"messages": [json.loads(m.model_dump_json()) for m in messages]},
-            stream=True,
+            data=encode_messages(messages),
+            headers=JSON_HEADERS,
         )
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.iter_content(chunk_size=None)
+        if parsed:
+            return ParsedStream(call.chunks(), EventDecoder(), call.close, call.started)
+        return call
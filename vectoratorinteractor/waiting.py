@@ -0,0 +1,71 @@
+import random
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+
+from pydantic import BaseModel
+
+from vectoratorinteractor.schemas import ChatWithMessagesPD, ProcessingState
+
+TERMINAL_STATES = frozenset({ProcessingState.DONE, ProcessingState.FAILED})
+
+
+class WaitPolicy(BaseModel):
+    # wall clock budget in seconds for the whole wait
+    timeout: float = 120.0
+    initial_delay: float = 0.25
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    # each delay is randomized by +/- this fraction so waiters do not sync up
+    jitter: float = 0.2
+
+    def delays(self, rng: Optional[random.Random] = None) -> Iterator[float]:
+        rng = rng or random
+        delay = self.initial_delay
+        while True:
+            yield max(0.0, delay * (1 + rng.uniform(-self.jitter, self.jitter)))
+            delay = min(self.max_delay, delay * self.multiplier)
+
+
+class WaitResult(BaseModel):
+    chat: ChatWithMessagesPD
+    polls: int
+    waited: float
+    # True when a completion event woke the waiter before its backoff ran out
+    woken_by_event: bool = False
+
+
+def watch_events(events: Iterable, wake: threading.Event) -> Callable[[], None]:
+    """Consume an event stream in the background and set wake when it ends.
+
+    The events stream of the backend ends once the answer is complete, so the
+    end of the iterable is treated as the completion event. Returns stop(),
+    which closes events so the thread ends and its connection is released
+    when the waiter no longer needs it.
+    """
+    stopped = threading.Event()
+
+    def run():
+        try:
+            for _ in events:
+                if stopped.is_set():
+                    return
+        except Exception:
+            # a broken or stopped stream only means we fall back to polling
+            return
+        if not stopped.is_set():
+            wake.set()
+
+    def stop():
+        stopped.set()
+        close = getattr(events, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # a plain generator can not be closed while the thread runs
+                # it, the thread then ends with its stream
+                pass
+
+    thread = threading.Thread(target=run, name="vectorator-events", daemon=True)
+    thread.start()
+    return stop
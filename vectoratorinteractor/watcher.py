@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from vectoratorinteractor.errors import VectoratorError
+from vectoratorinteractor.schemas import ChatWithMessagesPD
+from vectoratorinteractor.waiting import TERMINAL_STATES, WaitPolicy
+
+ChatKey = Tuple[str, str, int]
+
+
+class _Watch:
+    def __init__(self, policy: WaitPolicy):
+        self.futures: List[Future] = []
+        self.delays: Iterator[float] = policy.delays()
+        self.deadline = time.monotonic() + policy.timeout
+        self.polls = 0
+
+
+class ChatWatcher:
+    """Waits for many chats at once with one shared polling scheduler.
+
+    watch() registers a chat and returns a Future that resolves to the final
+    ChatWithMessagesPD once the chat is DONE or FAILED. Every pending chat is
+    polled with its own backoff, but all polls together never exceed
+    max_requests_per_second, so backend load does not grow with the number of
+    waiters. Watching the same chat twice shares one poll loop.
+    """
+
+    def __init__(
+        self,
+        interactor,
+        max_requests_per_second: float = 5.0,
+        policy: Optional[WaitPolicy] = None,
+        max_in_flight: int = 4,
+    ):
+        if max_requests_per_second <= 0:
+            raise ValueError("max_requests_per_second has to be positive")
+        self.interactor = interactor
+        self.policy = policy or WaitPolicy()
+        self.interval = 1.0 / max_requests_per_second
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="vectorator-watcher"
+        )
+        self._in_flight = threading.Semaphore(max_in_flight)
+        self._watches: Dict[ChatKey, _Watch] = {}
+        self._queue: List[Tuple[float, int, ChatKey]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._next_slot = 0.0
+        self._closed = False
+        self.polls = 0
+        self._thread = threading.Thread(
+            target=self._run, name="vectorator-chatwatcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._watches)
+
+    def watch(
+        self,
+        project: str,
+        chat_id: int,
+        apporuser: str = "",
+        callback: Optional[Callable[[Future], None]] = None,
+        policy: Optional[WaitPolicy] = None,
+    ) -> "Future[ChatWithMessagesPD]":
+        future: Future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        key = (project, apporuser, chat_id)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ChatWatcher is closed")
+            watch = self._watches.get(key)
+            if watch is None:
+                watch = self._watches[key] = _Watch(policy or self.policy)
+                self._schedule(key, 0.0)
+            watch.futures.append(future)
+        return future
+
+    def close(self, cancel_pending: bool = True):
+        with self._cond:
+            self._closed = True
+            watches = list(self._watches.values())
+            self._watches.clear()
+            self._queue.clear()
+            self._cond.notify_all()
+        if cancel_pending:
+            for watch in watches:
+                for future in watch.futures:
+                    future.cancel()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _schedule(self, key: ChatKey, delay: float):
+        # caller holds self._cond
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._seq), key))
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._queue:
+                        due = max(self._queue[0][0], self._next_slot)
+                        if due <= now:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+                _, _, key = heapq.heappop(self._queue)
+                watch = self._watches.get(key)
+                if watch is None:
+                    continue
+                # global rate budget, one poll per interval across all chats
+                self._next_slot = time.monotonic() + self.interval
+            self._in_flight.acquire()
+            self._executor.submit(self._poll, key, watch)
+
+    def _poll(self, key: ChatKey, watch: _Watch):
+        project, apporuser, chat_id = key
+        try:
+            status = self.interactor.getChatStatus(project, chat_id, apporuser)
+            with self._cond:
+                self.polls += 1
+                watch.polls += 1
+            if status in TERMINAL_STATES:
+                self._resolve(
+                    key, result=self.interactor.getChat(project, chat_id, apporuser)
+                )
+                return
+            remaining = watch.deadline - time.monotonic()
+            if remaining <= 0:
+                self._resolve(
+                    key,
+                    error=VectoratorError(
+                        status_code=408, detail="Request timeout while processing chat"
+                    ),
+                )
+                return
+            with self._cond:
+                if key in self._watches:
+                    self._schedule(key, min(next(watch.delays), remaining))
+        except Exception as e:
+            self._resolve(key, error=e)
+        finally:
+            self._in_flight.release()
+
+    def _resolve(self, key: ChatKey, result=None, error: Optional[Exception] = None):
+        with self._cond:
+            watch = self._watches.pop(key, None)
+        if watch is None:
+            return
+        for future in watch.futures:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)